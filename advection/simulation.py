@@ -8,6 +8,8 @@ from simulation_null import NullSimulation, grid_setup, bc_setup
 
 class Simulation(NullSimulation):
 
+    decomposable = True
+
     def initialize(self):
         """
         Initialize the grid and variables for advection and set the initial
@@ -58,6 +60,29 @@ class Simulation(NullSimulation):
         dtdx = self.dt/self.cc_data.grid.dx
         dtdy = self.dt/self.cc_data.grid.dy
 
+        if self.tiler.nthreads > 1:
+            # find the fluxes on all of the tiles first, since they
+            # read the density in the ghost cells overlapping their
+            # neighbors, and then update each tile's valid zones
+            tiles = self.tiler.tiles(self.cc_data.grid)
+            views = [self.cc_data.tile_view(t) for t in tiles]
+
+            fluxes = self.tiler.map(
+                lambda d: flx.unsplit_fluxes(d, self.rp, self.dt, "density"), views)
+
+            def update(d, flux_x, flux_y):
+                dens = d.get_var("density")
+                dens.v()[:,:] = dens.v() + dtdx*(flux_x.v() - flux_x.ip(1)) + \
+                                           dtdy*(flux_y.v() - flux_y.jp(1))
+
+            self.tiler.map(update, views, *zip(*fluxes))
+
+            self.cc_data.mark_dirty()
+
+            self.cc_data.t += self.dt
+            self.n += 1
+            return
+
         flux_x, flux_y =  flx.unsplit_fluxes(self.cc_data, self.rp, self.dt, "density")
 
         """
@@ -2,7 +2,6 @@ from __future__ import print_function
 
 import advection
 import advection_rk.fluxes as flx
-import mesh.integration as integration
 import mesh.array_indexer as ai
 
 
@@ -63,16 +62,7 @@ class Simulation(advection.Simulation):
 
         method = self.rp.get_param("advection.temporal_method")
 
-        rk = integration.RKIntegrator(myd.t, self.dt, method=method)
-        rk.set_start(myd)
-
-        for s in range(rk.nstages()):
-            ytmp = rk.get_stage_start(s)
-            ytmp.fill_BC_all()
-            k = self.substep(ytmp)
-            rk.store_increment(s, k)
-
-        rk.compute_final_update()
+        self.rk_evolve(myd, method)
 
         # increment the time
         myd.t += self.dt
@@ -3,40 +3,57 @@ import mesh.patch as patch
 import mesh.array_indexer as ai
 import numpy as np
 
-def fvs(q, order, u, alpha):
+def fvs(q, order, u, alpha, idir=1):
     """
-    Perform Flux-Vector-Split (LF) finite differencing using WENO in 1d.
+    Perform Flux-Vector-Split (LF) finite differencing using WENO along
+    one direction.  The WENO reconstruction is done for the entire
+    array at once.
 
     Parameters
     ----------
 
     q : np array
-        input data with at least order+1 ghost zones
+        input data with at least order+1 ghost zones (1-d or 2-d)
     order : int
         WENO order (k)
     u : float
         Advection velocity in this direction
     alpha : float
         Maximum characteristic speed
+    idir : int, optional
+        direction to difference along (1 = x, 2 = y)
 
     Returns
     -------
 
     f : np array
-        flux
+        flux, with f[i] the flux through the interface i-1/2
     """
+    q = np.asarray(q)
+    axis = idir - 1
+    npts = q.shape[axis]
+
+    def s(lo, hi):
+        """ slice the range lo:hi along the axis """
+        idx = [slice(None)]*q.ndim
+        idx[axis] = slice(lo, hi)
+        return tuple(idx)
+
     flux = u * q
     flux_p = (flux + alpha * q) / 2
     flux_m = (flux - alpha * q) / 2
+
+    # the left-biased reconstruction of zone i-1 and the right-biased
+    # reconstruction of zone i both sit on the interface i-1/2
     flux_p_r = np.zeros_like(flux_p)
+    flux_p_r[s(order, npts-order)] = \
+        reconstruction.weno_upwind_array(flux_p, order, idir)[s(order-1, npts-order-1)]
+
     flux_m_l = np.zeros_like(flux_m)
-    Npoints = len(q)
-    for i in range(order, Npoints-order):
-        flux_p_r[i] = reconstruction.weno_upwind(flux_p[i-order:i+order-1],
-                                                 order)
-        flux_m_l[i] = reconstruction.weno_upwind(flux_m[i+order-1:i-order:-1],
-                                                 order)
-    flux[1:-1] = flux_p_r[1:-1] + flux_m_l[1:-1]
+    flux_m_l[s(order, npts-order)] = \
+        reconstruction.weno_upwind_array(flux_m, order, idir, reverse=True)[s(order, npts-order)]
+
+    flux[s(1, -1)] = flux_p_r[s(1, -1)] + flux_m_l[s(1, -1)]
 
     return flux
 
@@ -81,15 +98,13 @@ def fluxes(my_data, rp, dt):
     u = rp.get_param("advection.u")
     v = rp.get_param("advection.v")
 
-    qx = myg.qx
-    qy = myg.qy
-
     #--------------------------------------------------------------------------
     # WENO fvs
     #--------------------------------------------------------------------------
 
     weno_order = rp.get_param("advection.weno_order")
-    assert(weno_order in (2, 3)), "Currently only implemented weno_order=2, 3"
+    assert(weno_order in reconstruction.C_all), \
+        "No WENO coefficients for weno_order={}".format(weno_order)
     assert(myg.ng > weno_order), "Need more ghosts than the weno_order"
 
     q = a.v(buf=myg.ng)[:,:]
@@ -99,10 +114,8 @@ def fluxes(my_data, rp, dt):
     alpha = np.sqrt(u**2 + v**2)
 
     # x-direction
-    for j in range(qy):
-        F_x.v(buf=myg.ng)[1:-1, j] = fvs(q[:, j], weno_order, u, alpha)[1:-1]
+    F_x.v(buf=myg.ng)[1:-1,:] = fvs(q, weno_order, u, alpha, idir=1)[1:-1,:]
     # y-direction
-    for i in range(qx):
-        F_y.v(buf=myg.ng)[i, 1:-1] = fvs(q[i, :], weno_order, v, alpha)[1:-1]
+    F_y.v(buf=myg.ng)[:,1:-1] = fvs(q, weno_order, v, alpha, idir=2)[:,1:-1]
 
     return F_x, F_y
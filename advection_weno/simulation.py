@@ -7,7 +7,6 @@ import matplotlib.pyplot as plt
 import advection
 import advection_weno.fluxes as flx
 import mesh.patch as patch
-import mesh.integration as integration
 import mesh.array_indexer as ai
 
 from util import profile
@@ -71,16 +70,7 @@ class Simulation(advection.Simulation):
 
         method = self.rp.get_param("advection.temporal_method")
 
-        rk = integration.RKIntegrator(myd.t, self.dt, method=method)
-        rk.set_start(myd)
-
-        for s in range(rk.nstages()):
-            ytmp = rk.get_stage_start(s)
-            ytmp.fill_BC_all()
-            k = self.substep(ytmp)
-            rk.store_increment(s, k)
-
-        rk.compute_final_update()
+        self.rk_evolve(myd, method)
 
         # increment the time
         myd.t += self.dt
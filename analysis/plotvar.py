@@ -11,15 +11,15 @@ from util import io
 
 def makeplot(plotfile, variable, outfile):
 
-    sim = io.read(plotfile)
-    myd = sim.cc_data
-    myg = myd.grid
+    # we only need the one variable
+    pf = io.Plotfile(plotfile)
+    myg = pf.grid
 
     plt.figure(num=1, figsize=(6.5,5.25), dpi=100, facecolor='w')
 
-    var = myd.get_var(variable)
+    var = pf.get_var(variable)
 
-    img = plt.imshow(np.transpose(var.v()),
+    img = plt.imshow(np.transpose(var),
                      interpolation="nearest", origin="lower",
                      extent=[myg.xmin, myg.xmax, myg.ymin, myg.ymax])
 
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+"""
+Time filling the ghost cells of a compressible-like state (4 conserved
+variables + 2 passive scalars, ng = 4) with the batched
+CellCenterData2d.fill_BC_all against the original approach of filling
+one variable at a time with a python loop over the ghost cells.
+
+usage: ./bench_bc.py [-n 64 128 256 512] [--bc reflect]
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import numpy as np
+
+import mesh.boundary as bnd
+import mesh.patch as patch
+
+
+def fill_BC_loop(myd, name):
+    """ the original per-variable fill (standard BC types only) """
+
+    n = myd.names.index(name)
+    bc = myd.BCs[name]
+    g = myd.grid
+    d = myd.data
+
+    # -x boundary
+    if bc.xlb in ["outflow", "neumann"]:
+        for i in range(g.ilo):
+            d[i,:,n] = d[g.ilo,:,n]
+    elif bc.xlb == "reflect-even":
+        for i in range(g.ilo):
+            d[i,:,n] = d[2*g.ng-i-1,:,n]
+    elif bc.xlb in ["reflect-odd", "dirichlet"]:
+        for i in range(g.ilo):
+            d[i,:,n] = -d[2*g.ng-i-1,:,n]
+    elif bc.xlb == "periodic":
+        for i in range(g.ilo):
+            d[i,:,n] = d[g.ihi-g.ng+i+1,:,n]
+
+    # +x boundary
+    if bc.xrb in ["outflow", "neumann"]:
+        for i in range(g.ihi+1, g.nx+2*g.ng):
+            d[i,:,n] = d[g.ihi,:,n]
+    elif bc.xrb == "reflect-even":
+        for i in range(g.ng):
+            d[g.ihi+1+i,:,n] = d[g.ihi-i,:,n]
+    elif bc.xrb in ["reflect-odd", "dirichlet"]:
+        for i in range(g.ng):
+            d[g.ihi+1+i,:,n] = -d[g.ihi-i,:,n]
+    elif bc.xrb == "periodic":
+        for i in range(g.ihi+1, 2*g.ng+g.nx):
+            d[i,:,n] = d[i-g.ihi-1+g.ng,:,n]
+
+    # -y boundary
+    if bc.ylb in ["outflow", "neumann"]:
+        for j in range(g.jlo):
+            d[:,j,n] = d[:,g.jlo,n]
+    elif bc.ylb == "reflect-even":
+        for j in range(g.jlo):
+            d[:,j,n] = d[:,2*g.ng-j-1,n]
+    elif bc.ylb in ["reflect-odd", "dirichlet"]:
+        for j in range(g.jlo):
+            d[:,j,n] = -d[:,2*g.ng-j-1,n]
+    elif bc.ylb == "periodic":
+        for j in range(g.jlo):
+            d[:,j,n] = d[:,g.jhi-g.ng+j+1,n]
+
+    # +y boundary
+    if bc.yrb in ["outflow", "neumann"]:
+        for j in range(g.jhi+1, g.ny+2*g.ng):
+            d[:,j,n] = d[:,g.jhi,n]
+    elif bc.yrb == "reflect-even":
+        for j in range(g.ng):
+            d[:,g.jhi+1+j,n] = d[:,g.jhi-j,n]
+    elif bc.yrb in ["reflect-odd", "dirichlet"]:
+        for j in range(g.ng):
+            d[:,g.jhi+1+j,n] = -d[:,g.jhi-j,n]
+    elif bc.yrb == "periodic":
+        for j in range(g.jhi+1, 2*g.ng+g.ny):
+            d[:,j,n] = d[:,j-g.jhi-1+g.ng,n]
+
+
+def setup(n, bc_type):
+    """ create a compressible-like CellCenterData2d """
+
+    myg = patch.Grid2d(n, n, ng=4)
+    myd = patch.CellCenterData2d(myg)
+
+    bc = bnd.BC(xlb=bc_type, xrb=bc_type, ylb=bc_type, yrb=bc_type)
+    bc_xodd = bnd.BC(xlb=bc_type, xrb=bc_type, ylb=bc_type, yrb=bc_type,
+                     odd_reflect_dir="x")
+    bc_yodd = bnd.BC(xlb=bc_type, xrb=bc_type, ylb=bc_type, yrb=bc_type,
+                     odd_reflect_dir="y")
+
+    myd.register_var("density", bc)
+    myd.register_var("energy", bc)
+    myd.register_var("x-momentum", bc_xodd)
+    myd.register_var("y-momentum", bc_yodd)
+    myd.register_var("fuel", bc)
+    myd.register_var("ash", bc)
+    myd.create()
+
+    myd.data[:,:,:] = np.random.rand(*myd.data.shape)
+
+    return myd
+
+
+def time_it(func, nrep):
+    """ return the average time of nrep calls """
+    start = time.time()
+    for _ in range(nrep):
+        func()
+    return (time.time() - start)/nrep
+
+
+def run(sizes, bc_type, nrep):
+
+    print("{:>6} {:>14} {:>14} {:>10}".format(
+        "N", "loop (s)", "batched (s)", "speedup"))
+
+    for n in sizes:
+        myd = setup(n, bc_type)
+        ref = patch.cell_center_data_clone(myd)
+
+        def old():
+            for name in ref.names:
+                fill_BC_loop(ref, name)
+
+        t_old = time_it(old, nrep)
+        t_new = time_it(myd.fill_BC_all, nrep)
+
+        assert np.array_equal(myd.data, ref.data)
+
+        print("{:6d} {:14.5g} {:14.5g} {:10.1f}".format(
+            n, t_old, t_new, t_old/t_new))
+
+
+if __name__ == "__main__":
+
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", type=int, nargs="+", default=[64, 128, 256, 512],
+                   help="number of zones in each direction")
+    p.add_argument("--bc", type=str, default="reflect",
+                   help="boundary condition type to use on all edges")
+    p.add_argument("--nrep", type=int, default=20,
+                   help="number of fills to average over")
+
+    args = p.parse_args()
+
+    run(args.n, args.bc, args.nrep)
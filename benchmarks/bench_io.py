@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+Time writing and reading a CellCenterData2d in each of the output
+formats (see util.backends): HDF5 (as is, and gzip compressed), a
+directory of .npy files, and an .npz archive.  Reading is timed both
+for a whole file with util.io.read and for one variable with
+util.io.Plotfile (memory-mapped where the format allows it, so the
+data is touched by summing it).
+
+usage: ./bench_io.py [-n 256 512 1024 2048]
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import mesh.boundary as bnd
+import mesh.patch as patch
+import util.backends as backends
+import util.io as io
+
+
+FORMATS = [("hdf5", {}),
+           ("hdf5", {"compression": "gzip", "shuffle": True}),
+           ("npy", {}),
+           ("npz", {})]
+
+
+def make_data(n, nvar=4):
+    """ a CellCenterData2d with nvar smooth variables """
+
+    myg = patch.Grid2d(n, n, ng=4)
+    myd = patch.CellCenterData2d(myg)
+
+    bc = bnd.BC(xlb="periodic", xrb="periodic", ylb="periodic", yrb="periodic")
+    for m in range(nvar):
+        myd.register_var("var{}".format(m), bc)
+    myd.create()
+
+    for m in range(nvar):
+        myd.get_var("var{}".format(m))[:,:] = np.sin(2.0*np.pi*(m+1)*myg.x2d)*np.cos(2.0*np.pi*myg.y2d)
+
+    return myd
+
+
+def time_it(func, nrep):
+    """ return the average time of nrep calls """
+    start = time.time()
+    for _ in range(nrep):
+        func()
+    return (time.time() - start)/nrep
+
+
+def run(sizes, nrep):
+
+    tmpdir = tempfile.mkdtemp()
+
+    print("{:>6} {:>10} {:>10} {:>12} {:>12} {:>12} {:>12}".format(
+        "N", "format", "size (MB)", "write (s)", "read (s)", "1 var (s)", "write MB/s"))
+
+    try:
+        for n in sizes:
+            myd = make_data(n)
+            data_bytes = n*n*myd.nvar*8
+
+            for name, opts in FORMATS:
+                label = name + ("+gzip" if opts else "")
+                backend = backends.get_backend(name)
+                base = os.path.join(tmpdir, "bench_{}".format(n))
+                filename = backends.output_filename(base, backend)
+
+                t_write = time_it(lambda: myd.write(base, file_format=name, **opts), nrep)
+                t_read = time_it(lambda: io.read(filename), nrep)
+
+                def read_one():
+                    with io.Plotfile(filename) as pf:
+                        pf.get_var("var0").sum()
+
+                t_one = time_it(read_one, nrep)
+
+                if os.path.isdir(filename):
+                    size = sum(os.path.getsize(os.path.join(d, f))
+                               for d, _, files in os.walk(filename) for f in files)
+                else:
+                    size = os.path.getsize(filename)
+
+                print("{:6d} {:>10} {:10.2f} {:12.5g} {:12.5g} {:12.5g} {:12.1f}".format(
+                    n, label, size/1.e6, t_write, t_read, t_one, data_bytes/1.e6/t_write))
+
+                # the data comes back unchanged
+                new = io.read(filename)
+                assert np.array_equal(new.get_var("var1").v(), myd.get_var("var1").v())
+
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", type=int, nargs="+", default=[256, 512, 1024, 2048],
+                   help="number of zones in each direction")
+    p.add_argument("--nrep", type=int, default=3,
+                   help="number of calls to average over")
+
+    args = p.parse_args()
+
+    run(args.n, args.nrep)
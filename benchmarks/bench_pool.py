@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+Time the 4th order MC limiter (reconstruction.limit4), which takes its
+work arrays from the grid's ScratchPool, against the original version
+that allocates fresh zeroed arrays with scratch_array for every call.
+
+usage: ./bench_pool.py [-n 256 512 1024 2048]
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import numpy as np
+
+import mesh.patch as patch
+import mesh.reconstruction as reconstruction
+
+
+def limit2_alloc(a, myg, idir):
+    """ the original limit2, allocating all of its arrays """
+
+    lda = myg.scratch_array()
+    dc = myg.scratch_array()
+    dl = myg.scratch_array()
+    dr = myg.scratch_array()
+
+    if idir == 1:
+        dc.v(buf=2)[:,:] = 0.5*(a.ip(1, buf=2) - a.ip(-1, buf=2))
+        dl.v(buf=2)[:,:] = a.ip(1, buf=2) - a.v(buf=2)
+        dr.v(buf=2)[:,:] = a.v(buf=2) - a.ip(-1, buf=2)
+
+    elif idir == 2:
+        dc.v(buf=2)[:,:] = 0.5*(a.jp(1, buf=2) - a.jp(-1, buf=2))
+        dl.v(buf=2)[:,:] = a.jp(1, buf=2) - a.v(buf=2)
+        dr.v(buf=2)[:,:] = a.v(buf=2) - a.jp(-1, buf=2)
+
+    d1 = 2.0*np.where(np.fabs(dl) < np.fabs(dr), dl, dr)
+    dt = np.where(np.fabs(dc) < np.fabs(d1), dc, d1)
+    lda.v(buf=myg.ng)[:,:] = np.where(dl*dr > 0.0, dt, 0.0)
+
+    return lda
+
+
+def limit4_alloc(a, myg, idir):
+    """ the original limit4, allocating all of its arrays """
+
+    lda_tmp = limit2_alloc(a, myg, idir)
+
+    lda = myg.scratch_array()
+    dc = myg.scratch_array()
+    dl = myg.scratch_array()
+    dr = myg.scratch_array()
+
+    if idir == 1:
+        dc.v(buf=2)[:,:] = (2./3.)*(a.ip(1, buf=2) - a.ip(-1, buf=2) -
+                                    0.25*(lda_tmp.ip(1, buf=2) + lda_tmp.ip(-1, buf=2)))
+        dl.v(buf=2)[:,:] = a.ip(1, buf=2) - a.v(buf=2)
+        dr.v(buf=2)[:,:] = a.v(buf=2) - a.ip(-1, buf=2)
+
+    elif idir == 2:
+        dc.v(buf=2)[:,:] = (2./3.)*(a.jp(1, buf=2) - a.jp(-1, buf=2) - \
+                                    0.25*(lda_tmp.jp(1, buf=2) + lda_tmp.jp(-1, buf=2)))
+        dl.v(buf=2)[:,:] = a.jp(1, buf=2) - a.v(buf=2)
+        dr.v(buf=2)[:,:] = a.v(buf=2) - a.jp(-1, buf=2)
+
+    d1 = 2.0*np.where(np.fabs(dl) < np.fabs(dr), dl, dr)
+    dt = np.where(np.fabs(dc) < np.fabs(d1), dc, d1)
+    lda.v(buf=myg.ng)[:,:] = np.where(dl*dr > 0.0, dt, 0.0)
+
+    return lda
+
+
+def time_it(func, nrep):
+    """ return the average time of nrep calls """
+    start = time.time()
+    for _ in range(nrep):
+        func()
+    return (time.time() - start)/nrep
+
+
+def run(sizes, nrep):
+
+    print("{:>6} {:>14} {:>14} {:>10} {:>16}".format(
+        "N", "allocate (s)", "pooled (s)", "speedup", "peak pool (MB)"))
+
+    for n in sizes:
+        myg = patch.Grid2d(n, n, ng=4)
+        a = myg.scratch_array()
+        a[:,:] = np.random.rand(*a.shape)
+
+        def old():
+            for idir in [1, 2]:
+                limit4_alloc(a, myg, idir)
+
+        def new():
+            # release the result, as unsplit_fluxes does
+            for idir in [1, 2]:
+                myg.release(reconstruction.limit4(a, myg, idir))
+
+        t_old = time_it(old, nrep)
+        t_new = time_it(new, nrep)
+
+        for idir in [1, 2]:
+            assert np.array_equal(limit4_alloc(a, myg, idir),
+                                  reconstruction.limit4(a, myg, idir))
+
+        print("{:6d} {:14.5g} {:14.5g} {:10.2f} {:16.3f}".format(
+            n, t_old, t_new, t_old/t_new, myg.pool.peak_bytes/1.e6))
+
+
+if __name__ == "__main__":
+
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", type=int, nargs="+", default=[256, 512, 1024, 2048],
+                   help="number of zones in each direction")
+    p.add_argument("--nrep", type=int, default=10,
+                   help="number of calls to average over")
+
+    args = p.parse_args()
+
+    run(args.n, args.nrep)
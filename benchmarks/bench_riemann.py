@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+"""
+Compare the throughput of the compiled (interface_f) and NumPy
+(compressible.riemann) backends of the compressible Riemann solvers.
+Both directions are solved on an N x N grid, and we report the cost
+per zone-update (nanoseconds per interface, per direction) for each
+solver, along with its compiled cost relative to HLLC.
+
+usage: ./bench_riemann.py [-n 32 64 128 256] [--nspec 0]
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import numpy as np
+
+import compressible.interface_f as interface_f
+import compressible.riemann as riemann
+
+
+def time_it(func, *args, nrep=1):
+    """ return the best time of nrep calls and the last result """
+    best = 1.e33
+    for _ in range(nrep):
+        start = time.time()
+        result = func(*args)
+        best = min(best, time.time() - start)
+    return best, result
+
+
+def states(qx, qy, nspec, gamma):
+    """ random left and right conserved states """
+
+    rng = np.random.RandomState(12345)
+
+    U = []
+    for _ in range(2):
+        rho = 10.0**rng.uniform(-1, 1, size=(qx, qy))
+        u = rng.uniform(-1, 1, size=(qx, qy))
+        v = rng.uniform(-1, 1, size=(qx, qy))
+        p = 10.0**rng.uniform(-1, 1, size=(qx, qy))
+
+        q = np.zeros((qx, qy, 4 + nspec))
+        q[:, :, 0] = rho
+        q[:, :, 1] = rho*u
+        q[:, :, 2] = rho*v
+        q[:, :, 3] = p/(gamma - 1.0) + 0.5*rho*(u**2 + v**2)
+        if nspec > 0:
+            q[:, :, 4:] = rho[:, :, np.newaxis]/nspec
+
+        U.append(q)
+
+    return U
+
+
+def both_dirs(solver, qx, qy, ng, nspec, gamma, U_l, U_r):
+    """ the x- and y-interface fluxes, as the compressible solvers do """
+    nvar = 4 + nspec
+    irhox = 4 if nspec > 0 else -1
+    F_x = solver(1, qx, qy, ng, nvar, 0, 1, 2, 3, irhox, nspec, 0, 0, gamma, U_l, U_r)
+    F_y = solver(2, qx, qy, ng, nvar, 0, 1, 2, 3, irhox, nspec, 0, 0, gamma, U_l, U_r)
+    return F_x, F_y
+
+
+def run(sizes, nspec):
+
+    gamma = 1.4
+    ng = 4
+
+    print("{:>6} {:>8} {:>16} {:>16} {:>10} {:>10} {:>12}".format(
+        "N", "solver", "fortran (ns/zu)", "numpy (ns/zu)", "ratio", "vs HLLC", "max diff"))
+
+    for n in sizes:
+        qx = qy = n + 2*ng
+        U_l, U_r = states(qx, qy, nspec, gamma)
+
+        # zone-updates: the interfaces each solver visits, both directions
+        nzu = 2*(n + 2)**2
+
+        t_hllc = None
+
+        for name in ["hllc", "cgf", "hlle", "rusanov"]:
+            f_func = getattr(interface_f, "riemann_" + name)
+            np_func = getattr(riemann, "riemann_" + name)
+
+            t_f, (fx_f, fy_f) = time_it(both_dirs, f_func, qx, qy, ng, nspec,
+                                        gamma, U_l, U_r, nrep=5)
+            t_np, (fx_np, fy_np) = time_it(both_dirs, np_func, qx, qy, ng, nspec,
+                                           gamma, U_l, U_r, nrep=5)
+
+            err = max(np.abs(fx_f - fx_np).max(), np.abs(fy_f - fy_np).max())
+
+            if t_hllc is None:
+                t_hllc = t_f
+
+            print("{:6d} {:>8} {:16.4g} {:16.4g} {:10.2f} {:10.2f} {:12.4g}".format(
+                n, name.upper(), 1.e9*t_f/nzu, 1.e9*t_np/nzu, t_np/t_f, t_f/t_hllc, err))
+
+
+if __name__ == "__main__":
+
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", type=int, nargs="+", default=[32, 64, 128, 256],
+                   help="number of zones in each direction")
+    p.add_argument("--nspec", type=int, default=0,
+                   help="number of passively advected species")
+
+    args = p.parse_args()
+
+    run(args.n, args.nspec)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""
+Compare the cost of the whole-array WENO reconstruction used by
+advection_weno against the original zone-by-zone loop over
+mesh.reconstruction.weno_upwind.
+
+usage: ./bench_weno.py [-n 32 64 128] [--order 3]
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import numpy as np
+
+import advection_weno.fluxes as flx
+import mesh.patch as patch
+import mesh.reconstruction as reconstruction
+
+
+def fvs_loop(q, order, u, alpha):
+    """ the original 1-d flux-vector split, one zone at a time """
+    flux = u * q
+    flux_p = (flux + alpha * q) / 2
+    flux_m = (flux - alpha * q) / 2
+    flux_p_r = np.zeros_like(flux_p)
+    flux_m_l = np.zeros_like(flux_m)
+    npts = len(q)
+    for i in range(order, npts-order):
+        flux_p_r[i] = reconstruction.weno_upwind(flux_p[i-order:i+order-1], order)
+        flux_m_l[i] = reconstruction.weno_upwind(flux_m[i+order-1:i-order:-1], order)
+    flux[1:-1] = flux_p_r[1:-1] + flux_m_l[1:-1]
+    return flux
+
+
+def fluxes_loop(q, order, u, v, alpha):
+    """ the original fluxes construction: one fvs per row and column """
+    F_x = np.zeros_like(q)
+    F_y = np.zeros_like(q)
+    for j in range(q.shape[1]):
+        F_x[1:-1, j] = fvs_loop(q[:, j], order, u, alpha)[1:-1]
+    for i in range(q.shape[0]):
+        F_y[i, 1:-1] = fvs_loop(q[i, :], order, v, alpha)[1:-1]
+    return F_x, F_y
+
+
+def fluxes_vec(q, order, u, v, alpha):
+    """ the whole-array version """
+    F_x = np.zeros_like(q)
+    F_y = np.zeros_like(q)
+    F_x[1:-1, :] = flx.fvs(q, order, u, alpha, idir=1)[1:-1, :]
+    F_y[:, 1:-1] = flx.fvs(q, order, v, alpha, idir=2)[:, 1:-1]
+    return F_x, F_y
+
+
+def time_it(func, *args, nrep=1):
+    """ return the best time of nrep calls and the last result """
+    best = 1.e33
+    for _ in range(nrep):
+        start = time.time()
+        result = func(*args)
+        best = min(best, time.time() - start)
+    return best, result
+
+
+def run(sizes, order):
+
+    u = 1.0
+    v = 1.0
+    alpha = np.sqrt(u**2 + v**2)
+
+    print("{:>6} {:>14} {:>14} {:>10} {:>12}".format(
+        "N", "loop (s)", "array (s)", "speedup", "max diff"))
+
+    for n in sizes:
+        myg = patch.Grid2d(n, n, ng=4)
+        q = myg.scratch_array()
+        q[:,:] = np.exp(-((myg.x2d - 0.5)**2 + (myg.y2d - 0.5)**2)/0.01)
+        q = np.asarray(q)
+
+        t_loop, (fx_l, fy_l) = time_it(fluxes_loop, q, order, u, v, alpha)
+        t_vec, (fx_v, fy_v) = time_it(fluxes_vec, q, order, u, v, alpha, nrep=5)
+
+        err = max(np.abs(fx_l - fx_v).max(), np.abs(fy_l - fy_v).max())
+
+        print("{:6d} {:14.5g} {:14.5g} {:10.1f} {:12.4g}".format(
+            n, t_loop, t_vec, t_loop/t_vec, err))
+
+
+if __name__ == "__main__":
+
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", type=int, nargs="+", default=[32, 64, 128],
+                   help="number of zones in each direction")
+    p.add_argument("--order", type=int, default=3,
+                   help="WENO order (k)")
+
+    args = p.parse_args()
+
+    run(args.n, args.order)
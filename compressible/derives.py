@@ -1,56 +1,73 @@
 import numpy as np
 
+import compressible
 import compressible.eos as eos
 
 def derive_primitives(myd, varnames):
-    """ 
-    derive desired primitive variables from conserved state
     """
-
-    # get the variables we need
-    dens = myd.get_var("density")
-    xmom = myd.get_var("x-momentum")
-    ymom = myd.get_var("y-momentum")
-    ener = myd.get_var("energy")
-
-    derived_vars = []
-
-    u = xmom/dens
-    v = ymom/dens
-
-    e = (ener - 0.5*dens*(u*u + v*v))/dens
-
-    gamma = myd.get_aux("gamma")
-    p = eos.pres(gamma, dens, e)
+    derive desired primitive variables from conserved state.  Only
+    the requested quantities are computed, and they are cached in
+    myd (see CellCenterData2d.get_cached), so they are only computed
+    once for each state.  The arrays returned are read-only.
+    """
 
     if isinstance(varnames, str):
         wanted = [varnames]
     else:
         wanted = list(varnames)
 
+    derived_vars = []
+
     for var in wanted:
 
         if var == "velocity":
-            derived_vars.append(u)
-            derived_vars.append(v)
+            q, ivars = _primitives(myd)
+            derived_vars.append(q[:,:,ivars.iu])
+            derived_vars.append(q[:,:,ivars.iv])
 
         elif var in ["e", "eint"]:
-            derived_vars.append(e)
+            derived_vars.append(myd.get_cached("eint", _eint))
 
         elif var in ["p", "pressure"]:
-            derived_vars.append(p)
+            q, ivars = _primitives(myd)
+            derived_vars.append(q[:,:,ivars.ip])
 
         elif var == "primitive":
-            derived_vars.append(dens)
-            derived_vars.append(u)
-            derived_vars.append(v)
-            derived_vars.append(p)
+            q, ivars = _primitives(myd)
+            derived_vars.append(q[:,:,ivars.irho])
+            derived_vars.append(q[:,:,ivars.iu])
+            derived_vars.append(q[:,:,ivars.iv])
+            derived_vars.append(q[:,:,ivars.ip])
 
         elif var == "soundspeed":
-            derived_vars.append(np.sqrt(gamma*p/dens))
+            derived_vars.append(myd.get_cached("soundspeed", _soundspeed))
 
     if len(derived_vars) > 1:
         return derived_vars
-    else:
+    elif len(derived_vars) == 1:
         return derived_vars[0]
+    else:
+        return []
+
+
+def _primitives(myd):
+    """ the cached primitive variable array and its Variables object """
+    ivars = compressible.Variables(myd)
+    return compressible.get_primitives(myd, ivars), ivars
+
 
+def _eint(myd):
+    """ the specific internal energy """
+    q, ivars = _primitives(myd)
+    dens = myd.get_var("density")
+    ener = myd.get_var("energy")
+    u = q[:,:,ivars.iu]
+    v = q[:,:,ivars.iv]
+    return (ener - 0.5*dens*(u*u + v*v))/dens
+
+
+def _soundspeed(myd):
+    """ the adiabatic sound speed """
+    q, ivars = _primitives(myd)
+    gamma = myd.get_aux("gamma")
+    return np.sqrt(gamma*q[:,:,ivars.ip]/q[:,:,ivars.irho])
@@ -23,6 +23,7 @@ subroutine states(idir, qx, qy, ng, dx, dt, &
 !f2py depend(qx, qy, nvar) :: q_l, q_r
 !f2py intent(in) :: qv, dqv
 !f2py intent(out) :: q_l, q_r
+!f2py threadsafe
 
   ! predict the cell-centered state to the edges in one-dimension
   ! using the reconstructed, limited slopes.
@@ -230,6 +231,7 @@ subroutine riemann_cgf(idir, qx, qy, ng, &
 !f2py depend(qx, qy, nvar) :: U_l, U_r
 !f2py intent(in) :: U_l, U_r
 !f2py intent(out) :: F
+!f2py threadsafe
 
   ! Solve riemann shock tube problem for a general equation of
   ! state using the method of Colella, Glaz, and Ferguson.  See
@@ -559,6 +561,7 @@ subroutine riemann_HLLC(idir, qx, qy, ng, &
 !f2py depend(qx, qy, nvar) :: U_l, U_r
 !f2py intent(in) :: U_l, U_r
 !f2py intent(out) :: F
+!f2py threadsafe
 
   ! this is the HLLC Riemann solver.  The implementation follows
   ! directly out of Toro's book.  Note: this does not handle the
@@ -818,6 +821,257 @@ subroutine riemann_HLLC(idir, qx, qy, ng, &
   enddo
 end subroutine riemann_HLLC
 
+subroutine riemann_hlle(idir, qx, qy, ng, &
+                        nvar, idens, ixmom, iymom, iener, irhoX, nspec, &
+                        lower_solid, upper_solid, &
+                        gamma, U_l, U_r, F)
+
+
+  implicit none
+
+  integer, intent(in) :: idir
+  integer, intent(in) :: qx, qy, ng
+  integer, intent(in) :: nvar, idens, ixmom, iymom, iener, irhoX, nspec
+  integer, intent(in) :: lower_solid, upper_solid
+  double precision, intent(in) :: gamma
+
+  ! 0-based indexing to match python
+  double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(inout) :: U_r(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(  out) :: F(0:qx-1,0:qy-1,0:nvar-1)
+
+!f2py depend(qx, qy, nvar) :: U_l, U_r
+!f2py intent(in) :: U_l, U_r
+!f2py intent(out) :: F
+!f2py threadsafe
+
+  ! this is the HLLE Riemann solver (Einfeldt 1988).  The star region
+  ! is replaced by a single average state between the fastest left-
+  ! and right-moving waves, whose speeds are bounded using the Roe
+  ! average state.  The contact is smeared, but this is much cheaper
+  ! than HLLC or CGF and positivity-preserving.
+  !
+  ! On a solid wall, the exterior state is replaced by the mirror
+  ! image of the interior state, so only the pressure term survives
+  ! in the normal momentum flux.
+
+  integer :: ilo, ihi, jlo, jhi
+  integer :: nx, ny
+  integer :: i, j
+
+  double precision, parameter :: smallc = 1.e-10
+
+  double precision :: rho_l, un_l, ut_l, p_l, c_l, H_l
+  double precision :: rho_r, un_r, ut_r, p_r, c_r, H_r
+  double precision :: sr_l, sr_r, un_roe, ut_roe, H_roe, c_roe
+  double precision :: S_l, S_r
+
+  double precision :: U_lo(0:nvar-1), U_hi(0:nvar-1)
+  double precision :: F_l(0:nvar-1), F_r(0:nvar-1)
+
+  nx = qx - 2*ng; ny = qy - 2*ng
+  ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
+
+  do j = jlo-1, jhi+1
+     do i = ilo-1, ihi+1
+
+        U_lo(:) = U_l(i,j,:)
+        U_hi(:) = U_r(i,j,:)
+
+        call solid_mirror(idir, i, j, ilo, ihi, jlo, jhi, ixmom, iymom, nvar, &
+                          lower_solid, upper_solid, U_lo, U_hi)
+
+        call wave_state(idir, gamma, idens, ixmom, iymom, iener, nvar, &
+                        U_lo, rho_l, un_l, ut_l, p_l, c_l)
+
+        call wave_state(idir, gamma, idens, ixmom, iymom, iener, nvar, &
+                        U_hi, rho_r, un_r, ut_r, p_r, c_r)
+
+        ! Roe average state
+        sr_l = sqrt(rho_l)
+        sr_r = sqrt(rho_r)
+
+        H_l = (U_lo(iener) + p_l)/rho_l
+        H_r = (U_hi(iener) + p_r)/rho_r
+
+        un_roe = (sr_l*un_l + sr_r*un_r)/(sr_l + sr_r)
+        ut_roe = (sr_l*ut_l + sr_r*ut_r)/(sr_l + sr_r)
+        H_roe = (sr_l*H_l + sr_r*H_r)/(sr_l + sr_r)
+
+        c_roe = max(smallc, &
+             sqrt(max(0.0d0, (gamma - 1.0d0)*(H_roe - 0.5d0*(un_roe**2 + ut_roe**2)))))
+
+        ! bounds on the fastest left and right moving waves
+        S_l = min(un_l - c_l, un_roe - c_roe)
+        S_r = max(un_r + c_r, un_roe + c_roe)
+
+        call consFlux(idir, gamma, idens, ixmom, iymom, iener, irhoX, nvar, nspec, &
+                      U_lo, F_l)
+
+        call consFlux(idir, gamma, idens, ixmom, iymom, iener, irhoX, nvar, nspec, &
+                      U_hi, F_r)
+
+        if (S_l >= 0.0d0) then
+           ! all waves move to the right
+           F(i,j,:) = F_l(:)
+
+        else if (S_r <= 0.0d0) then
+           ! all waves move to the left
+           F(i,j,:) = F_r(:)
+
+        else
+           F(i,j,:) = (S_r*F_l(:) - S_l*F_r(:) + S_l*S_r*(U_hi(:) - U_lo(:)))/(S_r - S_l)
+        endif
+
+     enddo
+  enddo
+end subroutine riemann_hlle
+
+
+subroutine riemann_rusanov(idir, qx, qy, ng, &
+                           nvar, idens, ixmom, iymom, iener, irhoX, nspec, &
+                           lower_solid, upper_solid, &
+                           gamma, U_l, U_r, F)
+
+
+  implicit none
+
+  integer, intent(in) :: idir
+  integer, intent(in) :: qx, qy, ng
+  integer, intent(in) :: nvar, idens, ixmom, iymom, iener, irhoX, nspec
+  integer, intent(in) :: lower_solid, upper_solid
+  double precision, intent(in) :: gamma
+
+  ! 0-based indexing to match python
+  double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(inout) :: U_r(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(  out) :: F(0:qx-1,0:qy-1,0:nvar-1)
+
+!f2py depend(qx, qy, nvar) :: U_l, U_r
+!f2py intent(in) :: U_l, U_r
+!f2py intent(out) :: F
+!f2py threadsafe
+
+  ! this is the Rusanov (local Lax-Friedrichs) flux: the average of
+  ! the left and right fluxes, with dissipation set by the fastest
+  ! signal speed at the interface.  This is the cheapest and most
+  ! diffusive of the solvers here.
+  !
+  ! Solid walls are treated as in riemann_hlle.
+
+  integer :: ilo, ihi, jlo, jhi
+  integer :: nx, ny
+  integer :: i, j
+
+  double precision :: rho_l, un_l, ut_l, p_l, c_l
+  double precision :: rho_r, un_r, ut_r, p_r, c_r
+  double precision :: S
+
+  double precision :: U_lo(0:nvar-1), U_hi(0:nvar-1)
+  double precision :: F_l(0:nvar-1), F_r(0:nvar-1)
+
+  nx = qx - 2*ng; ny = qy - 2*ng
+  ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
+
+  do j = jlo-1, jhi+1
+     do i = ilo-1, ihi+1
+
+        U_lo(:) = U_l(i,j,:)
+        U_hi(:) = U_r(i,j,:)
+
+        call solid_mirror(idir, i, j, ilo, ihi, jlo, jhi, ixmom, iymom, nvar, &
+                          lower_solid, upper_solid, U_lo, U_hi)
+
+        call wave_state(idir, gamma, idens, ixmom, iymom, iener, nvar, &
+                        U_lo, rho_l, un_l, ut_l, p_l, c_l)
+
+        call wave_state(idir, gamma, idens, ixmom, iymom, iener, nvar, &
+                        U_hi, rho_r, un_r, ut_r, p_r, c_r)
+
+        ! fastest signal speed
+        S = max(abs(un_l) + c_l, abs(un_r) + c_r)
+
+        call consFlux(idir, gamma, idens, ixmom, iymom, iener, irhoX, nvar, nspec, &
+                      U_lo, F_l)
+
+        call consFlux(idir, gamma, idens, ixmom, iymom, iener, irhoX, nvar, nspec, &
+                      U_hi, F_r)
+
+        F(i,j,:) = 0.5d0*(F_l(:) + F_r(:)) - 0.5d0*S*(U_hi(:) - U_lo(:))
+
+     enddo
+  enddo
+end subroutine riemann_rusanov
+
+
+subroutine wave_state(idir, gamma, idens, ixmom, iymom, iener, nvar, &
+                      U_state, rho, un, ut, p, c)
+
+  ! return the density, normal and transverse velocity, pressure,
+  ! and sound speed of a conserved state
+
+  integer, intent(in) :: idir
+  double precision, intent(in) :: gamma
+  integer, intent(in) :: idens, ixmom, iymom, iener, nvar
+  double precision, intent(in) :: U_state(0:nvar-1)
+  double precision, intent(out) :: rho, un, ut, p, c
+
+  double precision, parameter :: smallc = 1.e-10
+  double precision, parameter :: smallp = 1.e-10
+
+  rho = U_state(idens)
+
+  if (idir == 1) then
+     un = U_state(ixmom)/rho
+     ut = U_state(iymom)/rho
+  else
+     un = U_state(iymom)/rho
+     ut = U_state(ixmom)/rho
+  endif
+
+  p = (U_state(iener) - 0.5d0*rho*(un**2 + ut**2))*(gamma - 1.0d0)
+  p = max(p, smallp)
+
+  c = max(smallc, sqrt(gamma*p/rho))
+
+end subroutine wave_state
+
+
+subroutine solid_mirror(idir, i, j, ilo, ihi, jlo, jhi, ixmom, iymom, nvar, &
+                        lower_solid, upper_solid, U_lo, U_hi)
+
+  ! if interface (i,j) is on a solid wall, replace the state outside
+  ! the domain with the interior state reflected through the wall
+
+  integer, intent(in) :: idir, i, j, ilo, ihi, jlo, jhi
+  integer, intent(in) :: ixmom, iymom, nvar
+  integer, intent(in) :: lower_solid, upper_solid
+  double precision, intent(inout) :: U_lo(0:nvar-1), U_hi(0:nvar-1)
+
+  integer :: ilow, ihigh, inorm
+
+  if (idir == 1) then
+     ilow = i - ilo
+     ihigh = i - (ihi+1)
+     inorm = ixmom
+  else
+     ilow = j - jlo
+     ihigh = j - (jhi+1)
+     inorm = iymom
+  endif
+
+  if (ilow == 0 .and. lower_solid == 1) then
+     U_lo(:) = U_hi(:)
+     U_lo(inorm) = -U_hi(inorm)
+  endif
+
+  if (ihigh == 0 .and. upper_solid == 1) then
+     U_hi(:) = U_lo(:)
+     U_hi(inorm) = -U_lo(inorm)
+  endif
+
+end subroutine solid_mirror
+
 subroutine consFlux(idir, gamma, idens, ixmom, iymom, iener, irhoX, nvar, nspec, U_state, F)
 
   integer, intent(in) :: idir
@@ -872,6 +1126,7 @@ subroutine artificial_viscosity(qx, qy, ng, dx, dy, &
 !f2py depend(qx, qy) :: avisco_x, avisco_y
 !f2py intent(in) :: u, v
 !f2py intent(out) :: avisco_x, avisco_y
+!f2py threadsafe
 
   ! compute the artifical viscosity.  Here, we compute edge-centered
   ! approximations to the divergence of the velocity.  This follows
@@ -8,11 +8,13 @@ import matplotlib.pyplot as plt
 import compressible.BC as BC
 import compressible.eos as eos
 import compressible.derives as derives
+import mesh.amr as amr
 import mesh.boundary as bnd
 import mesh.patch as patch
 from simulation_null import NullSimulation, grid_setup, bc_setup
 import compressible.unsplit_fluxes as flx
 import util.plot_tools as plot_tools
+from util import msg, profile
 
 class Variables(object):
     """
@@ -54,7 +56,8 @@ class Variables(object):
 def cons_to_prim(U, gamma, ivars, myg):
     """ convert an input vector of conserved variables to primitive variables """
 
-    q = myg.scratch_array(nvar=ivars.nq)
+    # every component is set below, so the pooled array need not be zeroed
+    q = myg.pooled_array(nvar=ivars.nq, zero=False)
 
     q[:,:,ivars.irho] = U[:,:,ivars.idens]
     q[:,:,ivars.iu] = U[:,:,ivars.ixmom]/U[:,:,ivars.idens]
@@ -74,10 +77,25 @@ def cons_to_prim(U, gamma, ivars, myg):
     return q
 
 
+def get_primitives(myd, ivars=None):
+    """
+    return the primitive variable array q for the current state in the
+    CellCenterData2d object myd.  This is computed (with cons_to_prim)
+    once per state and cached in myd, so the timestep, flux, and
+    visualization code all share it.  It is read-only.
+    """
+
+    def compute(d):
+        iv = Variables(d) if ivars is None else ivars
+        return cons_to_prim(d.data, d.get_aux("gamma"), iv, d.grid)
+
+    return myd.get_cached("primitive-state", compute)
+
+
 def prim_to_cons(q, gamma, ivars, myg):
     """ convert an input vector of primitive variables to conserved variables """
 
-    U = myg.scratch_array(nvar=ivars.nvar)
+    U = myg.pooled_array(nvar=ivars.nvar, zero=False)
 
     U[:,:,ivars.idens] = q[:,:,ivars.irho]
     U[:,:,ivars.ixmom] = q[:,:,ivars.iu]*U[:,:,ivars.idens]
@@ -98,13 +116,21 @@ def prim_to_cons(q, gamma, ivars, myg):
 
 class Simulation(NullSimulation):
 
+    decomposable = True
+
+    # can the evolution be done on an AMR hierarchy (see amr.max_levels)?
+    adaptive = True
+
+    # the AMR hierarchy, if we are refining
+    amr = None
+
     def initialize(self, extra_vars=None):
         """
         Initialize the grid and variables for compressible flow and set
         the initial conditions for the chosen problem.
         """
         my_grid = grid_setup(self.rp, ng=4)
-        my_data = patch.CellCenterData2d(my_grid)
+        my_data = patch.CellCenterData2d(my_grid, lazy_bcs=self.rp.get_param("mesh.lazy_bcs"))
 
         # define solver specific boundary condition routines
         bnd.define_bc("hse", BC.user, is_solid=False)
@@ -138,7 +164,7 @@ class Simulation(NullSimulation):
 
         # some auxillary data that we'll need to fill GC in, but isn't
         # really part of the main solution
-        aux_data = patch.CellCenterData2d(my_grid)
+        aux_data = patch.CellCenterData2d(my_grid, lazy_bcs=self.rp.get_param("mesh.lazy_bcs"))
         aux_data.register_var("ymom_src", bc_yodd)
         aux_data.register_var("E_src", bc)
         aux_data.create()
@@ -156,6 +182,54 @@ class Simulation(NullSimulation):
 
         if self.verbose > 0: print(my_data)
 
+        # adaptive mesh refinement -- the refined levels start out
+        # interpolated from the base grid
+        max_levels = self.rp.get_param("amr.max_levels")
+
+        if max_levels > 1:
+            if not self.adaptive:
+                msg.fail("ERROR: the {} solver does not support AMR".format(self.solver_name))
+
+            self.amr = amr.AMRHierarchy(self.cc_data, aux=self.aux_data,
+                                        max_levels=max_levels,
+                                        block_size=self.rp.get_param("amr.block_size"),
+                                        buffer=self.rp.get_param("amr.buffer"),
+                                        admissible=self.admissible)
+            self.amr.regrid(self.tag_cells)
+
+            if self.verbose > 0: print(self.amr)
+
+
+    def admissible(self, my_data):
+        """
+        Return a boolean array over all of the zones of my_data that is
+        True where the density and pressure are positive.  This is
+        used to check the data interpolated onto the AMR patches.
+        """
+
+        q = get_primitives(my_data, self.ivars)
+
+        return (q[:,:,self.ivars.irho] > 0.0) & (q[:,:,self.ivars.ip] > 0.0)
+
+
+    def tag_cells(self, my_data):
+        """
+        The AMR refinement criterion: return a boolean array over the
+        valid zones of my_data that is True where we want to refine.
+        This is the problem's tag_cells(my_data, rp), if it has one,
+        and otherwise a relative jump of more than amr.refine_thresh in
+        amr.refine_var between neighboring zones.
+        """
+
+        problem = importlib.import_module("{}.problems.{}".format(
+            self.solver_name, self.problem_name))
+
+        if hasattr(problem, "tag_cells"):
+            return problem.tag_cells(my_data, self.rp)
+
+        return amr.gradient_tags(my_data, self.rp.get_param("amr.refine_var"),
+                                 self.rp.get_param("amr.refine_thresh"))
+
 
     def method_compute_timestep(self):
         """
@@ -169,14 +243,27 @@ class Simulation(NullSimulation):
 
         cfl = self.rp.get_param("driver.cfl")
 
-        # get the variables we need
-        u, v, cs = self.cc_data.get_var(["velocity", "soundspeed"])
+        def timestep(my_data, box=np.s_[:,:]):
+            # get the variables we need
+            u, v, cs = (q[box] for q in my_data.get_var(["velocity", "soundspeed"]))
 
-        # the timestep is min(dx/(|u| + cs), dy/(|v| + cs))
-        xtmp = self.cc_data.grid.dx/(abs(u) + cs)
-        ytmp = self.cc_data.grid.dy/(abs(v) + cs)
+            # the timestep is min(dx/(|u| + cs), dy/(|v| + cs))
+            xtmp = my_data.grid.dx/(abs(u) + cs)
+            ytmp = my_data.grid.dy/(abs(v) + cs)
 
-        self.dt = cfl*float(min(xtmp.min(), ytmp.min()))
+            return cfl*float(min(xtmp.min(), ytmp.min()))
+
+        self.dt = timestep(self.cc_data)
+
+        # with AMR, level l takes 2**l steps for each step of the base.
+        # The ghost cells of the patches are only filled when they
+        # are stepped, so just their valid zones count
+        if self.amr is not None:
+            for level in self.amr.levels[1:]:
+                for p in level.patches:
+                    g = p.grid
+                    self.dt = min(self.dt, 2**level.n*timestep(
+                        p.data, np.s_[g.ilo:g.ihi+1, g.jlo:g.jhi+1]))
 
 
     def evolve(self):
@@ -188,40 +275,143 @@ class Simulation(NullSimulation):
         tm_evolve = self.tc.timer("evolve")
         tm_evolve.begin()
 
-        dens = self.cc_data.get_var("density")
-        ymom = self.cc_data.get_var("y-momentum")
-        ener = self.cc_data.get_var("energy")
+        if self.amr is not None:
+            self.evolve_amr()
+        elif self.tiler.nthreads > 1:
+            self.evolve_tiles()
+        else:
+            self.update(self.cc_data, self.aux_data, self.solid, self.dt)
+
+        # increment the time
+        self.cc_data.t += self.dt
+        self.n += 1
+
+        tm_evolve.end()
+
+
+    def update(self, my_data, my_aux, solid, dt):
+        """
+        Do the conservative update of the state in my_data (with its
+        ghost cells filled) through dt, using my_aux for the source
+        terms.  Return the x and y interface fluxes.
+        """
 
         grav = self.rp.get_param("compressible.grav")
 
-        myg = self.cc_data.grid
+        myg = my_data.grid
 
-        Flux_x, Flux_y = flx.unsplit_fluxes(self.cc_data, self.aux_data, self.rp,
-                                            self.ivars, self.solid, self.tc, self.dt)
+        # the fluxes are computed before we get any of the variables
+        # here, so they can use the primitive variables cached by the
+        # timestep computation
+        Flux_x, Flux_y = flx.unsplit_fluxes(my_data, my_aux, self.rp,
+                                            self.ivars, solid, self.tc, dt)
 
-        old_dens = dens.copy()
-        old_ymom = ymom.copy()
+        dens = my_data.get_var("density")
+        ymom = my_data.get_var("y-momentum")
+        ener = my_data.get_var("energy")
+
+        old_dens = dens.v().copy()
+        old_ymom = ymom.v().copy()
 
         # conservative update
-        dtdx = self.dt/myg.dx
-        dtdy = self.dt/myg.dy
+        dtdx = dt/myg.dx
+        dtdy = dt/myg.dy
 
         for n in range(self.ivars.nvar):
-            var = self.cc_data.get_var_by_index(n)
+            var = my_data.get_var_by_index(n)
 
             var.v()[:,:] += \
                 dtdx*(Flux_x.v(n=n) - Flux_x.ip(1, n=n)) + \
                 dtdy*(Flux_y.v(n=n) - Flux_y.jp(1, n=n))
 
-        # gravitational source terms
-        ymom[:,:] += 0.5*self.dt*(dens[:,:] + old_dens[:,:])*grav
-        ener[:,:] += 0.5*self.dt*(ymom[:,:] + old_ymom[:,:])*grav
+        # gravitational source terms -- only in the valid zones, like
+        # the flux update (the ghost cells are refilled by the BCs)
+        ymom.v()[:,:] += 0.5*dt*(dens.v() + old_dens)*grav
+        ener.v()[:,:] += 0.5*dt*(ymom.v() + old_ymom)*grav
 
-        # increment the time
-        self.cc_data.t += self.dt
-        self.n += 1
+        return Flux_x, Flux_y
 
-        tm_evolve.end()
+
+    def evolve_amr(self):
+        """
+        Evolve the AMR hierarchy through the timestep dt of the base
+        grid, regridding first every amr.regrid_interval steps.
+        """
+
+        interval = self.rp.get_param("amr.regrid_interval")
+
+        if self.n > 0 and interval > 0 and self.n % interval == 0:
+            self.amr.regrid(self.tag_cells)
+
+        def step(p, dt):
+            return self.update(p.data, p.aux, p.solid(self.solid), dt)
+
+        self.amr.advance(self.dt, step)
+
+
+    def evolve_tiles(self):
+        """
+        Do the update of evolve() on the tiles of the grid, using
+        driver.nthreads threads.  The fluxes are found for all of the
+        tiles first (reading the state, including the ghost cells
+        that overlap the neighboring tiles), and then each tile
+        updates its valid zones.  This gives the same result as the
+        serial update.
+        """
+
+        grav = self.rp.get_param("compressible.grav")
+
+        myg = self.cc_data.grid
+
+        # the views are made first, so they pick up the primitive
+        # variables cached by the timestep computation
+        tiles = self.tiler.tiles(myg)
+        views = [self.cc_data.tile_view(t) for t in tiles]
+        aux_views = [self.aux_data.tile_view(t) for t in tiles]
+
+        # the source terms need their ghost cells filled, so they are
+        # done for the whole grid
+        flx.source_terms(self.cc_data, self.aux_data, self.rp)
+
+        tm_flux = self.tc.timer("unsplitFluxes")
+        tm_flux.begin()
+
+        def fluxes(tile, my_data, my_aux):
+            # the timers are not thread-safe, so each tile has its own
+            return flx.unsplit_fluxes(my_data, my_aux, self.rp, self.ivars,
+                                      tile.solid(self.solid), profile.TimerCollection(),
+                                      self.dt, fill_sources=False)
+
+        tile_fluxes = self.tiler.map(fluxes, tiles, views, aux_views)
+
+        tm_flux.end()
+
+        dtdx = self.dt/myg.dx
+        dtdy = self.dt/myg.dy
+
+        def update(my_data, Flux_x, Flux_y):
+            dens = my_data.get_var("density")
+            ymom = my_data.get_var("y-momentum")
+            ener = my_data.get_var("energy")
+
+            old_dens = dens.v().copy()
+            old_ymom = ymom.v().copy()
+
+            for n in range(self.ivars.nvar):
+                var = my_data.get_var_by_index(n)
+
+                var.v()[:,:] += \
+                    dtdx*(Flux_x.v(n=n) - Flux_x.ip(1, n=n)) + \
+                    dtdy*(Flux_y.v(n=n) - Flux_y.jp(1, n=n))
+
+            # gravitational source terms -- only in the valid zones,
+            # since the ghost cells belong to the neighboring tiles
+            ymom.v()[:,:] += 0.5*self.dt*(dens.v() + old_dens)*grav
+            ener.v()[:,:] += 0.5*self.dt*(ymom.v() + old_ymom)*grav
+
+        self.tiler.map(update, views, *zip(*tile_fluxes))
+
+        self.cc_data.mark_dirty()
 
 
     def dovis(self):
@@ -241,7 +431,7 @@ class Simulation(NullSimulation):
         # outside of a running simulation.
         gamma = self.cc_data.get_aux("gamma")
 
-        q = cons_to_prim(self.cc_data.data, gamma, ivars, self.cc_data.grid)
+        q = get_primitives(self.cc_data, ivars)
 
         rho = q[:,:,ivars.irho]
         u = q[:,:,ivars.iu]
@@ -253,6 +443,12 @@ class Simulation(NullSimulation):
 
         myg = self.cc_data.grid
 
+        # the outlines of the AMR patches
+        boxes = []
+        if self.amr is not None:
+            for level in self.amr.levels[1:]:
+                boxes += [p.grid for p in level.patches]
+
         fields = [rho, magvel, p, e]
         field_names = [r"$\rho$", r"U", "p", "e"]
 
@@ -269,6 +465,10 @@ class Simulation(NullSimulation):
             ax.set_xlabel("x")
             ax.set_ylabel("y")
 
+            for g in boxes:
+                ax.add_patch(plt.Rectangle((g.xmin, g.ymin), g.xmax - g.xmin, g.ymax - g.ymin,
+                                           fill=False, edgecolor="w", linewidth=0.5))
+
             # needed for PDF rendering
             cb = axes.cbar_axes[n].colorbar(img)
             cb.solids.set_rasterized(True)
@@ -295,3 +495,16 @@ class Simulation(NullSimulation):
 
         # the value here is the value of "is_solid"
         gb.create_dataset("hse", data=False)
+
+        if self.amr is not None:
+            self.amr.write(f)
+
+
+    def read_extras(self, f):
+        """
+        Read in the AMR hierarchy (if any) from the h5py file f
+        """
+
+        if "amr" in f:
+            self.amr = amr.AMRHierarchy.read(f["amr"], self.cc_data,
+                                             aux=getattr(self, "aux_data", None))
@@ -0,0 +1,135 @@
+# tests of checkpointing and restarting a simulation
+import os
+import signal
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import compressible
+from util import runparams
+
+from numpy.testing import assert_array_equal
+
+
+def _make_sim(*params):
+    rp = runparams.RuntimeParameters()
+    rp.load_params("_defaults")
+    rp.load_params("compressible/_defaults")
+    rp.load_params("compressible/problems/_sedov.defaults")
+    rp.load_params("compressible/problems/inputs.sedov", no_new=1)
+    rp.command_line_params(["mesh.nx=16", "mesh.ny=16", "driver.verbose=0",
+                            "io.chk_keep=2"] + list(params))
+
+    return compressible.Simulation("compressible", "sedov", rp)
+
+
+def _step(sim):
+    sim.cc_data.fill_BC_all()
+    sim.compute_timestep()
+    sim.evolve()
+
+
+@pytest.mark.parametrize("params", [[], ["amr.max_levels=2"], ["io.async_write=1"],
+                                    ["io.compression=gzip", "io.precision=single"],
+                                    ["io.format=npy"], ["io.format=npz", "amr.max_levels=2"]])
+def test_restart(tmp_path, params):
+
+    # a straight run, checkpointing half way
+    sim = _make_sim(*params)
+    sim.initialize()
+    sim.preevolve()
+
+    for _ in range(5):
+        _step(sim)
+
+    sim.checkpoint(str(tmp_path / "chk"))
+
+    for _ in range(5):
+        _step(sim)
+
+    sim.flush_output()
+
+    # a restarted run should give the same answer, bit for bit
+    new = _make_sim(*params)
+    new.restart(str(tmp_path / "chk"))
+
+    assert new.n == 5
+    assert new.dt_old > 0.0
+
+    for _ in range(5):
+        _step(new)
+
+    assert new.n == sim.n
+    assert new.cc_data.t == sim.cc_data.t
+    assert_array_equal(new.cc_data.data, sim.cc_data.data)
+
+    if sim.amr is not None:
+        assert new.amr.nlevels() == sim.amr.nlevels()
+
+
+@pytest.mark.parametrize("file_format, ext", [("hdf5", ".h5"), ("npy", ".npyd")])
+def test_retention(tmp_path, file_format, ext):
+
+    sim = _make_sim("io.format={}".format(file_format))
+    sim.initialize()
+
+    for n in range(4):
+        sim.checkpoint(str(tmp_path / "chk{}".format(n)))
+
+    assert sorted(os.listdir(str(tmp_path))) == ["chk2" + ext, "chk3" + ext]
+
+
+def test_not_checkpoint(tmp_path):
+
+    sim = _make_sim()
+    sim.initialize()
+    sim.write(str(tmp_path / "plt"))
+
+    with pytest.raises(SystemExit):
+        _make_sim().restart(str(tmp_path / "plt"))
+
+
+def test_sigterm(tmp_path):
+
+    # a run stopped by SIGTERM checkpoints, and does not report success
+    basename = str(tmp_path / "sedov_")
+
+    # pyro.py runs from the top of the source tree, and writes
+    # inputs.auto there -- leave it as we found it
+    top = os.path.dirname(os.path.dirname(os.path.abspath(compressible.__file__)))
+    inputs_auto = os.path.join(top, "inputs.auto")
+
+    try:
+        with open(inputs_auto) as f:
+            old_inputs = f.read()
+    except IOError:
+        old_inputs = None
+
+    try:
+        p = subprocess.Popen([sys.executable, os.path.join(top, "pyro.py"),
+                              "compressible", "sedov", "inputs.sedov",
+                              "mesh.nx=16", "mesh.ny=16", "driver.max_steps=100000",
+                              "driver.tmax=1.e10", "driver.verbose=1", "io.do_io=0",
+                              "vis.dovis=0", "io.basename={}".format(basename)],
+                             cwd=top, stdout=subprocess.PIPE, universal_newlines=True)
+
+        # wait until it is evolving
+        for line in p.stdout:
+            if line.split()[:1] == ["1"]:
+                break
+
+        p.send_signal(signal.SIGTERM)
+        p.communicate()
+
+    finally:
+        if old_inputs is None:
+            if os.path.isfile(inputs_auto):
+                os.remove(inputs_auto)
+        else:
+            with open(inputs_auto, "w") as f:
+                f.write(old_inputs)
+
+    assert p.returncode == 128 + signal.SIGTERM
+    assert any(f.startswith("sedov_chk") for f in os.listdir(str(tmp_path)))
@@ -13,6 +13,12 @@ discussed in the Colella paper).
 
   riemann          = HLLC to use the HLLC solver
                    = CGF to use the Colella, Glaz, and Ferguson solver
+                   = HLLE to use the (cheaper, more diffusive) HLLE solver
+                   = Rusanov to use the Rusanov (local Lax-Friedrichs) flux
+
+  riemann_backend  = fortran to use the compiled solvers in interface_f
+                   = numpy to use the whole-array versions in
+                     compressible/riemann.py
 
   use_flattening   = 1 to use the multidimensional flattening
                      algorithm at shocks
@@ -126,13 +132,46 @@ Updating U_{i,j}:
 
 import compressible.eos as eos
 import compressible.interface_f as ifc
+import compressible.riemann as riemann_np
 import compressible as comp
 import mesh.reconstruction as reconstruction
 import mesh.array_indexer as ai
 
 from util import msg
 
-def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
+
+def source_terms(my_data, my_aux, rp):
+    """
+    store the gravitational source terms for the momentum and energy
+    equations in my_aux and fill their ghost cells
+
+    Parameters
+    ----------
+    my_data : CellCenterData2d object
+        The data object containing the conserved state
+    my_aux : CellCenterData2d object
+        The data object holding the source terms
+    rp : RuntimeParameters object
+        The runtime parameters for the simulation
+    """
+
+    grav = rp.get_param("compressible.grav")
+
+    dens = my_data.get_var("density")
+    ymom = my_data.get_var("y-momentum")
+
+    # these are computed in the ghost cells too, since on an AMR
+    # patch, the BCs only fill those on the physical boundaries
+    ymom_src = my_aux.get_var("ymom_src")
+    ymom_src[:,:] = dens[:,:]*grav
+    my_aux.fill_BC("ymom_src")
+
+    E_src = my_aux.get_var("E_src")
+    E_src[:,:] = ymom[:,:]*grav
+    my_aux.fill_BC("E_src")
+
+
+def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt, fill_sources=True):
     """
     unsplitFluxes returns the fluxes through the x and y interfaces by
     doing an unsplit reconstruction of the interface values and then
@@ -157,6 +196,11 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
         The timers we are using to profile
     dt : float
         The timestep we are advancing through.
+    fill_sources : bool, optional
+        Compute the source terms in my_aux (with source_terms).  If
+        False, they must already be there -- this is how the fluxes
+        are computed on a tile, since the tiles cannot fill their own
+        ghost cells.
 
     Returns
     -------
@@ -177,11 +221,7 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     #=========================================================================
     # Q = (rho, u, v, p, {X})
 
-    dens = my_data.get_var("density")
-    ymom = my_data.get_var("y-momentum")
-    ener = my_data.get_var("energy")
-
-    q = comp.cons_to_prim(my_data.data, gamma, ivars, myg)
+    q = comp.get_primitives(my_data, ivars)
 
 
     #=========================================================================
@@ -206,12 +246,17 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
 
     limiter = rp.get_param("compressible.limiter")
 
-    ldx = myg.scratch_array(nvar=ivars.nvar)
-    ldy = myg.scratch_array(nvar=ivars.nvar)
+    ldx = myg.pooled_array(nvar=ivars.nvar, zero=False)
+    ldy = myg.pooled_array(nvar=ivars.nvar, zero=False)
 
     for n in range(ivars.nvar):
-        ldx[:,:,n] = xi*reconstruction.limit(q[:,:,n], myg, 1, limiter)
-        ldy[:,:,n] = xi*reconstruction.limit(q[:,:,n], myg, 2, limiter)
+        lda = reconstruction.limit(q[:,:,n], myg, 1, limiter)
+        ldx[:,:,n] = xi*lda
+        myg.release(lda)
+
+        lda = reconstruction.limit(q[:,:,n], myg, 2, limiter)
+        ldy[:,:,n] = xi*lda
+        myg.release(lda)
 
     tm_limit.end()
 
@@ -232,6 +277,8 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
 
     tm_states.end()
 
+    myg.release(ldx)
+
 
     # transform interface states back into conserved variables
     U_xl = comp.prim_to_cons(V_l, gamma, ivars, myg)
@@ -254,6 +301,8 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
 
     tm_states.end()
 
+    myg.release(ldy)
+
 
     # transform interface states back into conserved variables
     U_yl = comp.prim_to_cons(V_l, gamma, ivars, myg)
@@ -263,15 +312,11 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     #=========================================================================
     # apply source terms
     #=========================================================================
-    grav = rp.get_param("compressible.grav")
+    if fill_sources:
+        source_terms(my_data, my_aux, rp)
 
     ymom_src = my_aux.get_var("ymom_src")
-    ymom_src.v()[:,:] = dens.v()*grav
-    my_aux.fill_BC("ymom_src")
-
     E_src = my_aux.get_var("E_src")
-    E_src.v()[:,:] = ymom.v()*grav
-    my_aux.fill_BC("E_src")
 
     # ymom_xl[i,j] += 0.5*dt*dens[i-1,j]*grav
     U_xl.v(buf=1, n=ivars.iymom)[:,:] += 0.5*dt*ymom_src.ip(-1, buf=1)
@@ -297,11 +342,23 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     tm_riem.begin()
 
     riemann = rp.get_param("compressible.riemann")
+    backend = rp.get_param("compressible.riemann_backend")
+
+    if backend == "fortran":
+        solvers = ifc
+    elif backend == "numpy":
+        solvers = riemann_np
+    else:
+        msg.fail("ERROR: Riemann backend undefined")
 
     if riemann == "HLLC":
-        riemannFunc = ifc.riemann_hllc
+        riemannFunc = solvers.riemann_hllc
     elif riemann == "CGF":
-        riemannFunc = ifc.riemann_cgf
+        riemannFunc = solvers.riemann_cgf
+    elif riemann == "HLLE":
+        riemannFunc = solvers.riemann_hlle
+    elif riemann == "Rusanov":
+        riemannFunc = solvers.riemann_rusanov
     else:
         msg.fail("ERROR: Riemann solver undefined")
 
@@ -421,6 +478,8 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
 
     tm_riem.end()
 
+    myg.release(U_xl, U_xr, U_yl, U_yr)
+
     #=========================================================================
     # apply artificial viscosity
     #=========================================================================
@@ -0,0 +1,162 @@
+"""
+The reaction network for the reacting compressible solver, and an
+implicit integrator for it that works on many zones at once.
+
+The network is a single reaction, fuel -> ash, with the rate (per unit
+mass)
+
+  omega = rate X_fuel exp(-t_act/T)
+
+where T = p/rho = (gamma - 1) e, and each unit of fuel burned releases
+q_burn of energy.  The state of a zone is y = (X_fuel, X_ash, e), with
+the energy last, so for n zones, y has shape (n, nvar).
+
+burn() integrates the network over dt with a fourth-order Rosenbrock
+method: Kaps & Rentrop (1979), with the parameters of Shampine (1982).
+Each zone takes its own substeps, chosen by comparing to an embedded
+third-order solution.  Each substep works on all of the zones that
+are still burning at once, using the analytic Jacobian.  Zones drop
+out of the batch (the arrays are compacted) when they reach dt.
+"""
+
+import numpy as np
+
+from util import msg
+
+
+class Network(object):
+    """the fuel -> ash network"""
+
+    names = ["fuel", "ash"]
+
+    def __init__(self, gamma, rate, t_act, q_burn, small_temp=1.e-10):
+        self.gamma = gamma
+        self.rate = rate
+        self.t_act = t_act
+        self.q_burn = q_burn
+
+        # iterates and substeps can overshoot, so we keep T positive
+        self.small_temp = small_temp
+
+        self.nspec = len(self.names)
+        self.nvar = self.nspec + 1
+
+    def temperature(self, e):
+        """the temperature for the specific internal energy e"""
+        return np.maximum((self.gamma - 1.0)*e, self.small_temp)
+
+    def omega(self, y):
+        """the reaction rate for the states y.  X_fuel is not limited,
+        so burning drives it to 0 from either side"""
+        T = self.temperature(y[..., -1])
+        return self.rate*y[..., 0]*np.exp(-self.t_act/T)
+
+    def rhs(self, y):
+        """dy/dt for the states y"""
+        omega = self.omega(y)
+
+        f = np.empty_like(y)
+        f[..., 0] = -omega
+        f[..., 1] = omega
+        f[..., 2] = self.q_burn*omega
+
+        return f
+
+    def jac(self, y):
+        """the analytic Jacobian, df/dy, for the states y, with shape
+        y.shape + (nvar,)"""
+        T = self.temperature(y[..., -1])
+
+        domega_dX = self.rate*np.exp(-self.t_act/T)
+        domega_de = y[..., 0]*domega_dX*self.t_act*(self.gamma - 1.0)/T**2
+
+        J = np.zeros(y.shape + (self.nvar,))
+        J[..., 0, 0] = -domega_dX
+        J[..., 0, 2] = -domega_de
+        J[..., 1, 0] = domega_dX
+        J[..., 1, 2] = domega_de
+        J[..., 2, 0] = self.q_burn*domega_dX
+        J[..., 2, 2] = self.q_burn*domega_de
+
+        return J
+
+
+# the Rosenbrock coefficients -- the stages are
+#
+#   (I/(gamma h) - J) g_i = f(y + sum_j a_ij g_j) + sum_j c_ij g_j/h
+#
+# and the update is y + sum_i b_i g_i, with the error estimate
+# sum_i e_i g_i.  The last stage uses the same state as the third.
+_gamma = 0.5
+
+_a21 = 2.0
+_a31, _a32 = 48./25., 6./25.
+
+_c21 = -8.0
+_c31, _c32 = 372./25., 12./5.
+_c41, _c42, _c43 = -112./125., -54./125., -2./5.
+
+_b = [19./9., 0.5, 25./108., 125./108.]
+_e = [17./54., 7./36., 0.0, 125./108.]
+
+
+def _mult(A, v):
+    """the matrix-vector products A v for each zone"""
+    return np.einsum("nij,nj->ni", A, v)
+
+
+def burn(net, y, dt, rtol=1.e-6, atol=1.e-10, max_steps=1000):
+    """integrate dy/dt = net.rhs(y) through dt for the zones y (shape
+    (n, nvar)), in place.  Returns the total number of substeps taken
+    by the zones, including the rejected ones"""
+
+    n = y.shape[0]
+    eye = np.eye(net.nvar)
+
+    t = np.zeros(n)
+    h = np.full(n, dt)
+
+    # the zones still burning
+    active = np.arange(n)
+
+    nsteps = 0
+
+    for _ in range(max_steps):
+        if active.size == 0:
+            return nsteps
+
+        nsteps += active.size
+
+        ya = y[active]
+        ha = h[active, np.newaxis]
+
+        # all of the stages share the matrix
+        A_inv = np.linalg.inv(eye/(_gamma*ha[..., np.newaxis]) - net.jac(ya))
+
+        g1 = _mult(A_inv, net.rhs(ya))
+        g2 = _mult(A_inv, net.rhs(ya + _a21*g1) + _c21*g1/ha)
+
+        f3 = net.rhs(ya + _a31*g1 + _a32*g2)
+        g3 = _mult(A_inv, f3 + (_c31*g1 + _c32*g2)/ha)
+        g4 = _mult(A_inv, f3 + (_c41*g1 + _c42*g2 + _c43*g3)/ha)
+
+        y_new = ya + _b[0]*g1 + _b[1]*g2 + _b[2]*g3 + _b[3]*g4
+
+        err = _e[0]*g1 + _e[1]*g2 + _e[2]*g3 + _e[3]*g4
+        scale = atol + rtol*np.maximum(abs(ya), abs(y_new))
+        err_norm = np.sqrt(np.mean((err/scale)**2, axis=1))
+
+        accept = err_norm <= 1.0
+        done = active[accept]
+
+        y[done] = y_new[accept]
+        t[done] += h[done]
+
+        # the next substep, which cannot go past dt
+        factor = 0.9*np.maximum(err_norm, 1.e-10)**(-0.25)
+        h[active] *= np.clip(factor, 0.2, 5.0)
+        h[active] = np.minimum(h[active], dt - t[active])
+
+        active = active[dt - t[active] > 1.e-12*dt]
+
+    msg.fail("ERROR: burning did not finish in {} substeps".format(max_steps))
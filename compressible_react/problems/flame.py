@@ -7,13 +7,13 @@ from util import msg
 import math
 
 def init_data(my_data, rp):
-    """ initialize the sedov problem """
+    """ initialize the flame problem -- a sedov explosion in fuel """
 
-    msg.bold("initializing the sedov problem...")
+    msg.bold("initializing the flame problem...")
 
     # make sure that we are passed a valid patch object
     if not isinstance(my_data, patch.CellCenterData2d):
-        print("ERROR: patch invalid in sedov.py")
+        print("ERROR: patch invalid in flame.py")
         print(my_data.__class__)
         sys.exit()
 
@@ -22,6 +22,8 @@ def init_data(my_data, rp):
     xmom = my_data.get_var("x-momentum")
     ymom = my_data.get_var("y-momentum")
     ener = my_data.get_var("energy")
+    fuel = my_data.get_var("fuel")
+    ash = my_data.get_var("ash")
 
     # initialize the components, remember, that ener here is rho*eint
     # + 0.5*rho*v**2, where eint is the specific internal energy
@@ -30,6 +32,10 @@ def init_data(my_data, rp):
     xmom[:,:] = 0.0
     ymom[:,:] = 0.0
 
+    # everything starts out as fuel (these are partial densities)
+    fuel[:,:] = dens[:,:]
+    ash[:,:] = 0.0
+
     E_sedov = 1.0
 
     r_init = rp.get_param("sedov.r_init")
@@ -4,14 +4,25 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 
+import mesh.boundary as bnd
 import mesh.integration as integration
+import mesh.patch as patch
+import multigrid.general_MG as gMG
 import compressible
 import compressible.eos as eos
+import compressible_rk.fluxes as flx
+import compressible_react.burning as burning
+from util import msg
 
 import util.plot_tools as plot_tools
 
 class Simulation(compressible.Simulation):
 
+    # burning and diffusion are only done on the base grid, and the
+    # diffusion solve is global
+    adaptive = False
+    decomposable = False
+
     def initialize(self):
         """
         For the reacting compressible solver, our initialization of
@@ -20,26 +31,230 @@ class Simulation(compressible.Simulation):
         """
         super().initialize(extra_vars=["fuel", "ash"])
 
+        self.coupling = self.rp.get_param("react.coupling")
+        if self.coupling not in ["strang", "imex"]:
+            msg.fail("ERROR: invalid react.coupling: {}".format(self.coupling))
+
+        if self.coupling == "imex":
+            method = self.rp.get_param("compressible.temporal_method")
+            if method not in integration.a_im:
+                msg.fail("ERROR: react.coupling = imex needs an IMEX temporal_method, not {}".format(method))
+
+        self.network = burning.Network(self.cc_data.get_aux("gamma"),
+                                       self.rp.get_param("react.rate"),
+                                       self.rp.get_param("react.t_act"),
+                                       self.rp.get_param("react.q_burn"))
+
+        # the multigrid solver and coefficients for the diffusion
+        self.mg = None
+        self.mg_coeffs = None
+
+
+    def react(self, my_data, dt, solve):
+        """
+        update my_data for the burning over dt, where solve(y) updates
+        the network states y = (X_fuel, X_ash, e) of the burning zones
+        (shape (n, 3)) in place.  A zone only burns if its fuel would
+        change by more than react.burn_thresh over dt at its current
+        rate.  Those zones are gathered into y and then scattered
+        back.  The density and velocity are not changed by burning.
+        """
+
+        tm_burn = self.tc.timer("burn")
+        tm_burn.begin()
+
+        dens = my_data.get_var("density")
+        xmom = my_data.get_var("x-momentum")
+        ymom = my_data.get_var("y-momentum")
+        ener = my_data.get_var("energy")
+        fuel = my_data.get_var("fuel")
+        ash = my_data.get_var("ash")
+
+        rho = dens.v()
+        ke = 0.5*(xmom.v()**2 + ymom.v()**2)/rho
+
+        y = np.stack([fuel.v()/rho, ash.v()/rho, (ener.v() - ke)/rho], axis=-1)
+
+        active = abs(self.network.omega(y))*dt > self.rp.get_param("react.burn_thresh")
+
+        y = y[active]
+        self.tc.count("burn zones", y.shape[0])
+
+        if y.shape[0] > 0:
+            solve(y)
+
+            r = rho[active]
+            fuel.v()[active] = r*y[:, 0]
+            ash.v()[active] = r*y[:, 1]
+            ener.v()[active] = r*y[:, 2] + ke[active]
+
+        tm_burn.end()
+
+
+    def implicit_burn(self, my_data, h):
+        """
+        solve y - h f(y) = y* for the reactions, with a pointwise
+        Newton iteration (using the network's analytic Jacobian) in
+        each burning zone
+        """
+
+        def solve(y):
+            n = integration.newton_solve(y, self.network.rhs, self.network.jac, h,
+                                         rtol=self.rp.get_param("react.newton_tol"))
+            self.tc.count("burn Newton iterations", n)
+
+        self.react(my_data, h, solve)
+
+
+    def _diffusion_mg(self, coeffs):
+        """
+        the multigrid solver for the diffusion, created the first time
+        and then reused with new coefficients
+        """
+        if self.mg is None:
+            myg = self.cc_data.grid
+
+            # the ghost cells are zero-gradient (no conductive flux)
+            # unless the boundary is periodic
+            bcs = {}
+            for edge in ["xl", "xr", "yl", "yr"]:
+                btype = getattr(self.cc_data.BCs["density"], edge + "b")
+                bcs[edge + "_BC_type"] = "periodic" if btype == "periodic" else "neumann"
+
+            self.mg = gMG.GeneralMG2d(myg.nx, myg.ny,
+                                      xmin=myg.xmin, xmax=myg.xmax,
+                                      ymin=myg.ymin, ymax=myg.ymax,
+                                      coeffs=coeffs, verbose=0, **bcs)
+        else:
+            self.mg.set_coeffs(coeffs)
+
+        return self.mg
+
+
+    def implicit_diffuse(self, my_data, h):
+        """
+        solve for the thermal diffusion, rho e - h div (kappa grad T) =
+        rho e*, with T = (gamma - 1) e, using multigrid.  The
+        kinetic energy is not changed.
+        """
+        kappa = self.rp.get_param("react.kappa")
+        if kappa == 0.0:
+            return
+
+        gamma = my_data.get_aux("gamma")
+        myg = my_data.grid
+
+        dens = my_data.get_var("density")
+        xmom = my_data.get_var("x-momentum")
+        ymom = my_data.get_var("y-momentum")
+        ener = my_data.get_var("energy")
+
+        rho = dens.v()
+        ke = 0.5*(xmom.v()**2 + ymom.v()**2)/rho
+
+        # the MG solver's equation is alpha phi + div (beta grad phi) = f
+        if self.mg_coeffs is None:
+            g = patch.Grid2d(myg.nx, myg.ny, ng=1,
+                             xmin=myg.xmin, xmax=myg.xmax,
+                             ymin=myg.ymin, ymax=myg.ymax)
+            self.mg_coeffs = patch.CellCenterData2d(g)
+            bc_c = bnd.BC(xlb="neumann", xrb="neumann",
+                          ylb="neumann", yrb="neumann")
+            for v in ["alpha", "beta", "gamma_x", "gamma_y"]:
+                self.mg_coeffs.register_var(v, bc_c)
+            self.mg_coeffs.create()
+
+        self.mg_coeffs.get_var("alpha").v()[:,:] = rho
+        self.mg_coeffs.get_var("beta")[:,:] = -h*kappa*(gamma - 1.0)
+
+        mg = self._diffusion_mg(self.mg_coeffs)
+
+        f = mg.soln_grid.scratch_array()
+        f.v()[:,:] = ener.v() - ke
+        mg.init_RHS(f)
+        mg.init_zeros()
+
+        mg.solve(rtol=self.rp.get_param("react.mg_tol"))
+
+        ener.v()[:,:] = rho*mg.get_solution().v() + ke
+
+
+    def implicit_solve(self, my_data, h):
+        """
+        the implicit part of an IMEX stage: the burning and then the
+        diffusion.  When both are on, solving them one after the other
+        (instead of together) is first-order accurate in their
+        coupling, but keeps each solve simple and stable.
+        """
+        self.implicit_burn(my_data, h)
+        self.implicit_diffuse(my_data, h)
+
 
     def burn(self, dt):
-        """ react fuel to ash """
-        # compute T
+        """ react fuel to ash over dt """
 
-        # compute energy generation rate
+        def solve(y):
+            n = burning.burn(self.network, y, dt,
+                             rtol=self.rp.get_param("react.burn_rtol"),
+                             atol=self.rp.get_param("react.burn_atol"),
+                             max_steps=self.rp.get_param("react.burn_max_steps"))
+            self.tc.count("burn substeps", n)
 
-        # update energy due to reaction
-        pass
+        self.react(self.cc_data, dt, solve)
 
 
     def diffuse(self, dt):
-        """ diffuse for dt """
+        """ diffuse for dt, with a backward Euler step """
+        self.implicit_diffuse(self.cc_data, dt)
+
+
+    def substep(self, myd):
+        """
+        the explicit part of an IMEX stage: the method-of-lines hydro
+        update (with the gravity sources) for the conserved state myd
+        """
+
+        myg = myd.grid
+        grav = self.rp.get_param("compressible.grav")
 
-        # compute T
+        flux_x, flux_y = flx.fluxes(myd, self.rp,
+                                    self.ivars, self.solid, self.tc)
 
-        # compute div kappa grad T
+        dens = myd.get_var("density")
+        ymom = myd.get_var("y-momentum")
 
-        # update energy due to diffusion
-        pass
+        k = myg.scratch_array(nvar=self.ivars.nvar)
+
+        for n in range(self.ivars.nvar):
+            k.v(n=n)[:,:] = \
+               (flux_x.v(n=n) - flux_x.ip(1, n=n))/myg.dx + \
+               (flux_y.v(n=n) - flux_y.jp(1, n=n))/myg.dy
+
+        k.v(n=self.ivars.iymom)[:,:] += dens.v()*grav
+        k.v(n=self.ivars.iener)[:,:] += ymom.v()*grav
+
+        return k
+
+
+    def method_compute_timestep(self):
+        """
+        The timestep is set by the hydro CFL constraint alone -- the
+        burning and diffusion are implicit.  With IMEX coupling, this
+        is the method-of-lines constraint, as in compressible_rk.
+        """
+
+        if self.coupling == "strang":
+            super().method_compute_timestep()
+            return
+
+        cfl = self.rp.get_param("driver.cfl")
+
+        u, v, cs = self.cc_data.get_var(["velocity", "soundspeed"])
+
+        xtmp = (abs(u) + cs)/self.cc_data.grid.dx
+        ytmp = (abs(v) + cs)/self.cc_data.grid.dy
+
+        self.dt = cfl*float(np.min(1.0/(xtmp + ytmp)))
 
 
     def evolve(self):
@@ -48,11 +263,27 @@ class Simulation(compressible.Simulation):
         timestep dt.
         """
 
+        if self.coupling == "imex":
+            tm_evolve = self.tc.timer("evolve")
+            tm_evolve.begin()
+
+            myd = self.cc_data
+            self.rk_evolve(myd, self.rp.get_param("compressible.temporal_method"))
+
+            myd.t += self.dt
+            self.n += 1
+
+            tm_evolve.end()
+            return
+
         # we want to do Strang-splitting here
         self.burn(self.dt/2)
 
         self.diffuse(self.dt/2)
 
+        # the hydro needs the ghost cells of the updated state
+        self.cc_data.fill_BC_all()
+
         # note: this will do the time increment and n increment
         super().evolve()
 
@@ -78,7 +309,7 @@ class Simulation(compressible.Simulation):
         # outside of a running simulation.
         gamma = self.cc_data.get_aux("gamma")
 
-        q = compressible.cons_to_prim(self.cc_data.data, gamma, ivars, self.cc_data.grid)
+        q = compressible.get_primitives(self.cc_data, ivars)
 
         rho = q[:,:,ivars.irho]
         u = q[:,:,ivars.iu]
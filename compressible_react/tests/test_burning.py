@@ -0,0 +1,61 @@
+# unit tests for the reaction network integration
+import numpy as np
+
+import compressible_react.burning as burning
+
+from numpy.testing import assert_allclose
+
+
+def test_jacobian():
+
+    # the analytic Jacobian agrees with differencing the rates
+    net = burning.Network(1.4, 1.e3, 0.1, 1.0)
+    y = np.array([[0.7, 0.3, 0.25], [0.2, 0.8, 1.5]])
+
+    J = net.jac(y)
+
+    eps = 1.e-7
+    for n in range(net.nvar):
+        dy = np.zeros_like(y)
+        dy[:, n] = eps*abs(y[:, n])
+        dfdy = (net.rhs(y + dy) - net.rhs(y - dy))/(2.0*dy[:, n:n+1])
+        assert_allclose(J[..., n], dfdy, rtol=1.e-6, atol=1.e-10)
+
+
+def test_burn():
+
+    # with no temperature dependence the fuel decays exponentially
+    dt = 0.1
+
+    for rate in [1.0, 10.0, 1.e3, 1.e5]:
+        net = burning.Network(1.4, rate, 0.0, 0.5)
+
+        y = np.array([[1.0, 0.0, 1.0]])
+        burning.burn(net, y, dt, rtol=1.e-8, atol=1.e-12)
+
+        assert_allclose(y[0, 0], np.exp(-rate*dt), rtol=1.e-5, atol=1.e-10)
+
+        # mass and energy are conserved
+        assert_allclose(y[0, 0] + y[0, 1], 1.0, rtol=1.e-14)
+        assert_allclose(y[0, 2] + net.q_burn*y[0, 0], 1.0 + net.q_burn, rtol=1.e-14)
+
+
+def test_burn_zones():
+
+    # the zones burn at different rates, so they finish their
+    # substeps at different times, but all of the zones together give
+    # the same answer as one at a time
+    net = burning.Network(1.4, 1.e3, 0.1, 1.0)
+    dt = 0.1
+
+    y = np.zeros((5, net.nvar))
+    y[:, 0] = 1.0
+    y[:, 2] = np.array([0.01, 0.1, 0.25, 1.0, 10.0])
+
+    single = y.copy()
+    for n in range(y.shape[0]):
+        burning.burn(net, single[n:n+1], dt)
+
+    burning.burn(net, y, dt)
+
+    assert_allclose(y, single, rtol=1.e-14)
@@ -13,6 +13,12 @@ discussed in the Colella paper).
 
   riemann          = HLLC to use the HLLC solver
                    = CGF to use the Colella, Glaz, and Ferguson solver
+                   = HLLE to use the (cheaper, more diffusive) HLLE solver
+                   = Rusanov to use the Rusanov (local Lax-Friedrichs) flux
+
+  riemann_backend  = fortran to use the compiled solvers in interface_f
+                   = numpy to use the whole-array versions in
+                     compressible/riemann.py
 
   use_flattening   = 1 to use the multidimensional flattening
                      algorithm at shocks
@@ -63,6 +69,7 @@ Updating U_{i,j}:
 """
 
 import compressible.interface_f as interface_f
+import compressible.riemann as riemann_np
 import compressible as comp
 import mesh.reconstruction as reconstruction
 import mesh.array_indexer as ai
@@ -109,7 +116,7 @@ def fluxes(my_data, rp, ivars, solid, tc):
     #=========================================================================
     # Q = (rho, u, v, p)
 
-    q = comp.cons_to_prim(my_data.data, gamma, ivars, myg)
+    q = comp.get_primitives(my_data, ivars)
 
 
     #=========================================================================
@@ -134,12 +141,17 @@ def fluxes(my_data, rp, ivars, solid, tc):
 
     limiter = rp.get_param("compressible.limiter")
 
-    ldx = myg.scratch_array(nvar=ivars.nvar)
-    ldy = myg.scratch_array(nvar=ivars.nvar)
+    ldx = myg.pooled_array(nvar=ivars.nvar, zero=False)
+    ldy = myg.pooled_array(nvar=ivars.nvar, zero=False)
 
     for n in range(ivars.nvar):
-        ldx[:,:,n] = xi*reconstruction.limit(q[:,:,n], myg, 1, limiter)
-        ldy[:,:,n] = xi*reconstruction.limit(q[:,:,n], myg, 2, limiter)
+        lda = reconstruction.limit(q[:,:,n], myg, 1, limiter)
+        ldx[:,:,n] = xi*lda
+        myg.release(lda)
+
+        lda = reconstruction.limit(q[:,:,n], myg, 2, limiter)
+        ldy[:,:,n] = xi*lda
+        myg.release(lda)
 
     tm_limit.end()
 
@@ -152,8 +164,8 @@ def fluxes(my_data, rp, ivars, solid, tc):
     tm_states = tc.timer("interfaceStates")
     tm_states.begin()
 
-    V_l = myg.scratch_array(ivars.nvar)
-    V_r = myg.scratch_array(ivars.nvar)
+    V_l = myg.pooled_array(ivars.nvar)
+    V_r = myg.pooled_array(ivars.nvar)
 
     for n in range(ivars.nvar):
         V_l.ip(1, n=n, buf=2)[:,:] = q.v(n=n, buf=2) + 0.5*ldx.v(n=n, buf=2)
@@ -161,6 +173,8 @@ def fluxes(my_data, rp, ivars, solid, tc):
 
     tm_states.end()
 
+    myg.release(ldx)
+
 
     # transform interface states back into conserved variables
     U_xl = comp.prim_to_cons(V_l, gamma, ivars, myg)
@@ -180,11 +194,15 @@ def fluxes(my_data, rp, ivars, solid, tc):
 
     tm_states.end()
 
+    myg.release(ldy)
+
 
     # transform interface states back into conserved variables
     U_yl = comp.prim_to_cons(V_l, gamma, ivars, myg)
     U_yr = comp.prim_to_cons(V_r, gamma, ivars, myg)
 
+    myg.release(V_l, V_r)
+
 
     #=========================================================================
     # construct the fluxes normal to the interfaces
@@ -193,11 +211,23 @@ def fluxes(my_data, rp, ivars, solid, tc):
     tm_riem.begin()
 
     riemann = rp.get_param("compressible.riemann")
+    backend = rp.get_param("compressible.riemann_backend")
+
+    if backend == "fortran":
+        solvers = interface_f
+    elif backend == "numpy":
+        solvers = riemann_np
+    else:
+        msg.fail("ERROR: Riemann backend undefined")
 
     if riemann == "HLLC":
-        riemannFunc = interface_f.riemann_hllc
+        riemannFunc = solvers.riemann_hllc
     elif riemann == "CGF":
-        riemannFunc = interface_f.riemann_cgf
+        riemannFunc = solvers.riemann_cgf
+    elif riemann == "HLLE":
+        riemannFunc = solvers.riemann_hlle
+    elif riemann == "Rusanov":
+        riemannFunc = solvers.riemann_rusanov
     else:
         msg.fail("ERROR: Riemann solver undefined")
 
@@ -216,6 +246,8 @@ def fluxes(my_data, rp, ivars, solid, tc):
 
     tm_riem.end()
 
+    myg.release(U_xl, U_xr, U_yl, U_yr)
+
     #=========================================================================
     # apply artificial viscosity
     #=========================================================================
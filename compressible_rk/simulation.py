@@ -2,20 +2,42 @@ from __future__ import print_function
 
 import numpy as np
 
+import mesh.array_indexer as ai
 import mesh.integration as integration
 import compressible
 import compressible_rk.fluxes as flx
+from util import profile
 
 class Simulation(compressible.Simulation):
 
+    adaptive = False
+
+    def implicit_gravity(self):
+        """
+        with an IMEX temporal_method, the gravity sources are done
+        implicitly (see implicit_solve) instead of in substep
+        """
+        return self.rp.get_param("compressible.temporal_method") in integration.a_im
+
+
     def substep(self, myd):
         """
         take a single substep in the RK timestepping starting with the 
         conservative state defined as part of myd
         """
 
+        if self.tiler.nthreads > 1:
+            return self.substep_tiles(myd)
+
         myg = myd.grid
         grav = self.rp.get_param("compressible.grav")
+        if self.implicit_gravity():
+            grav = 0.0
+
+        # get the fluxes first, so they can use any primitive
+        # variables already cached for this state
+        flux_x, flux_y = flx.fluxes(myd, self.rp,
+                                    self.ivars, self.solid, self.tc)
 
         # compute the source terms
         dens = myd.get_var("density")
@@ -29,9 +51,6 @@ class Simulation(compressible.Simulation):
 
         k = myg.scratch_array(nvar=self.ivars.nvar)
 
-        flux_x, flux_y = flx.fluxes(myd, self.rp,
-                                    self.ivars, self.solid, self.tc)
-
         for n in range(self.ivars.nvar):
             k.v(n=n)[:,:] = \
                (flux_x.v(n=n) - flux_x.ip(1, n=n))/myg.dx + \
@@ -43,6 +62,68 @@ class Simulation(compressible.Simulation):
         return k
 
 
+    def substep_tiles(self, myd):
+        """
+        substep, done on the tiles of the grid using driver.nthreads
+        threads.  Each tile computes its fluxes (reading the state,
+        including the ghost cells that overlap its neighbors) and
+        stores the update for its valid zones in k, so this gives the
+        same result as the serial substep.
+        """
+
+        myg = myd.grid
+        grav = self.rp.get_param("compressible.grav")
+        if self.implicit_gravity():
+            grav = 0.0
+
+        tiles = self.tiler.tiles(myg)
+        views = [myd.tile_view(t) for t in tiles]
+
+        k = myg.scratch_array(nvar=self.ivars.nvar)
+
+        def work(tile, my_data):
+            tg = tile.grid
+
+            # the timers are not thread-safe, so each tile has its own
+            flux_x, flux_y = flx.fluxes(my_data, self.rp, self.ivars,
+                                        tile.solid(self.solid), profile.TimerCollection())
+
+            dens = my_data.get_var("density")
+            ymom = my_data.get_var("y-momentum")
+
+            kt = ai.ArrayIndexer(d=k[tile.box], grid=tg)
+
+            for n in range(self.ivars.nvar):
+                kt.v(n=n)[:,:] = \
+                   (flux_x.v(n=n) - flux_x.ip(1, n=n))/tg.dx + \
+                   (flux_y.v(n=n) - flux_y.jp(1, n=n))/tg.dy
+
+            kt.v(n=self.ivars.iymom)[:,:] += dens.v()[:,:]*grav
+            kt.v(n=self.ivars.iener)[:,:] += ymom.v()[:,:]*grav
+
+        self.tiler.map(work, tiles, views)
+
+        return k
+
+
+    def implicit_solve(self, myd, h):
+        """
+        the implicit part of an IMEX stage: solve for the gravity
+        sources, U - h S(U) = U*.  The density is not changed by
+        gravity, so this is linear, and we solve it directly (the
+        momentum first, then the energy source, rho v g, from it)
+        """
+
+        grav = self.rp.get_param("compressible.grav")
+
+        dens = myd.get_var("density")
+        ymom = myd.get_var("y-momentum")
+        ener = myd.get_var("energy")
+
+        ymom.v()[:,:] += h*dens.v()*grav
+        ener.v()[:,:] += h*ymom.v()*grav
+
+
     def method_compute_timestep(self):
         """
         The timestep function computes the advective timestep (CFL)
@@ -78,16 +159,7 @@ class Simulation(compressible.Simulation):
 
         method = self.rp.get_param("compressible.temporal_method")
 
-        rk = integration.RKIntegrator(myd.t, self.dt, method=method)
-        rk.set_start(myd)
-
-        for s in range(rk.nstages()):
-            ytmp = rk.get_stage_start(s)
-            ytmp.fill_BC_all()
-            k = self.substep(ytmp)
-            rk.store_increment(s, k)
-
-        rk.compute_final_update()
+        self.rk_evolve(myd, method)
 
 
         # increment the time
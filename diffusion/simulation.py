@@ -1,5 +1,4 @@
 import importlib
-import math
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -7,6 +6,7 @@ import mesh.boundary as bnd
 import mesh.patch as patch
 from simulation_null import NullSimulation, grid_setup
 import multigrid.MG as MG
+import multigrid.fft_solver as fft_solver
 from util import msg
 
 class Simulation(NullSimulation):
@@ -20,13 +20,9 @@ class Simulation(NullSimulation):
         # setup the grid
         my_grid = grid_setup(self.rp, ng=1)
 
-        # for MG, we need to be a power of two
-        if my_grid.nx != my_grid.ny:
-            msg.fail("need nx = ny for diffusion problems")
-            
-        n = int(math.log(my_grid.nx)/math.log(2.0))
-        if 2**n != my_grid.nx:
-            msg.fail("grid needs to be a power of 2")
+        solver = self.rp.get_param("diffusion.elliptic_solver")
+        if solver not in ["mg", "fft"]:
+            msg.fail("ERROR: elliptic_solver {} invalid".format(solver))
 
         # create the variables
 
@@ -49,12 +45,20 @@ class Simulation(NullSimulation):
         bc = bnd.BC(xlb=bcparam[0], xrb=bcparam[1],
                     ylb=bcparam[2], yrb=bcparam[3])
 
+        # the FFT solver only works for a doubly periodic domain
+        if solver == "fft" and bcparam != 4*["periodic"]:
+            msg.fail("ERROR: the fft elliptic solver requires periodic BCs")
+
         my_data = patch.CellCenterData2d(my_grid)
         my_data.register_var("phi", bc)
         my_data.create()
 
         self.cc_data = my_data
 
+        # the multigrid solvers are created on the first step and
+        # reused after that, keyed by the variable they solve for
+        self.mg_solvers = {}
+
         # now set the initial conditions for the problem
         problem = importlib.import_module("diffusion.problems.{}".format(self.problem_name))
         problem.init_data(self.cc_data, self.rp)
@@ -82,6 +86,7 @@ class Simulation(NullSimulation):
     def evolve(self):
         """
         Diffusion through dt using C-N implicit solve with multigrid
+        (or an FFT solve, for doubly periodic domains)
         """
 
         self.cc_data.fill_BC_all()
@@ -102,15 +107,33 @@ class Simulation(NullSimulation):
         #
         # this is the form that arises with a Crank-Nicolson discretization
         # of the diffusion equation.
-        mg = MG.CellCenterMG2d(myg.nx, myg.ny,
-                               xmin=myg.xmin, xmax=myg.xmax,
-                               ymin=myg.ymin, ymax=myg.ymax,
-                               xl_BC_type=self.cc_data.BCs['phi'].xlb,
-                               xr_BC_type=self.cc_data.BCs['phi'].xrb,
-                               yl_BC_type=self.cc_data.BCs['phi'].ylb,
-                               yr_BC_type=self.cc_data.BCs['phi'].yrb,
-                               alpha=1.0, beta=0.5*self.dt*k,
-                               verbose=0)
+        tm_setup = self.tc.timer("MG setup")
+        tm_setup.begin()
+
+        mg = self.mg_solvers.get("phi")
+        if mg is None:
+            bcs = dict(xl_BC_type=self.cc_data.BCs['phi'].xlb,
+                       xr_BC_type=self.cc_data.BCs['phi'].xrb,
+                       yl_BC_type=self.cc_data.BCs['phi'].ylb,
+                       yr_BC_type=self.cc_data.BCs['phi'].yrb)
+
+            if self.rp.get_param("diffusion.elliptic_solver") == "fft":
+                mg = fft_solver.CellCenterFFT2d(myg.nx, myg.ny,
+                                                xmin=myg.xmin, xmax=myg.xmax,
+                                                ymin=myg.ymin, ymax=myg.ymax,
+                                                verbose=0, **bcs)
+            else:
+                mg = MG.CellCenterMG2d(myg.nx, myg.ny,
+                                       xmin=myg.xmin, xmax=myg.xmax,
+                                       ymin=myg.ymin, ymax=myg.ymax,
+                                       cycle_type=self.rp.get_param("diffusion.mg_cycle_type"),
+                                       fmg=self.rp.get_param("diffusion.mg_fmg"),
+                                       coarse_size=self.rp.get_param("diffusion.mg_coarse_size"),
+                                       bottom_solver=self.rp.get_param("diffusion.mg_bottom_solver"),
+                                       verbose=0, **bcs)
+            self.mg_solvers["phi"] = mg
+
+        mg.set_alpha_beta(1.0, 0.5*self.dt*k)
 
         # form the RHS: f = phi + (dt/2) k L phi  (where L is the Laplacian)
         f = mg.soln_grid.scratch_array()
@@ -123,10 +146,17 @@ class Simulation(NullSimulation):
         # initial guess is zeros
         mg.init_zeros()
 
+        tm_setup.end()
+
         # solve the MG problem for the updated phi
+        tm_solve = self.tc.timer("MG solve")
+        tm_solve.begin()
+
         mg.solve(rtol=1.e-10)
         #mg.smooth(mg.nlevels-1,100)
 
+        tm_solve.end()
+
         # update the solution
         phi.v()[:,:] = mg.get_solution().v()
 
@@ -12,9 +12,15 @@ import mesh.array_indexer as ai
 
 from simulation_null import NullSimulation, grid_setup, bc_setup
 import multigrid.MG as MG
+import multigrid.fft_solver as fft_solver
+from util import msg
 
 class Simulation(NullSimulation):
 
+    # set while preevolve computes the initial pressure (a restart
+    # skips preevolve)
+    in_preevolve = False
+
     def initialize(self):
         """
         Initialize the grid and variables for incompressible flow and
@@ -26,7 +32,7 @@ class Simulation(NullSimulation):
         # create the variables
         bc, bc_xodd, bc_yodd = bc_setup(self.rp)
         
-        my_data = patch.CellCenterData2d(my_grid)
+        my_data = patch.CellCenterData2d(my_grid, lazy_bcs=self.rp.get_param("mesh.lazy_bcs"))
 
         # velocities
         my_data.register_var("x-velocity", bc_xodd)
@@ -42,6 +48,10 @@ class Simulation(NullSimulation):
 
         self.cc_data = my_data
 
+        # the multigrid solvers are created on first use and reused
+        # after that, keyed by the variable they solve for
+        self.mg_solvers = {}
+
         # now set the initial conditions for the problem
         problem = importlib.import_module("incompressible.problems.{}".format(self.problem_name))
         problem.init_data(self.cc_data, self.rp)
@@ -69,6 +79,43 @@ class Simulation(NullSimulation):
         self.dt = cfl*float(min(xtmp.min(), ytmp.min()))
 
 
+    def _mg_solver(self):
+        """
+        Return the elliptic solver object used for the projections,
+        creating it the first time.  phi-MAC and phi are both
+        periodic, so a single object (and its level hierarchy) is
+        reused for every projection.  incompressible.elliptic_solver
+        selects multigrid ("mg") or the direct FFT solver ("fft").
+        """
+
+        if "phi" not in self.mg_solvers:
+            myg = self.cc_data.grid
+
+            solver = self.rp.get_param("incompressible.elliptic_solver")
+            if solver == "mg":
+                Solver = MG.CellCenterMG2d
+                opts = dict(cycle_type=self.rp.get_param("incompressible.mg_cycle_type"),
+                            fmg=self.rp.get_param("incompressible.mg_fmg"),
+                            coarse_size=self.rp.get_param("incompressible.mg_coarse_size"),
+                            bottom_solver=self.rp.get_param("incompressible.mg_bottom_solver"))
+            elif solver == "fft":
+                Solver = fft_solver.CellCenterFFT2d
+                opts = {}
+            else:
+                msg.fail("ERROR: elliptic_solver {} invalid".format(solver))
+
+            self.mg_solvers["phi"] = Solver(myg.nx, myg.ny,
+                                            xl_BC_type="periodic",
+                                            xr_BC_type="periodic",
+                                            yl_BC_type="periodic",
+                                            yr_BC_type="periodic",
+                                            xmin=myg.xmin, xmax=myg.xmax,
+                                            ymin=myg.ymin, ymax=myg.ymax,
+                                            verbose=0, **opts)
+
+        return self.mg_solvers["phi"]
+
+
     def preevolve(self):
         """
         preevolve is called before we being the timestepping loop.  For
@@ -92,16 +139,12 @@ class Simulation(NullSimulation):
         # 1. do the initial projection.  This makes sure that our original
         # velocity field satisties div U = 0
 
-        # next create the multigrid object.  We want Neumann BCs on phi
+        # next get the multigrid object.  We want Neumann BCs on phi
         # at solid walls and periodic on phi for periodic BCs
-        mg = MG.CellCenterMG2d(myg.nx, myg.ny,
-                               xl_BC_type="periodic",
-                               xr_BC_type="periodic",
-                               yl_BC_type="periodic",
-                               yr_BC_type="periodic",
-                               xmin=myg.xmin, xmax=myg.xmax,
-                               ymin=myg.ymin, ymax=myg.ymax,
-                               verbose=0)
+        tm_setup = self.tc.timer("MG setup")
+        tm_setup.begin()
+
+        mg = self._mg_solver()
 
         # first compute divU
         divU = mg.soln_grid.scratch_array()
@@ -115,7 +158,13 @@ class Simulation(NullSimulation):
         # solve
         mg.init_zeros()
         mg.init_RHS(divU)
+
+        tm_setup.end()
+
+        tm_solve = self.tc.timer("MG solve")
+        tm_solve.begin()
         mg.solve(rtol=1.e-10)
+        tm_solve.end()
 
         # store the solution in our self.cc_data object -- include a single
         # ghostcell
@@ -242,15 +291,11 @@ class Simulation(NullSimulation):
 
         if self.verbose > 0: print("  MAC projection")
 
-        # create the multigrid object
-        mg = MG.CellCenterMG2d(myg.nx, myg.ny,
-                               xl_BC_type="periodic",
-                               xr_BC_type="periodic",
-                               yl_BC_type="periodic",
-                               yr_BC_type="periodic",
-                               xmin=myg.xmin, xmax=myg.xmax,
-                               ymin=myg.ymin, ymax=myg.ymax,
-                               verbose=0)
+        # get the multigrid object
+        tm_setup = self.tc.timer("MG setup")
+        tm_setup.begin()
+
+        mg = self._mg_solver()
 
         # first compute divU
         divU = mg.soln_grid.scratch_array()
@@ -262,7 +307,13 @@ class Simulation(NullSimulation):
         # solve the Poisson problem
         mg.init_zeros()
         mg.init_RHS(divU)
+
+        tm_setup.end()
+
+        tm_solve = self.tc.timer("MG solve")
+        tm_solve.begin()
         mg.solve(rtol=1.e-12)
+        tm_solve.end()
 
         # update the normal velocities with the pressure gradient -- these
         # constitute our advective velocities
@@ -342,15 +393,10 @@ class Simulation(NullSimulation):
         # now we solve L phi = D (U* /dt)
         if self.verbose > 0: print("  final projection")
 
-        # create the multigrid object
-        mg = MG.CellCenterMG2d(myg.nx, myg.ny,
-                               xl_BC_type="periodic",
-                               xr_BC_type="periodic",
-                               yl_BC_type="periodic",
-                               yr_BC_type="periodic",
-                               xmin=myg.xmin, xmax=myg.xmax,
-                               ymin=myg.ymin, ymax=myg.ymax,
-                               verbose=0)
+        # get the multigrid object
+        tm_setup.begin()
+
+        mg = self._mg_solver()
 
         # first compute divU
 
@@ -365,8 +411,12 @@ class Simulation(NullSimulation):
         phiGuess.v(buf=1)[:,:] = phi.v(buf=1)
         mg.init_solution(phiGuess)
 
+        tm_setup.end()
+
         # solve
+        tm_solve.begin()
         mg.solve(rtol=1.e-12)
+        tm_solve.end()
 
         # store the solution
         phi[:,:] = mg.get_solution(grid=myg)
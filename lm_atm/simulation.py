@@ -45,6 +45,10 @@ class Basestate(object):
 
 class Simulation(NullSimulation):
 
+    # set while preevolve computes the initial pressure (a restart
+    # skips preevolve)
+    in_preevolve = False
+
     def __init__(self, solver_name, problem_name, rp, timers=None):
 
         NullSimulation.__init__(self, solver_name, problem_name, rp, timers=timers)
@@ -63,7 +67,7 @@ class Simulation(NullSimulation):
 
         bc_dens, bc_xodd, bc_yodd = bc_setup(self.rp)
 
-        my_data = patch.CellCenterData2d(myg)
+        my_data = patch.CellCenterData2d(myg, lazy_bcs=self.rp.get_param("mesh.lazy_bcs"))
 
         my_data.register_var("density", bc_dens)
         my_data.register_var("x-velocity", bc_xodd)
@@ -109,7 +113,7 @@ class Simulation(NullSimulation):
 
         # some auxillary data that we'll need to fill GC in, but isn't
         # really part of the main solution
-        aux_data = patch.CellCenterData2d(myg)
+        aux_data = patch.CellCenterData2d(myg, lazy_bcs=self.rp.get_param("mesh.lazy_bcs"))
 
         aux_data.register_var("coeff", bc_dens)
         aux_data.register_var("source_y", bc_yodd)
@@ -117,6 +121,10 @@ class Simulation(NullSimulation):
         aux_data.create()
         self.aux_data = aux_data
 
+        # the multigrid solvers are created on first use and reused
+        # after that, keyed by the variable they solve for
+        self.mg_solvers = {}
+
 
         # we also need storage for the 1-d base state -- we'll store this
         # in the main class directly.
@@ -187,6 +195,46 @@ class Simulation(NullSimulation):
         if self.verbose > 0: print("timestep is {}".format(dt))
 
 
+    def _mg_solver(self, name, coeff):
+        """
+        Return the variable-coefficient multigrid object used to solve
+        for the projection variable name ("phi-MAC" or "phi"), with its
+        coefficients set to coeff.  The object is created the first
+        time, and after that the same level hierarchy is reused, with
+        only the coefficients reset.
+        """
+
+        mg = self.mg_solvers.get(name)
+
+        if mg is None:
+            myg = self.cc_data.grid
+
+            krylov = self.rp.get_param("lm-atmosphere.mg_krylov")
+            if krylov == "none":
+                krylov = None
+
+            mg = vcMG.VarCoeffCCMG2d(myg.nx, myg.ny,
+                                      xl_BC_type=self.cc_data.BCs[name].xlb,
+                                      xr_BC_type=self.cc_data.BCs[name].xrb,
+                                      yl_BC_type=self.cc_data.BCs[name].ylb,
+                                      yr_BC_type=self.cc_data.BCs[name].yrb,
+                                      xmin=myg.xmin, xmax=myg.xmax,
+                                      ymin=myg.ymin, ymax=myg.ymax,
+                                      coeffs=coeff,
+                                      coeffs_bc=self.cc_data.BCs["density"],
+                                      cycle_type=self.rp.get_param("lm-atmosphere.mg_cycle_type"),
+                                      fmg=self.rp.get_param("lm-atmosphere.mg_fmg"),
+                                      krylov=krylov,
+                                      coarse_size=self.rp.get_param("lm-atmosphere.mg_coarse_size"),
+                                      bottom_solver=self.rp.get_param("lm-atmosphere.mg_bottom_solver"),
+                                      verbose=0)
+            self.mg_solvers[name] = mg
+        else:
+            mg.set_coeffs(coeff)
+
+        return mg
+
+
     def preevolve(self):
         """
         preevolve is called before we being the timestepping loop.  For
@@ -216,18 +264,12 @@ class Simulation(NullSimulation):
         beta0 = self.base["beta0"]
         coeff.v()[:,:] = coeff.v()*beta0.v2d()**2
 
-        # next create the multigrid object.  We defined phi with
+        # next get the multigrid object.  We defined phi with
         # the right BCs previously
-        mg = vcMG.VarCoeffCCMG2d(myg.nx, myg.ny,
-                                 xl_BC_type=self.cc_data.BCs["phi"].xlb,
-                                 xr_BC_type=self.cc_data.BCs["phi"].xrb,
-                                 yl_BC_type=self.cc_data.BCs["phi"].ylb,
-                                 yr_BC_type=self.cc_data.BCs["phi"].yrb,
-                                 xmin=myg.xmin, xmax=myg.xmax,
-                                 ymin=myg.ymin, ymax=myg.ymax,
-                                 coeffs=coeff,
-                                 coeffs_bc=self.cc_data.BCs["density"],
-                                 verbose=0)
+        tm_setup = self.tc.timer("MG setup")
+        tm_setup.begin()
+
+        mg = self._mg_solver("phi", coeff)
 
         # first compute div{beta_0 U}
         div_beta_U = mg.soln_grid.scratch_array()
@@ -239,9 +281,16 @@ class Simulation(NullSimulation):
 
         # solve D (beta_0^2/rho) G (phi/beta_0) = D( beta_0 U )
 
-        # set the RHS to divU and solve
+        # set the RHS to divU, start from zero, and solve
         mg.init_RHS(div_beta_U)
+        mg.init_zeros()
+
+        tm_setup.end()
+
+        tm_solve = self.tc.timer("MG solve")
+        tm_solve.begin()
         mg.solve(rtol=1.e-10)
+        tm_solve.end()
         
         
         # store the solution in our self.cc_data object -- include a single
@@ -405,17 +454,11 @@ class Simulation(NullSimulation):
         coeff.v(buf=1)[:,:] = 1.0/rho.v(buf=1)
         coeff.v(buf=1)[:,:] = coeff.v(buf=1)*beta0.v2d(buf=1)**2
 
-        # create the multigrid object
-        mg = vcMG.VarCoeffCCMG2d(myg.nx, myg.ny,
-                                 xl_BC_type=self.cc_data.BCs["phi-MAC"].xlb,
-                                 xr_BC_type=self.cc_data.BCs["phi-MAC"].xrb,
-                                 yl_BC_type=self.cc_data.BCs["phi-MAC"].ylb,
-                                 yr_BC_type=self.cc_data.BCs["phi-MAC"].yrb,
-                                 xmin=myg.xmin, xmax=myg.xmax,
-                                 ymin=myg.ymin, ymax=myg.ymax,
-                                 coeffs=coeff,
-                                 coeffs_bc=self.cc_data.BCs["density"],
-                                 verbose=0)
+        # get the multigrid object
+        tm_setup = self.tc.timer("MG setup")
+        tm_setup.begin()
+
+        mg = self._mg_solver("phi-MAC", coeff)
 
         # first compute div{beta_0 U}
         div_beta_U = mg.soln_grid.scratch_array()
@@ -426,9 +469,16 @@ class Simulation(NullSimulation):
             (beta0_edges.v2dp(1)*v_MAC.jp(1) -
              beta0_edges.v2d()*v_MAC.v())/myg.dy
 
-        # solve the Poisson problem
+        # solve the Poisson problem, starting from zero
         mg.init_RHS(div_beta_U)
+        mg.init_zeros()
+
+        tm_setup.end()
+
+        tm_solve = self.tc.timer("MG solve")
+        tm_solve.begin()
         mg.solve(rtol=1.e-12)
+        tm_solve.end()
 
 
         # update the normal velocities with the pressure gradient -- these
@@ -574,17 +624,10 @@ class Simulation(NullSimulation):
         coeff = 1.0/rho
         coeff.v()[:,:] = coeff.v()*beta0.v2d()**2
 
-        # create the multigrid object
-        mg = vcMG.VarCoeffCCMG2d(myg.nx, myg.ny,
-                                 xl_BC_type=self.cc_data.BCs["phi"].xlb,
-                                 xr_BC_type=self.cc_data.BCs["phi"].xrb,
-                                 yl_BC_type=self.cc_data.BCs["phi"].ylb,
-                                 yr_BC_type=self.cc_data.BCs["phi"].yrb,
-                                 xmin=myg.xmin, xmax=myg.xmax,
-                                 ymin=myg.ymin, ymax=myg.ymax,
-                                 coeffs=coeff,
-                                 coeffs_bc=self.cc_data.BCs["density"],
-                                 verbose=0)
+        # get the multigrid object
+        tm_setup.begin()
+
+        mg = self._mg_solver("phi", coeff)
 
         # first compute div{beta_0 U}
 
@@ -600,8 +643,12 @@ class Simulation(NullSimulation):
         phiGuess.v(buf=1)[:,:] = phi.v(buf=1)
         mg.init_solution(phiGuess)
 
+        tm_setup.end()
+
         # solve
+        tm_solve.begin()
         mg.solve(rtol=1.e-12)
+        tm_solve.end()
 
 
         # store the solution in our self.cc_data object -- include a single
@@ -3,5 +3,5 @@ This is the general mesh module for pyro.  It implements everything
 necessary to work with finite-volume data.
 """
 
-__all__ = ['patch', 'integration', 'reconstruction']
+__all__ = ['patch', 'integration', 'reconstruction', 'tiling']
 
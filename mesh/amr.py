@@ -0,0 +1,990 @@
+"""
+Block-structured adaptive mesh refinement.
+
+An AMRHierarchy holds a set of levels.  Level 0 is the base grid (the
+simulation's usual CellCenterData2d), and each level l > 0 is a
+collection of patches that are a factor of 2 finer than level l-1.
+The patches are blocks of block_size x block_size zones, aligned to
+multiples of block_size in the index space of their level, so each
+covers block_size/2 x block_size/2 zones of the level below (a
+"unit").  Each patch has its own Grid2d and AMRPatchData, with the
+same variables and number of ghost cells as the base.
+
+  -- regridding: the zones of each level are tagged (by a
+     user-supplied function, see gradient_tags for the default),
+     the tags are grown by a buffer, and any unit holding a tagged
+     zone is covered by a patch on the next level.  A level is kept
+     properly nested: its patches are at least one unit away from
+     the edge of the level below (except at the physical
+     boundaries).  Patches that already exist are kept, and new
+     ones are initialized by interpolation from the level below
+     (CellCenterData2d.prolong).
+
+  -- ghost cells: on level 0, these are filled by the BCs as usual.
+     On the finer levels, they are interpolated (in space and time)
+     from the level below, replaced by the valid zones of a
+     neighboring patch on the same level where there is one, and
+     filled by the BCs on the physical boundaries.  Periodic
+     boundaries wrap around the level.
+
+  -- time advance: each level takes two steps of dt/2 for each step
+     of dt of the level below (subcycling).  After the finer level
+     catches up, it is averaged onto the level below
+     (CellCenterData2d.restrict), and the zones of the level below
+     that border the finer level are corrected so that the fluxes
+     through the coarse-fine interfaces are those of the finer level
+     (refluxing).  This keeps the evolution conservative.
+
+The hierarchy does not know about the equations being solved.
+advance() calls a function, step(patch, dt), that updates a patch
+(an AMRPatch -- its data has the ghost cells filled) by dt and
+returns the fluxes through its x and y interfaces (as from the
+solver's flux routine), which are used for the refluxing.
+
+Typical usage:
+
+  -- create the hierarchy and the initial levels
+
+     amr = AMRHierarchy(my_data, max_levels=3, block_size=16)
+     amr.regrid(tag)
+
+  -- evolve
+
+     amr.advance(dt, step)
+
+  -- output, and reading it back
+
+     amr.write(f)
+     amr = AMRHierarchy.read(f["amr"], my_data)
+"""
+
+from __future__ import print_function
+
+import numpy as np
+
+import mesh.boundary as bnd
+import mesh.patch as patch
+from util import msg
+
+
+def gradient_tags(my_data, name, thresh):
+    """
+    The default refinement criterion: tag the valid zones where the
+    variable name differs from one of its neighbors by more than
+    thresh relative to its own magnitude.
+
+    Parameters
+    ----------
+    my_data : CellCenterData2d object
+        The data to tag (with its ghost cells filled)
+    name : str
+        The variable to look at
+    thresh : float
+        The relative jump that triggers refinement
+
+    Returns
+    -------
+    out : ndarray
+        A boolean array over the valid zones, True where we want to
+        refine
+    """
+
+    q = my_data.get_var(name)
+
+    jump = np.maximum(np.maximum(abs(q.ip(1) - q.v()), abs(q.ip(-1) - q.v())),
+                      np.maximum(abs(q.jp(1) - q.v()), abs(q.jp(-1) - q.v())))
+
+    return jump > thresh*(abs(q.v()) + 1.e-30)
+
+
+def _prolong_limited(c, out):
+    """
+    Put the prolongation of the coarse data c (an array over some
+    zones and one ring of ghost cells around them, for all of the
+    variables) into out, an array over their children.  This is
+    CellCenterData2d.prolong with limit=True, for all of the variables
+    at once.
+    """
+
+    cv = c[1:-1, 1:-1]
+
+    m_x = 0.5*(c[2:, 1:-1] - c[:-2, 1:-1])
+    m_y = 0.5*(c[1:-1, 2:] - c[1:-1, :-2])
+
+    m_x = np.where((cv - c[:-2, 1:-1])*(c[2:, 1:-1] - cv) > 0.0,
+                   np.sign(m_x)*np.minimum(abs(m_x),
+                                           2.0*np.minimum(abs(cv - c[:-2, 1:-1]),
+                                                          abs(c[2:, 1:-1] - cv))),
+                   0.0)
+    m_y = np.where((cv - c[1:-1, :-2])*(c[1:-1, 2:] - cv) > 0.0,
+                   np.sign(m_y)*np.minimum(abs(m_y),
+                                           2.0*np.minimum(abs(cv - c[1:-1, :-2]),
+                                                          abs(c[1:-1, 2:] - cv))),
+                   0.0)
+
+    out[0::2, 0::2] = cv - 0.25*m_x - 0.25*m_y
+    out[1::2, 0::2] = cv + 0.25*m_x - 0.25*m_y
+    out[0::2, 1::2] = cv - 0.25*m_x + 0.25*m_y
+    out[1::2, 1::2] = cv + 0.25*m_x + 0.25*m_y
+
+
+class _Scratch(object):
+    """
+    The scratch space for filling some boxes of zones of a patch by
+    interpolating the level below: the parents of the boxes (with
+    one ring of ghost cells, for the slopes), and their children.
+    The children of all of the boxes are held together, in one
+    column of data (so the admissibility check is done once), and
+    each box is widened to whole parent zones.
+    """
+
+    def __init__(self, p, boxes, like=None):
+        """
+        Create the scratch space for the boxes (ilo, ihi, jlo, jhi),
+        inclusive ranges of zones in the index space of the level of
+        patch p.  With like, a CellCenterData2d with the variables of
+        the patch, the children are held in data like it (for the
+        admissibility check), and otherwise in an array.
+        """
+
+        ng = p.grid.ng
+        nvar = p.data.nvar
+
+        # all of the parents, and their ghost cells
+        self.ci0 = min(b[0] for b in boxes)//2 - 1
+        self.cj0 = min(b[2] for b in boxes)//2 - 1
+        ci1 = max(b[1] for b in boxes)//2 + 1
+        cj1 = max(b[3] for b in boxes)//2 + 1
+
+        self.coarse = np.zeros((ci1 - self.ci0 + 1, cj1 - self.cj0 + 1, nvar),
+                               dtype=p.data.dtype)
+
+        sizes = [4*(ihi//2 - ilo//2 + 1)*(jhi//2 - jlo//2 + 1)
+                 for ilo, ihi, jlo, jhi in boxes]
+
+        if like is None:
+            self.fine_data = None
+            children = np.zeros((sum(sizes), 1, nvar), dtype=p.data.dtype)
+        else:
+            g = patch.Grid2d(sum(sizes), 1, ng=0)
+            self.fine_data = patch.CellCenterData2d(g, dtype=like.dtype)
+            for name in like.names:
+                self.fine_data.register_var(name, like.BCs[name])
+            self.fine_data.create()
+            self.fine_data.aux = like.aux
+            self.fine_data.derives = like.derives
+            children = self.fine_data._data
+
+        self.boxes = []
+
+        start = 0
+        for (ilo, ihi, jlo, jhi), size in zip(boxes, sizes):
+            pi0 = ilo//2
+            pj0 = jlo//2
+            mx = ihi//2 - pi0 + 1
+            my = jhi//2 - pj0 + 1
+
+            # the parents, with their ghost cells ...
+            coarse = self.coarse[pi0-1-self.ci0:pi0+mx+1-self.ci0,
+                                 pj0-1-self.cj0:pj0+my+1-self.cj0]
+
+            # ... and the children
+            rows = np.s_[start:start+size]
+            fine = children[rows].reshape(2*mx, 2*my, nvar)
+            start += size
+
+            # the box, in the children and in the patch's arrays
+            src = np.s_[ilo-2*pi0:ihi+1-2*pi0, jlo-2*pj0:jhi+1-2*pj0]
+            dst = np.s_[ilo-p.ilo+ng:ihi+1-p.ilo+ng, jlo-p.jlo+ng:jhi+1-p.jlo+ng]
+
+            # the children that are in the patch's arrays (whose
+            # admissibility counts)
+            i = 2*pi0 + np.arange(2*mx)
+            j = 2*pj0 + np.arange(2*my)
+            inside = (((i >= p.ilo - ng) & (i <= p.ihi + ng))[:,np.newaxis] &
+                      ((j >= p.jlo - ng) & (j <= p.jhi + ng))[np.newaxis,:])
+
+            self.boxes.append((coarse, fine, rows, src, dst, inside))
+
+
+class AMRPatchData(patch.CellCenterData2d):
+    """
+    The data on a patch of a refined level.  fill_BC and fill_BC_all
+    only fill the ghost cells on the patch's edges that are on a
+    (non-periodic) physical boundary -- the others are filled by
+    AMRHierarchy.fill_ghosts, which calls them.
+    """
+
+    def __init__(self, grid, physical, dtype=np.float64):
+        """
+        Create the AMRPatchData object.
+
+        Parameters
+        ----------
+        grid : Grid2d object
+            The grid of the patch
+        physical : dict
+            For each edge ('xlb', 'xrb', 'ylb', 'yrb'), whether it
+            is on a non-periodic physical boundary
+        dtype : NumPy data type, optional
+            The datatype of the data
+        """
+
+        patch.CellCenterData2d.__init__(self, grid, dtype=dtype)
+        self.physical = physical
+
+
+    def _empty_like(self):
+        return AMRPatchData(self.grid, self.physical, dtype=self.dtype)
+
+
+    def _fill_edge(self, edge, bc_type, n, value=None):
+        if not self.physical[edge]:
+            return
+
+        if value is not None:
+            msg.fail("ERROR: inhomogeneous BCs are not supported on AMR patches")
+
+        patch.CellCenterData2d._fill_edge(self, edge, bc_type, n, value)
+
+
+    def _fill_user(self, edge, bc_type, name):
+        if self.physical[edge]:
+            patch.CellCenterData2d._fill_user(self, edge, bc_type, name)
+
+
+class AMRPatch(object):
+    """
+    A patch of an AMR level, covering the (inclusive) range of valid
+    zones ilo:ihi, jlo:jhi in the index space of its level (starting
+    at 0 at the lower left corner of the domain).
+    """
+
+    def __init__(self, level, ilo, ihi, jlo, jhi, data, aux=None):
+        """
+        Create the AMRPatch.
+
+        Parameters
+        ----------
+        level : int
+            The level the patch is on
+        ilo, ihi, jlo, jhi : int
+            The zones it covers
+        data : CellCenterData2d object
+            The state on the patch
+        aux : CellCenterData2d object, optional
+            Scratch data on the patch for the solver (this is not
+            maintained by the hierarchy)
+        """
+
+        self.level = level
+
+        self.ilo = ilo
+        self.ihi = ihi
+        self.jlo = jlo
+        self.jhi = jhi
+
+        self.data = data
+        self.aux = aux
+        self.grid = data.grid
+
+        # the state at the start of the level's last step (for
+        # interpolating in time to the finer level)
+        self.old = None
+
+        # the scratch space for filling the ghost cells from the level
+        # below (see AMRHierarchy._scratch)
+        self.scratch = None
+
+
+    def box(self):
+        """ the patch's valid zones, as slices into a level-wide array """
+        return np.s_[self.ilo:self.ihi+1, self.jlo:self.jhi+1]
+
+
+    def solid(self, solid):
+        """
+        return the solid wall properties (a BCProp object) for the
+        patch -- those of the domain on the physical boundaries
+        """
+        return bnd.BCProp(solid.xl if self.physical("xlb") else 0,
+                          solid.xr if self.physical("xrb") else 0,
+                          solid.yl if self.physical("ylb") else 0,
+                          solid.yr if self.physical("yrb") else 0)
+
+
+    def physical(self, edge):
+        """ is edge of the patch on a non-periodic physical boundary? """
+        try:
+            return self.data.physical[edge]
+        except AttributeError:
+            # the base grid
+            bc = self.data.BCs[self.data.names[0]]
+            return getattr(bc, edge) != "periodic"
+
+
+    def __str__(self):
+        return "patch: level {} [{}:{}, {}:{}]".format(
+            self.level, self.ilo, self.ihi, self.jlo, self.jhi)
+
+
+class AMRLevel(object):
+    """ the patches making up one level of the hierarchy """
+
+    def __init__(self, n, nx, ny, t):
+        self.n = n
+
+        # the size of the level's index space (the whole domain)
+        self.nx = nx
+        self.ny = ny
+
+        self.patches = []
+
+        # the time of the level, and at the start of its last step
+        self.t = t
+        self.t_old = t
+
+        # the flux registers, holding (the time integral of) the fine
+        # minus coarse fluxes through each x and y face of the level,
+        # indexed by the zone to the right (above)
+        self.reg_x = None
+        self.reg_y = None
+
+
+class AMRHierarchy(object):
+    """
+    a hierarchy of refined levels built on top of a base grid
+    """
+
+    def __init__(self, base, aux=None, max_levels=2, block_size=16, buffer=2,
+                 admissible=None):
+        """
+        Create the AMRHierarchy, with just the base level.  Call
+        regrid() to make the refined levels.
+
+        Parameters
+        ----------
+        base : CellCenterData2d object
+            The data on the base grid
+        aux : CellCenterData2d object, optional
+            Scratch data on the base grid.  A copy of it is made for
+            each patch (as AMRPatch.aux).
+        max_levels : int, optional
+            The maximum number of levels, including the base
+        block_size : int, optional
+            The number of zones on a side of the patches of the
+            refined levels
+        buffer : int, optional
+            The number of zones around a tagged zone that are also
+            refined
+        admissible : function, optional
+            admissible(my_data) returns a boolean array over all of
+            the zones of my_data that is True where the state is
+            physical (e.g. positive density and pressure).  Where the
+            data interpolated to a finer level is not, the
+            interpolation is piecewise constant.
+        """
+
+        self.base = base
+        self.aux = aux
+
+        self.max_levels = int(max_levels)
+        self.block_size = int(block_size)
+        self.buffer = int(buffer)
+        self.admissible = admissible
+
+        myg = base.grid
+        self.ng = myg.ng
+
+        if self.block_size % 2 != 0 or self.block_size < 2*self.ng:
+            msg.fail("ERROR: AMR block size must be even and at least 2*ng")
+
+        unit = self.block_size//2
+        if myg.nx % unit != 0 or myg.ny % unit != 0:
+            msg.fail("ERROR: base grid must be a multiple of block_size/2 zones")
+
+        bc = base.BCs[base.names[0]]
+        self.periodic_x = bc.xlb == "periodic"
+        self.periodic_y = bc.ylb == "periodic"
+
+        level = AMRLevel(0, myg.nx, myg.ny, base.t)
+        level.patches.append(AMRPatch(0, 0, myg.nx-1, 0, myg.ny-1, base, aux))
+
+        self.levels = [level]
+
+        # the zones updated, summed over all of the steps
+        self.zone_updates = 0
+
+
+    def nlevels(self):
+        """ the number of levels in use """
+        return len(self.levels)
+
+
+    def _new_patch(self, n, bi, bj):
+        """ make the (uninitialized) patch for block (bi, bj) of level n """
+
+        B = self.block_size
+        myg = self.base.grid
+
+        nx = myg.nx*2**n
+        ny = myg.ny*2**n
+
+        dx = (myg.xmax - myg.xmin)/nx
+        dy = (myg.ymax - myg.ymin)/ny
+
+        ilo = bi*B
+        jlo = bj*B
+
+        g = patch.Grid2d(B, B, ng=self.ng,
+                         xmin=myg.xmin + ilo*dx, xmax=myg.xmin + (ilo+B)*dx,
+                         ymin=myg.ymin + jlo*dy, ymax=myg.ymin + (jlo+B)*dy)
+
+        physical = {"xlb": ilo == 0 and not self.periodic_x,
+                    "xrb": ilo + B == nx and not self.periodic_x,
+                    "ylb": jlo == 0 and not self.periodic_y,
+                    "yrb": jlo + B == ny and not self.periodic_y}
+
+        def like(d):
+            new = AMRPatchData(g, physical, dtype=d.dtype)
+            for name in d.names:
+                new.register_var(name, d.BCs[name])
+            new.create()
+            new.aux = d.aux
+            new.derives = d.derives
+            return new
+
+        data = like(self.base)
+        aux = like(self.aux) if self.aux is not None else None
+
+        return AMRPatch(n, ilo, ilo+B-1, jlo, jlo+B-1, data, aux)
+
+
+    def _extent(self, p):
+        """
+        the zones of patch p (inclusive ranges) that hold data for the
+        level: its valid zones, plus its ghost cells on non-periodic
+        physical boundaries
+        """
+        ng = self.ng
+        return (p.ilo - (ng if p.physical("xlb") else 0),
+                p.ihi + (ng if p.physical("xrb") else 0),
+                p.jlo - (ng if p.physical("ylb") else 0),
+                p.jhi + (ng if p.physical("yrb") else 0))
+
+
+    def _shifts(self, n):
+        """ the offsets of the periodic images of level n """
+        level = self.levels[n]
+        sx = [0, -level.nx, level.nx] if self.periodic_x else [0]
+        sy = [0, -level.ny, level.ny] if self.periodic_y else [0]
+        return [(a, b) for a in sx for b in sy]
+
+
+    def _fetch(self, n, i0, j0, out, alpha=1.0, valid=False, skip=None):
+        """
+        Copy the data of level n into out, whose [0,0] element is zone
+        (i0, j0) of the level's index space.  The data is interpolated
+        in time between the start (alpha = 0) and end (alpha = 1) of
+        the level's last step.  With valid, only the patches' valid
+        zones are used, and skip is a patch whose own (unshifted)
+        zones are not copied.
+        """
+
+        ni, nj = out.shape[:2]
+        ng = self.ng
+
+        for p in self.levels[n].patches:
+            if valid:
+                ilo, ihi, jlo, jhi = p.ilo, p.ihi, p.jlo, p.jhi
+            else:
+                ilo, ihi, jlo, jhi = self._extent(p)
+
+            for si, sj in self._shifts(n):
+                if p is skip and si == 0 and sj == 0:
+                    continue
+
+                a0 = max(i0, ilo + si)
+                a1 = min(i0 + ni, ihi + 1 + si)
+                b0 = max(j0, jlo + sj)
+                b1 = min(j0 + nj, jhi + 1 + sj)
+
+                if a0 >= a1 or b0 >= b1:
+                    continue
+
+                # p's arrays start at zone (p.ilo - ng, p.jlo - ng)
+                src = np.s_[a0-si-p.ilo+ng:a1-si-p.ilo+ng,
+                            b0-sj-p.jlo+ng:b1-sj-p.jlo+ng]
+
+                if alpha == 1.0 or p.old is None:
+                    value = p.data._data[src]
+                elif alpha == 0.0:
+                    value = p.old[src]
+                else:
+                    value = (1.0 - alpha)*p.old[src] + alpha*p.data._data[src]
+
+                out[a0-i0:a1-i0, b0-j0:b1-j0] = value
+
+
+    def _scratch(self, p, ghost_only=True):
+        """
+        the scratch space (see _Scratch) for filling patch p, or just
+        its ghost cells -- the latter is made on first use and kept
+        with the patch
+        """
+
+        ng = self.ng
+        like = self.base if self.admissible is not None else None
+
+        if not ghost_only:
+            return _Scratch(p, [(p.ilo-ng, p.ihi+ng, p.jlo-ng, p.jhi+ng)], like)
+
+        if p.scratch is None:
+            # the ghost cells, as four slabs
+            p.scratch = _Scratch(p, [(p.ilo-ng, p.ilo-1, p.jlo-ng, p.jhi+ng),
+                                     (p.ihi+1, p.ihi+ng, p.jlo-ng, p.jhi+ng),
+                                     (p.ilo, p.ihi, p.jlo-ng, p.jlo-1),
+                                     (p.ilo, p.ihi, p.jhi+1, p.jhi+ng)], like)
+
+        return p.scratch
+
+
+    def _prolong(self, p, alpha, ghost_only=True):
+        """
+        Fill patch p (or just its ghost cells) by interpolating the
+        level below it, at time alpha through its last step (see
+        _fetch).
+        """
+
+        s = self._scratch(p, ghost_only)
+
+        s.coarse[:,:,:] = 0.0
+        self._fetch(p.level-1, s.ci0, s.cj0, s.coarse, alpha=alpha)
+
+        for coarse, fine, _, _, _, _ in s.boxes:
+            _prolong_limited(coarse, fine)
+
+        # where the interpolated state is not admissible, the children
+        # of its parent zone get the parent's value instead
+        if s.fine_data is not None:
+            s.fine_data.mark_dirty()
+            ok = self.admissible(s.fine_data)
+
+            for coarse, fine, rows, _, _, inside in s.boxes:
+                mx, my = coarse.shape[0]-2, coarse.shape[1]-2
+
+                bad = ~ok[rows].reshape(2*mx, 2*my) & inside
+                if bad.any():
+                    bad_parent = bad.reshape(mx, 2, my, 2).any(axis=(1, 3))
+                    bad = np.repeat(np.repeat(bad_parent, 2, axis=0), 2, axis=1)
+
+                    parents = np.repeat(np.repeat(coarse[1:-1, 1:-1], 2, axis=0), 2, axis=1)
+                    fine[bad] = parents[bad]
+
+        for _, fine, _, src, dst, _ in s.boxes:
+            p.data._data[dst] = fine[src]
+
+        p.data.mark_dirty()
+
+
+    def fill_ghosts(self, n):
+        """
+        Fill the ghost cells of the patches of level n, at the level's
+        current time.
+        """
+
+        level = self.levels[n]
+
+        if n == 0:
+            self.base.fill_BC_all()
+            return
+
+        coarse = self.levels[n-1]
+
+        if coarse.t == coarse.t_old:
+            alpha = 1.0
+        else:
+            alpha = (level.t - coarse.t_old)/(coarse.t - coarse.t_old)
+
+        for p in level.patches:
+            self._prolong(p, alpha)
+
+            # the neighboring patches replace the interpolated values
+            self._fetch(n, p.ilo - self.ng, p.jlo - self.ng, p.data._data,
+                        valid=True, skip=p)
+
+            p.data.t = level.t
+            p.data.mark_dirty()
+            p.data.fill_BC_all()
+
+
+    def _at_boundary(self, n):
+        """
+        does a patch of level n touch a non-periodic edge of the
+        domain?
+        """
+        return any(p.physical(edge) for p in self.levels[n].patches
+                   for edge in ("xlb", "xrb", "ylb", "yrb"))
+
+
+    def covered(self, n):
+        """
+        return a boolean array over the zones of level n that is True
+        where they are covered by level n+1
+        """
+
+        level = self.levels[n]
+        cov = np.zeros((level.nx, level.ny), dtype=bool)
+
+        if n+1 < len(self.levels):
+            for q in self.levels[n+1].patches:
+                cov[q.ilo//2:(q.ihi+1)//2, q.jlo//2:(q.jhi+1)//2] = True
+
+        return cov
+
+
+    def _grow(self, mask, nz, fill):
+        """
+        return mask, with the True regions grown (or, with fill = True
+        and an inverted mask, shrunk) by nz zones.  Beyond the domain,
+        the mask wraps around if periodic and is fill otherwise.
+        """
+
+        m = mask
+        if self.periodic_x:
+            m = np.pad(m, ((nz, nz), (0, 0)), mode="wrap")
+        else:
+            m = np.pad(m, ((nz, nz), (0, 0)), mode="constant", constant_values=fill)
+
+        if self.periodic_y:
+            m = np.pad(m, ((0, 0), (nz, nz)), mode="wrap")
+        else:
+            m = np.pad(m, ((0, 0), (nz, nz)), mode="constant", constant_values=fill)
+
+        nx, ny = mask.shape
+        out = np.zeros_like(mask)
+        for i in range(2*nz+1):
+            for j in range(2*nz+1):
+                out |= m[i:i+nx, j:j+ny]
+
+        return out
+
+
+    def regrid(self, tag):
+        """
+        Rebuild the refined levels.  All of the levels must be at the
+        same time (i.e. between steps of the base level).
+
+        Parameters
+        ----------
+        tag : function
+            tag(my_data) returns a boolean array over the valid zones
+            of the data on a patch (with its ghost cells filled) that
+            is True where refinement is wanted
+        """
+
+        unit = self.block_size//2
+
+        for n in range(self.max_levels-1):
+
+            if n >= len(self.levels):
+                break
+
+            level = self.levels[n]
+            self.fill_ghosts(n)
+
+            tags = np.zeros((level.nx, level.ny), dtype=bool)
+            for p in level.patches:
+                tags[p.box()] = tag(p.data)
+
+            tags = self._grow(tags, self.buffer, False)
+
+            # the units (block_size/2 zones on a side) holding a tag
+            units = tags.reshape(level.nx//unit, unit,
+                                 level.ny//unit, unit).any(axis=(1, 3))
+
+            # stay a unit away from the edge of this level
+            if n > 0:
+                inside = np.zeros((level.nx, level.ny), dtype=bool)
+                for p in level.patches:
+                    inside[p.box()] = True
+
+                full = inside.reshape(level.nx//unit, unit,
+                                      level.ny//unit, unit).all(axis=(1, 3))
+
+                units &= ~self._grow(~full, 1, False)
+
+            if not units.any():
+                del self.levels[n+1:]
+                break
+
+            if n+1 < len(self.levels):
+                old = dict(((q.ilo//self.block_size, q.jlo//self.block_size), q)
+                           for q in self.levels[n+1].patches)
+            else:
+                old = {}
+
+            fine = AMRLevel(n+1, 2*level.nx, 2*level.ny, level.t)
+
+            for bi, bj in np.argwhere(units):
+                try:
+                    q = old[bi, bj]
+                except KeyError:
+                    q = self._new_patch(n+1, bi, bj)
+                    fine.patches.append(q)
+                    self._prolong(q, 1.0, ghost_only=False)
+                else:
+                    fine.patches.append(q)
+
+            if n+1 < len(self.levels):
+                self.levels[n+1] = fine
+            else:
+                self.levels.append(fine)
+
+        for level in self.levels:
+            level.t = level.t_old = self.base.t
+            for p in level.patches:
+                p.old = None
+
+
+    def advance(self, dt, step):
+        """
+        Advance all of the levels through the timestep dt of the base
+        level.
+
+        Parameters
+        ----------
+        dt : float
+            The timestep of the base level
+        step : function
+            step(patch, dt) updates the data of an AMRPatch through
+            dt and returns its x and y interface fluxes
+        """
+
+        for level in self.levels:
+            level.t = level.t_old = self.base.t
+
+        self._advance(0, dt, step)
+
+
+    def _advance(self, n, dt, step):
+        """ advance level n (and the levels above it) through dt """
+
+        level = self.levels[n]
+        finer = n+1 < len(self.levels)
+
+        self.fill_ghosts(n)
+
+        if finer:
+            for p in level.patches:
+                p.old = p.data._data.copy()
+            level.t_old = level.t
+
+            nvar = self.base.nvar
+            level.reg_x = np.zeros((level.nx, level.ny, nvar))
+            level.reg_y = np.zeros((level.nx, level.ny, nvar))
+
+        for p in level.patches:
+            flux_x, flux_y = step(p, dt)
+
+            g = p.grid
+            self.zone_updates += g.nx*g.ny
+
+            if finer:
+                level.reg_x[p.box()] -= dt*flux_x[g.ilo:g.ihi+1, g.jlo:g.jhi+1, :]
+                level.reg_y[p.box()] -= dt*flux_y[g.ilo:g.ihi+1, g.jlo:g.jhi+1, :]
+
+            if n > 0:
+                self._add_fine_fluxes(p, flux_x, flux_y, dt)
+
+        level.t += dt
+
+        if finer:
+            # the finer level is interpolated from our valid zones
+            # (and their periodic images), and from our ghost cells
+            # only where it reaches a non-periodic edge of the domain
+            # -- then they are needed at the new time
+            if self._at_boundary(n+1):
+                self.fill_ghosts(n)
+            elif n > 0:
+                for p in level.patches:
+                    p.data.t = level.t
+
+            self._advance(n+1, 0.5*dt, step)
+            self._advance(n+1, 0.5*dt, step)
+
+            self.average_down(n)
+            self.reflux(n)
+
+
+    def _add_fine_fluxes(self, p, flux_x, flux_y, dt):
+        """
+        add the fluxes through the edges of the patch p, integrated
+        over its step dt, to the flux registers of the level below
+        """
+
+        coarse = self.levels[p.level-1]
+        g = p.grid
+
+        cj = np.s_[p.jlo//2:(p.jhi+1)//2]
+        for i, face in [(g.ilo, p.ilo), (g.ihi+1, p.ihi+1)]:
+            f = flux_x[i, g.jlo:g.jhi+1, :]
+            coarse.reg_x[(face//2) % coarse.nx, cj, :] += 0.5*dt*(f[0::2] + f[1::2])
+
+        ci = np.s_[p.ilo//2:(p.ihi+1)//2]
+        for j, face in [(g.jlo, p.jlo), (g.jhi+1, p.jhi+1)]:
+            f = flux_y[g.ilo:g.ihi+1, j, :]
+            coarse.reg_y[ci, (face//2) % coarse.ny, :] += 0.5*dt*(f[0::2] + f[1::2])
+
+
+    def average_down(self, n):
+        """
+        replace the zones of level n covered by level n+1 with the
+        average of the finer data
+        """
+
+        level = self.levels[n]
+        ng = self.ng
+
+        # level 0 is a single patch, above that they are blocks
+        if n == 0:
+            owner = lambda i, j: level.patches[0]
+        else:
+            B = self.block_size
+            blocks = dict(((p.ilo//B, p.jlo//B), p) for p in level.patches)
+            owner = lambda i, j: blocks[i//B, j//B]
+
+        for q in self.levels[n+1].patches:
+            ci = q.ilo//2
+            cj = q.jlo//2
+
+            p = owner(ci, cj)
+
+            i0 = ci - p.ilo + ng
+            j0 = cj - p.jlo + ng
+
+            for k, name in enumerate(self.base.names):
+                c = q.data.restrict(name)
+                p.data._data[i0:i0+c.g.nx, j0:j0+c.g.ny, k] = c.v()
+
+            p.data.mark_dirty()
+
+
+    def reflux(self, n):
+        """
+        correct the zones of level n next to level n+1 with the
+        difference between the fine and coarse fluxes through their
+        shared faces (see the flux registers)
+        """
+
+        level = self.levels[n]
+        cov = self.covered(n)
+
+        dx = (self.base.grid.xmax - self.base.grid.xmin)/level.nx
+        dy = (self.base.grid.ymax - self.base.grid.ymin)/level.ny
+
+        dU = np.zeros_like(level.reg_x)
+
+        for axis, reg, dxy, periodic in [(0, level.reg_x, dx, self.periodic_x),
+                                          (1, level.reg_y, dy, self.periodic_y)]:
+
+            # faces between a covered zone and one that is not.  Face
+            # k is on the lower side of zone k
+            face = cov != np.roll(cov, 1, axis=axis)
+            if not periodic:
+                if axis == 0:
+                    face[0,:] = False
+                else:
+                    face[:,0] = False
+
+            # the zone above the face is not covered ...
+            dU += np.where((face & ~cov)[:,:,np.newaxis], reg, 0.0)/dxy
+
+            # ... or the one below it
+            dU -= np.roll(np.where((face & cov)[:,:,np.newaxis], reg, 0.0),
+                          -1, axis=axis)/dxy
+
+        for p in level.patches:
+            g = p.grid
+            p.data._data[g.ilo:g.ihi+1, g.jlo:g.jhi+1, :] += dU[p.box()]
+            p.data.mark_dirty()
+
+
+    def __str__(self):
+        """ print out some basic information about the hierarchy """
+
+        my_str = "AMR hierarchy: {} level(s)\n".format(len(self.levels))
+        for level in self.levels:
+            frac = 0.0
+            for p in level.patches:
+                frac += (p.ihi - p.ilo + 1)*(p.jhi - p.jlo + 1)
+            frac /= level.nx*level.ny
+            my_str += "   level {}: {:4d} patch(es), {:6.2f}% of the domain\n".format(
+                level.n, len(level.patches), 100.0*frac)
+
+        return my_str
+
+
+    def write(self, f):
+        """
+        write the refined levels to the h5py File (or Group) f, in a
+        group "amr".  The base level is written as usual.
+        """
+
+        gamr = f.create_group("amr")
+
+        gamr.attrs["max_levels"] = self.max_levels
+        gamr.attrs["block_size"] = self.block_size
+        gamr.attrs["buffer"] = self.buffer
+        gamr.attrs["nlevels"] = len(self.levels)
+
+        for level in self.levels[1:]:
+            glev = gamr.create_group("level-{}".format(level.n))
+            glev.attrs["nx"] = level.nx
+            glev.attrs["ny"] = level.ny
+
+            for k, p in enumerate(level.patches):
+                gp = glev.create_group("patch-{:05d}".format(k))
+                gp.attrs["ilo"] = p.ilo
+                gp.attrs["ihi"] = p.ihi
+                gp.attrs["jlo"] = p.jlo
+                gp.attrs["jhi"] = p.jhi
+
+                g = p.grid
+                for m, name in enumerate(p.data.names):
+                    gp.create_dataset(name,
+                                      data=p.data._data[g.ilo:g.ihi+1, g.jlo:g.jhi+1, m])
+
+
+    @classmethod
+    def read(cls, gamr, base, aux=None):
+        """
+        Reconstruct the hierarchy written by write() to the h5py Group
+        gamr, on top of the base data.  The ghost cells of the refined
+        levels are filled.
+        """
+
+        amr = cls(base, aux=aux, max_levels=gamr.attrs["max_levels"],
+                  block_size=gamr.attrs["block_size"], buffer=gamr.attrs["buffer"])
+
+        B = amr.block_size
+
+        for n in range(1, gamr.attrs["nlevels"]):
+            glev = gamr["level-{}".format(n)]
+            level = AMRLevel(n, glev.attrs["nx"], glev.attrs["ny"], base.t)
+
+            for key in sorted(glev):
+                gp = glev[key]
+                p = amr._new_patch(n, gp.attrs["ilo"]//B, gp.attrs["jlo"]//B)
+
+                for name in p.data.names:
+                    p.data.get_var(name).v()[:,:] = gp[name][:,:]
+
+                level.patches.append(p)
+
+            amr.levels.append(level)
+
+        for n in range(len(amr.levels)):
+            amr.fill_ghosts(n)
+
+        return amr
@@ -0,0 +1,576 @@
+"""
+Domain decomposition over worker processes.
+
+A Decomposition splits the valid region of a Grid2d into npx x npy
+rectangular subdomains (the Tiles made by Grid2d.tiles), each owned
+by its own worker process.  The data for each subdomain, including
+its ghost cells, lives in a multiprocessing.shared_memory block, so
+the main process can see the state of all of the workers (e.g. for
+output) without any messages being passed.
+
+In a worker, the data is a SubdomainData2d, which is used just like
+a CellCenterData2d on the subdomain's grid.  Filling its ghost cells
+is a collective operation: on the sides shared with another
+subdomain (or periodic), the ghost cells are copied from the
+neighbor's valid zones (a halo exchange), and on the physical
+boundaries the usual boundary conditions are applied.  The edges
+are filled in the same order as for a single grid, so the valid
+zones of each subdomain see exactly the same data as they would on
+the whole grid.
+
+Typical usage:
+
+  -- create the decomposition and put the data in shared memory
+
+     decomp = Decomposition(my_grid, npx, npy)
+     decomp.share("state", my_data)
+
+
+  -- start the workers.  setup(decomp) is called in each worker and
+     its return value is passed to every function that is run there
+
+     decomp.start(setup)
+
+
+  -- run a (picklable) function on every worker, and combine the
+     results
+
+     decomp.run(func, *args)
+     dt = decomp.allreduce(func, "min")
+
+
+  -- bring the global data up to date and stop the workers
+
+     decomp.gather("state")
+     decomp.shutdown()
+
+Since every worker must take part in each ghost cell fill, the work
+done in the workers must do the same sequence of fills on all of
+them.  The workers are started with fork, so this is only supported
+where that is available.
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import multiprocessing.connection
+import traceback
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from util import msg
+
+import mesh.boundary as bnd
+import mesh.patch as patch
+
+
+class Decomposition(object):
+    """
+    the split of a grid over worker processes and the data they share
+    """
+
+    def __init__(self, grid, npx, npy=1):
+        """
+        Create the Decomposition.
+
+        Parameters
+        ----------
+        grid : Grid2d object
+            The grid to split
+        npx : int
+            Number of subdomains in the x-direction
+        npy : int, optional
+            Number of subdomains in the y-direction
+        """
+
+        self.grid = grid
+
+        self.npx = int(npx)
+        self.npy = int(npy)
+        self.nprocs = self.npx*self.npy
+
+        if self.npx > grid.nx//grid.ng or self.npy > grid.ny//grid.ng:
+            msg.fail("ERROR: subdomains must have at least ng zones in each direction")
+
+        # the subdomains, in rank order: rank = ix*npy + iy
+        self.tiles = grid.tiles(self.npx, self.npy)
+
+        self.context = multiprocessing.get_context("fork")
+        self.barrier = self.context.Barrier(self.nprocs)
+
+        # our rank -- None in the main process
+        self.rank = None
+
+        # the shared data, by name: (CellCenterData2d, [blocks], [arrays])
+        self._shared = {}
+
+        # the buffers each rank puts the ghost cells its neighbors
+        # need in, sized when the workers start
+        self._halo_blocks = []
+        self._halo = []
+
+        self._procs = []
+        self._conns = []
+
+        # the subdomain data in a worker, by name
+        self.local = {}
+
+
+    def neighbor(self, rank, edge):
+        """
+        return the rank of the subdomain on the other side of edge
+        ('xlb', 'xrb', 'ylb', or 'yrb') of subdomain rank, wrapping
+        around periodically at the physical boundaries
+        """
+        ix, iy = divmod(rank, self.npy)
+
+        if edge == "xlb":
+            ix = (ix - 1) % self.npx
+        elif edge == "xrb":
+            ix = (ix + 1) % self.npx
+        elif edge == "ylb":
+            iy = (iy - 1) % self.npy
+        else:
+            iy = (iy + 1) % self.npy
+
+        return ix*self.npy + iy
+
+
+    def share(self, name, data):
+        """
+        Put a copy of the CellCenterData2d data (defined on our grid)
+        into shared memory, one block for each subdomain, holding its
+        zones including the ghost cells.  This must be done before the
+        workers are started.
+        """
+
+        if data.grid is not self.grid:
+            msg.fail("ERROR: data is not on the decomposed grid")
+
+        blocks = []
+        arrays = []
+
+        for tile in self.tiles:
+            qx = tile.grid.qx
+            qy = tile.grid.qy
+
+            nbytes = qx*qy*data.nvar*np.dtype(data.dtype).itemsize
+            shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+
+            a = np.ndarray((qx, qy, data.nvar), dtype=data.dtype, buffer=shm.buf)
+            a[:,:,:] = data._data[tile.box]
+
+            blocks.append(shm)
+            arrays.append(a)
+
+        self._shared[name] = (data, blocks, arrays)
+
+
+    def gather(self, name):
+        """
+        Copy the current state of the shared data name back into the
+        global CellCenterData2d object it came from.  Each subdomain
+        supplies its valid zones, plus the ghost cells on the
+        physical boundaries it touches.
+        """
+
+        data, _, arrays = self._shared[name]
+
+        ng = self.grid.ng
+        d = data._data
+
+        for tile, a in zip(self.tiles, arrays):
+
+            ilo = 0 if tile.xl else ng
+            ihi = a.shape[0] if tile.xr else a.shape[0] - ng
+            jlo = 0 if tile.yl else ng
+            jhi = a.shape[1] if tile.yr else a.shape[1] - ng
+
+            d[tile.ilo-ng+ilo:tile.ilo-ng+ihi,
+              tile.jlo-ng+jlo:tile.jlo-ng+jhi, :] = a[ilo:ihi, jlo:jhi, :]
+
+        data.mark_dirty()
+
+
+    def subdomain_data(self, name):
+        """
+        return the SubdomainData2d for the shared data name on our
+        subdomain (in a worker)
+        """
+
+        data, _, arrays = self._shared[name]
+        tile = self.tiles[self.rank]
+
+        new = SubdomainData2d(tile.grid, self, dtype=data.dtype)
+
+        for n in range(data.nvar):
+            new.register_var(data.names[n], data.BCs[data.names[n]])
+
+        new.aux = data.aux
+        new.derives = data.derives
+        new.t = data.t
+
+        new.data = arrays[self.rank]
+        new.initialized = 1
+
+        return new
+
+
+    def start(self, setup):
+        """
+        Start the worker processes.  In each, the SubdomainData2d
+        objects for the shared data are made (see local), and then
+        setup(self) is called -- its return value is passed to the
+        functions run with run().
+        """
+
+        # the halo buffers are big enough for ng rows of any of the
+        # shared data, along the longest side of a subdomain
+        nvar = max([data.nvar for data, _, _ in self._shared.values()] + [1])
+
+        for tile in self.tiles:
+            n = self.grid.ng*max(tile.grid.qx, tile.grid.qy)*nvar
+            shm = shared_memory.SharedMemory(create=True, size=8*n)
+            self._halo_blocks.append(shm)
+            self._halo.append(np.ndarray((n,), dtype=np.float64, buffer=shm.buf))
+
+        for rank in range(self.nprocs):
+            parent, child = self.context.Pipe()
+            p = self.context.Process(target=self._work, args=(rank, child, setup),
+                                     daemon=True)
+            p.start()
+            child.close()
+
+            self._procs.append(p)
+            self._conns.append(parent)
+
+        # wait for them to be set up
+        self._collect()
+
+
+    def _work(self, rank, conn, setup):
+        """ the command loop run by each worker """
+
+        self.rank = rank
+        self._procs = []
+        self._conns = []
+
+        try:
+            self.local = dict((name, self.subdomain_data(name)) for name in self._shared)
+            state = setup(self)
+        except BaseException:
+            self.barrier.abort()
+            conn.send((False, traceback.format_exc()))
+            return
+
+        conn.send((True, None))
+
+        while True:
+            try:
+                command = conn.recv()
+            except EOFError:
+                break
+
+            if command is None:
+                break
+
+            func, args = command
+
+            try:
+                result = func(state, *args)
+            except BaseException:
+                # let the other workers know, in case they are waiting
+                # for us in a ghost cell fill
+                self.barrier.abort()
+                conn.send((False, traceback.format_exc()))
+            else:
+                conn.send((True, result))
+
+        conn.close()
+
+
+    def _collect(self):
+        """
+        wait for a reply from each worker, and return the list of
+        results in rank order.  If any of them failed (or died), we
+        shut down and abort.
+        """
+
+        results = [None]*self.nprocs
+        errors = []
+
+        pending = dict((c, rank) for rank, c in enumerate(self._conns))
+        sentinels = dict((p.sentinel, rank) for rank, p in enumerate(self._procs))
+
+        while pending:
+            ready = multiprocessing.connection.wait(
+                list(pending) + [s for s, rank in sentinels.items()
+                                 if self._conns[rank] in pending])
+
+            for r in ready:
+                if r in pending:
+                    rank = pending.pop(r)
+                    ok, value = r.recv()
+                    if ok:
+                        results[rank] = value
+                    else:
+                        errors.append((rank, value))
+
+                else:
+                    rank = sentinels[r]
+                    c = self._conns[rank]
+                    if c in pending and not c.poll():
+                        del pending[c]
+                        self.barrier.abort()
+                        errors.append((rank, "worker process died\n"))
+
+        if errors:
+            # report the error that started it, not the other workers
+            # finding the barrier broken
+            errors.sort(key=lambda e: "BrokenBarrierError" in e[1])
+            rank, error = errors[0]
+            self.shutdown()
+            msg.fail("ERROR: worker {} failed:\n{}".format(rank, error))
+
+        return results
+
+
+    def run(self, func, *args):
+        """
+        Call func(state, *args) in each worker, where state is what the
+        setup function passed to start returned, and return the list of
+        the results, in rank order.  func and args are pickled, so func
+        must be a module-level function.
+        """
+
+        for c in self._conns:
+            c.send((func, args))
+
+        return self._collect()
+
+
+    def allreduce(self, func, op, *args):
+        """
+        run func on each worker (see run) and combine the results with
+        op ('sum', 'min', or 'max')
+        """
+
+        results = self.run(func, *args)
+
+        if op == "sum":
+            return sum(results[1:], results[0])
+        elif op == "min":
+            return min(results)
+        elif op == "max":
+            return max(results)
+        else:
+            msg.fail("ERROR: reduction {} not supported".format(op))
+
+
+    def shutdown(self):
+        """
+        stop the workers and free the shared memory.  The shared data
+        should be gathered first.
+        """
+
+        for c in self._conns:
+            try:
+                c.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+
+        for p in self._procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+
+        for c in self._conns:
+            c.close()
+
+        self._procs = []
+        self._conns = []
+
+        # the arrays pointing into the blocks must be gone before they
+        # are closed
+        for name in list(self._shared):
+            data, blocks, arrays = self._shared.pop(name)
+            del arrays[:]
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+        del self._halo[:]
+        for shm in self._halo_blocks:
+            shm.close()
+            shm.unlink()
+        self._halo_blocks = []
+
+
+    def exchange(self, send, recv_rank, out, index):
+        """
+        The collective step of a halo exchange: each rank puts send
+        (the valid zones its neighbor on the other side of an edge
+        needs) in its buffer, and once they all have, we copy the
+        buffer of rank recv_rank (if not None) into out[index].
+        """
+
+        n = send.size
+        self._halo[self.rank][:n] = send.ravel()
+
+        self.barrier.wait()
+
+        if recv_rank is not None:
+            out[index] = self._halo[recv_rank][:n].reshape(send.shape)
+
+        # the neighbors may still be reading our buffer until everyone
+        # gets here
+        self.barrier.wait()
+
+
+    def __str__(self):
+        return "decomposition: {} x {} subdomains".format(self.npx, self.npy)
+
+
+class SubdomainData2d(patch.CellCenterData2d):
+    """
+    The cell-centered data on one subdomain of a Decomposition, as
+    seen by the worker owning it.  Filling the ghost cells exchanges
+    them with the neighboring subdomains, so every worker must make
+    the same sequence of calls to fill_BC and fill_BC_all.  For that
+    reason, lazy_bcs is not supported -- the ghost cells are always
+    filled.
+    """
+
+    def __init__(self, grid, decomp, dtype=np.float64):
+        """
+        Create the SubdomainData2d object.
+
+        Parameters
+        ----------
+        grid : Grid2d object
+            The grid of our subdomain (the Tile's grid)
+        decomp : Decomposition object
+            The decomposition we are a part of
+        dtype : NumPy data type, optional
+            The datatype of the data
+        """
+
+        patch.CellCenterData2d.__init__(self, grid, dtype=dtype)
+
+        self.decomp = decomp
+        self.tile = decomp.tiles[decomp.rank]
+
+        # are the x ghost cells in the valid rows current (see
+        # _refresh_halos)?
+        self._refreshed = False
+
+
+    def _empty_like(self):
+        return SubdomainData2d(self.grid, self.decomp, dtype=self.dtype)
+
+
+    def _halo(self, edge, n, periodic, rows=slice(None)):
+        """
+        Do the halo exchange for the variable(s) n on edge.  We receive
+        from the neighbor if the edge is shared with another subdomain
+        (or the boundary is periodic), and return whether we did.
+        Only the rows (a slice along the edge) are exchanged.
+        """
+
+        g = self.grid
+        ng = g.ng
+        d = self._data
+
+        if edge in ["xlb", "xrb"]:
+            lo, hi = g.ilo, g.ihi
+            physical = self.tile.xl if edge == "xlb" else self.tile.xr
+        else:
+            d = d.swapaxes(0, 1)
+            lo, hi = g.jlo, g.jhi
+            physical = self.tile.yl if edge == "ylb" else self.tile.yr
+
+        # the lower ghost cells come from the upper valid zones of
+        # the neighbor, and vice versa
+        if edge in ["xlb", "ylb"]:
+            send = d[hi-ng+1:hi+1,rows,n]
+            recv = np.s_[:lo,rows,n]
+        else:
+            send = d[lo:lo+ng,rows,n]
+            recv = np.s_[hi+1:,rows,n]
+
+        receive = not physical or periodic
+
+        src = self.decomp.neighbor(self.decomp.rank, edge) if receive else None
+        self.decomp.exchange(send, src, d, recv)
+
+        return receive
+
+
+    def _refresh_halos(self):
+        """
+        Exchange the ghost cells shared with our neighbors in x, in the
+        valid rows, for all of the variables.  On the whole grid these
+        are valid zones, so they are always current, and the
+        user-defined BCs may look at them for any of the variables.
+        """
+        rows = slice(self.grid.jlo, self.grid.jhi+1)
+        for edge in ["xlb", "xrb"]:
+            self._halo(edge, slice(None), False, rows=rows)
+
+
+    def fill_BC_all(self):
+        if self._has_user_bcs():
+            self._refresh_halos()
+
+        self._refreshed = True
+        try:
+            patch.CellCenterData2d.fill_BC_all(self)
+        finally:
+            self._refreshed = False
+
+
+    def fill_BC(self, name):
+        bc = self.BCs[name]
+        if (not self._refreshed and
+                (bc.ylb in bnd.ext_bcs.keys() or bc.yrb in bnd.ext_bcs.keys())):
+            self._refresh_halos()
+
+        patch.CellCenterData2d.fill_BC(self, name)
+
+
+    def _has_user_bcs(self):
+        """ do any of our variables use a user-defined BC? """
+        return any(bc.ylb in bnd.ext_bcs.keys() or bc.yrb in bnd.ext_bcs.keys()
+                   for bc in self.BCs.values())
+
+
+    def _fill_edge(self, edge, bc_type, n, value=None):
+
+        if bc_type == "negate":
+            # this finishes off a reflection, which is only done on
+            # the physical boundaries
+            if getattr(self.tile, edge[:2]):
+                patch.CellCenterData2d._fill_edge(self, edge, bc_type, n, value)
+            return
+
+        if self._halo(edge, n, bc_type == "periodic"):
+            return
+
+        if value is not None:
+            # the inhomogeneous values are for the whole boundary
+            if edge in ["xlb", "xrb"]:
+                value = value[self.tile.box[1]]
+            else:
+                value = value[self.tile.box[0]]
+
+        patch.CellCenterData2d._fill_edge(self, edge, bc_type, n, value)
+
+
+    def _fill_user(self, edge, bc_type, name):
+
+        if self._halo(edge, self._name_index[name], False):
+            return
+
+        patch.CellCenterData2d._fill_user(self, edge, bc_type, name)
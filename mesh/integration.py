@@ -20,10 +20,51 @@ the update is
 and the s increment is 
 
   k_s = f(t + c_s dt, y_n + dt (a_s1 k1 + a_s2 k2 + ... + a_s,s-1 k_{s-1})
+
+This needs storage for all of the stage increments, plus the stage
+state.  We also support low-storage methods (LowStorageRKIntegrator)
+that update the state in place and keep a single extra register, S2,
+with the state itself as the other (S1).  Each stage does
+
+  k_i = f(t + c_i dt, S1)
+
+  S2 = p_i S2 + q_i S1 + r_i dt k_i
+  S1 = u_i S1 + v_i S2 + w_i dt k_i
+
+(in that order), starting with S1 = y_n and S2 = y_n or 0.  This
+covers the Williamson 2N form (S2 is the accumulated increment) and
+the Shu-Osher form of the SSP methods (S2 holds y_n).
+
+The embedded methods (BS32, DP54) have a second set of weights, b^,
+giving a lower-order solution.  The difference between the two,
+
+  err = dt sum_{i=1}^s {(b_i - b^_i) k_i}
+
+estimates the error of the step, which a step size controller
+(PIController) uses to accept or reject the step and choose the next
+dt.
+
+The IMEX additive methods (ARS222, ARS443) split the righthand side
+into an explicit part, f_E, and a stiff part, f_I, treated implicitly
+with a diagonally implicit tableau (a^I, b^I).  Stage i is
+
+  Y_i = Y*_i + dt a^I_ii f_I(Y_i)
+
+  Y*_i = y_n + dt sum_{j<i} (a_ij k_j + a^I_ij l_j)
+
+with k_j = f_E(Y_j) and l_j = f_I(Y_j), so each stage needs a solve
+of y - h f_I(y) = Y*_i, with h = dt a^I_ii.  The caller does this (e.g.
+a pointwise Newton solve, see newton_solve, or a multigrid solve) and
+l_i = (Y_i - Y*_i)/h is recovered from the result.  The update is
+
+  y_{n+1} = y_n + dt sum_{i=1}^s {b_i k_i + b^I_i l_i}
+
+Use rk_integrator() to get the integrator for a method by name.
 """
 
 import numpy as np
 import mesh.patch as patch
+from util import msg
 
 a = {}
 b = {}
@@ -70,6 +111,156 @@ b["RK4"] = np.array([1./6., 1./3., 1./3., 1./6.])
 c["RK4"] = np.array([0.0, 0.5, 0.5, 1.0])
 
 
+# the embedded methods -- b_hat are the weights of the lower-order
+# solution, whose order is embedded_order
+b_hat = {}
+embedded_order = {}
+
+# third-order, with an embedded second-order (Bogacki & Shampine 1989)
+a["BS32"] = np.array([[0.0,   0.0,   0.0,   0.0],
+                      [0.5,   0.0,   0.0,   0.0],
+                      [0.0,   0.75,  0.0,   0.0],
+                      [2./9., 1./3., 4./9., 0.0]])
+
+b["BS32"] = np.array([2./9., 1./3., 4./9., 0.0])
+
+c["BS32"] = np.array([0.0, 0.5, 0.75, 1.0])
+
+b_hat["BS32"] = np.array([7./24., 0.25, 1./3., 0.125])
+
+embedded_order["BS32"] = 2
+
+
+# fifth-order, with an embedded fourth-order (Dormand & Prince 1980)
+a["DP54"] = np.array([[0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                      [1./5., 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                      [3./40., 9./40., 0.0, 0.0, 0.0, 0.0, 0.0],
+                      [44./45., -56./15., 32./9., 0.0, 0.0, 0.0, 0.0],
+                      [19372./6561., -25360./2187., 64448./6561., -212./729., 0.0, 0.0, 0.0],
+                      [9017./3168., -355./33., 46732./5247., 49./176., -5103./18656., 0.0, 0.0],
+                      [35./384., 0.0, 500./1113., 125./192., -2187./6784., 11./84., 0.0]])
+
+b["DP54"] = np.array([35./384., 0.0, 500./1113., 125./192., -2187./6784., 11./84., 0.0])
+
+c["DP54"] = np.array([0.0, 0.2, 0.3, 0.8, 8./9., 1.0, 1.0])
+
+b_hat["DP54"] = np.array([5179./57600., 0.0, 7571./16695., 393./640.,
+                          -92097./339200., 187./2100., 1./40.])
+
+embedded_order["DP54"] = 4
+
+
+# the low-storage methods -- each row is p, q, r, u, v, w for a stage
+ls = {}
+ls_c = {}
+
+# the initial S2 is ls_start*y_n
+ls_start = {}
+
+# third-order, 2N (Williamson 1980)
+ls["LSRK33"] = np.array([[0.0,       0.0, 1.0, 1.0, 1./3.,   0.0],
+                         [-5./9.,    0.0, 1.0, 1.0, 15./16., 0.0],
+                         [-153./128, 0.0, 1.0, 1.0, 8./15.,  0.0]])
+
+ls_c["LSRK33"] = np.array([0.0, 1./3., 3./4.])
+
+ls_start["LSRK33"] = 0.0
+
+
+# fourth-order, 5 stage, 2N (Carpenter & Kennedy 1994)
+_A = [0.0,
+      -567301805773.0/1357537059087.0,
+      -2404267990393.0/2016746695238.0,
+      -3550918686646.0/2091501179385.0,
+      -1275806237668.0/842570457699.0]
+
+_B = [1432997174477.0/9575080441755.0,
+      5161836677717.0/13612068292357.0,
+      1720146321549.0/2090206949498.0,
+      3134564353537.0/4481467310338.0,
+      2277821191437.0/14882151754819.0]
+
+ls["LSRK54"] = np.array([[A, 0.0, 1.0, 1.0, B, 0.0] for A, B in zip(_A, _B)])
+
+ls_c["LSRK54"] = np.array([0.0,
+                           1432997174477.0/9575080441755.0,
+                           2526269341429.0/6820363962896.0,
+                           2006345519317.0/3224310063776.0,
+                           2802321613138.0/2924317926251.0])
+
+ls_start["LSRK54"] = 0.0
+
+
+# third-order SSP (Shu & Osher), same as TVD3
+ls["SSPRK33"] = np.array([[1.0, 0.0, 0.0, 1.0,   0.0,   1.0],
+                          [1.0, 0.0, 0.0, 0.25,  0.75,  0.25],
+                          [1.0, 0.0, 0.0, 2./3., 1./3., 2./3.]])
+
+ls_c["SSPRK33"] = np.array([0.0, 1.0, 0.5])
+
+ls_start["SSPRK33"] = 1.0
+
+
+# fourth-order, 10 stage SSP (Ketcheson 2008), with an SSP
+# coefficient of 6
+_stage = [1.0, 0.0, 0.0, 1.0, 0.0, 1./6.]
+
+ls["SSPRK104"] = np.array(4*[_stage] +
+                          [[1./25., 9./25., 9./150., -5.0, 15.0, -5./6.]] +
+                          4*[_stage] +
+                          [[1.0, 0.0, 0.0, 0.6, 1.0, 0.1]])
+
+ls_c["SSPRK104"] = np.array([0.0, 1./6., 1./3., 0.5, 2./3.,
+                             1./3., 0.5, 2./3., 5./6., 1.0])
+
+ls_start["SSPRK104"] = 1.0
+
+
+# the IMEX methods -- a, b, c hold the explicit tableau and a_im, b_im
+# the implicit one.  The first stage is explicit (a_im[0,0] = 0 and
+# the first column of a_im is zero), so it is just y_n
+a_im = {}
+b_im = {}
+
+# second-order, L-stable (Ascher, Ruuth & Spiteri 1997)
+_g = 1.0 - 1.0/np.sqrt(2.0)
+_d = 1.0 - 1.0/(2.0*_g)
+
+a["ARS222"] = np.array([[0.0, 0.0,      0.0],
+                        [_g,  0.0,      0.0],
+                        [_d,  1.0 - _d, 0.0]])
+
+b["ARS222"] = np.array([_d, 1.0 - _d, 0.0])
+
+c["ARS222"] = np.array([0.0, _g, 1.0])
+
+a_im["ARS222"] = np.array([[0.0, 0.0,      0.0],
+                           [0.0, _g,       0.0],
+                           [0.0, 1.0 - _g, _g]])
+
+b_im["ARS222"] = np.array([0.0, 1.0 - _g, _g])
+
+
+# third-order, L-stable (Ascher, Ruuth & Spiteri 1997)
+a["ARS443"] = np.array([[0.0,     0.0,    0.0,   0.0,    0.0],
+                        [0.5,     0.0,    0.0,   0.0,    0.0],
+                        [11./18., 1./18., 0.0,   0.0,    0.0],
+                        [5./6.,   -5./6., 0.5,   0.0,    0.0],
+                        [0.25,    1.75,   0.75,  -1.75,  0.0]])
+
+b["ARS443"] = np.array([0.25, 1.75, 0.75, -1.75, 0.0])
+
+c["ARS443"] = np.array([0.0, 0.5, 2./3., 0.5, 1.0])
+
+a_im["ARS443"] = np.array([[0.0, 0.0,   0.0,  0.0, 0.0],
+                           [0.0, 0.5,   0.0,  0.0, 0.0],
+                           [0.0, 1./6., 0.5,  0.0, 0.0],
+                           [0.0, -0.5,  0.5,  0.5, 0.0],
+                           [0.0, 1.5,   -1.5, 0.5, 0.5]])
+
+b_im["ARS443"] = np.array([0.0, 1.5, -1.5, 0.5, 0.5])
+
+
 
 class RKIntegrator(object):
     """the integration class for CellCenterData2d, supporting RK
@@ -88,6 +279,24 @@ class RKIntegrator(object):
 
         self.start = None
 
+        # the stage data and a scratch array for assembling it.  These
+        # are kept when the integrator is reused (see reset)
+        self.stage = None
+        self.scratch = None
+
+        # for the embedded methods, a copy of the starting state, so a
+        # rejected step can be undone
+        self.saved = None
+
+    def reset(self, t, dt):
+        """start a new step from t with timestep dt, reusing our
+        storage"""
+        self.t = t
+        self.dt = dt
+
+        self.k = [None]*len(b[self.method])
+        self.start = None
+
     def nstages(self):
         """return the number of stages"""
         return len(b[self.method])
@@ -97,22 +306,56 @@ class RKIntegrator(object):
         object)"""
         self.start = start
 
+        if self.stage is None or self.stage.grid is not start.grid or \
+           self.stage.names != start.names:
+            self.stage = patch.cell_center_data_clone(start)
+            self.scratch = np.empty_like(self._valid(start._data))
+            self.saved = None
+
+        if self.embedded():
+            if self.saved is None:
+                self.saved = np.empty_like(self.scratch)
+            np.copyto(self.saved, self._valid(start._data))
+
+    def embedded(self):
+        """do we have an error estimate?"""
+        return self.method in b_hat
+
     def store_increment(self, istage, k_stage):
         """store the increment for stage istage -- this should not have a dt
         weighting"""
         self.k[istage] = k_stage
 
+    def _valid(self, arr):
+        """the valid zones of arr, with all of the variables"""
+        g = self.start.grid
+        v = np.asarray(arr[g.ilo:g.ihi+1, g.jlo:g.jhi+1])
+        if v.ndim == 2:
+            v = v[:,:,np.newaxis]
+        return v
+
+    def _add_increments(self, U, coeffs):
+        """add dt sum_s coeffs[s] k_s to the array U (the valid
+        zones), for all of the variables at once"""
+        for s, coeff in enumerate(coeffs):
+            if coeff == 0.0:
+                continue
+            np.multiply(self.dt*coeff, self._valid(self.k[s]), out=self.scratch)
+            U += self.scratch
+
     def get_stage_start(self, istage):
         """get the starting conditions (a CellCenterData2d object) for stage
-        istage"""
+        istage.  For istage > 0, this is our stage data, which is
+        overwritten by the next stage"""
         if istage == 0:
             ytmp = self.start
         else:
-            ytmp = patch.cell_center_data_clone(self.start)
-            for n in range(ytmp.nvar):
-                var = ytmp.get_var_by_index(n)
-                for s in range(istage):
-                    var.v()[:,:] += self.dt*a[self.method][istage,s]*self.k[s].v(n=n)[:,:]
+            ytmp = self.stage
+
+            np.copyto(ytmp._data, self.start._data)
+            self._add_increments(self._valid(ytmp._data),
+                                 a[self.method][istage,:istage])
+            ytmp.mark_dirty()
 
             ytmp.t = self.t + c[self.method][istage]*self.dt
 
@@ -121,11 +364,291 @@ class RKIntegrator(object):
     def compute_final_update(self):
         """this constructs the final t + dt update, overwriting the inital data"""
         ytmp = self.start
-        for n in range(ytmp.nvar):
-            var = ytmp.get_var_by_index(n)
-            for s in range(self.nstages()):
-                var.v()[:,:] += self.dt*b[self.method][s]*self.k[s].v(n=n)[:,:]
-            
+
+        self._add_increments(self._valid(ytmp._data), b[self.method])
+        ytmp.mark_dirty()
+
         return ytmp
 
-        
+    def error_norm(self, atol, rtol):
+        """after compute_final_update, return the RMS norm (over the valid
+        zones and variables) of the error estimate of an embedded
+        method, relative to atol + rtol*max(|y_n|, |y_{n+1}|).  The
+        step is acceptable if this is <= 1"""
+
+        err = self.scratch
+        err[...] = 0.0
+        for s in range(self.nstages()):
+            coeff = b[self.method][s] - b_hat[self.method][s]
+            if coeff != 0.0:
+                err += (self.dt*coeff)*self._valid(self.k[s])
+
+        scale = atol + rtol*np.maximum(abs(self.saved), abs(self._valid(self.start._data)))
+
+        return float(np.sqrt(np.mean((err/scale)**2)))
+
+    def reject(self):
+        """undo the step, restoring the starting state"""
+        self._valid(self.start._data)[...] = self.saved
+        self.start.mark_dirty()
+
+
+class LowStorageRKIntegrator(object):
+    """the integration class for CellCenterData2d, supporting the
+    low-storage RK methods.  This has the same interface as
+    RKIntegrator, but the stages are all done in place on the starting
+    data"""
+
+    def __init__(self, t, dt, method="LSRK54"):
+        """t is the starting time, dt is the total timestep to advance,
+        method is one of the methods in ls"""
+        self.method = method
+
+        self.t = t
+        self.dt = dt
+
+        self.start = None
+
+        # the second register
+        self.S2 = None
+
+    def reset(self, t, dt):
+        """start a new step from t with timestep dt"""
+        self.t = t
+        self.dt = dt
+
+        self.start = None
+
+    def nstages(self):
+        """return the number of stages"""
+        return len(ls_c[self.method])
+
+    def set_start(self, start):
+        """store the starting conditions (should be a CellCenterData2d
+        object).  This is updated in place"""
+        self.start = start
+
+        g = start.grid
+        v = np.asarray(start._data[g.ilo:g.ihi+1, g.jlo:g.jhi+1, :])
+
+        if self.S2 is None or self.S2.shape != v.shape:
+            self.S2 = np.empty_like(v)
+        np.multiply(ls_start[self.method], v, out=self.S2)
+
+    def store_increment(self, istage, k_stage):
+        """use the increment for stage istage (without a dt weighting)
+        to update the registers"""
+
+        p, q, r, u, v, w = ls[self.method][istage]
+
+        g = self.start.grid
+        vs = np.s_[g.ilo:g.ihi+1, g.jlo:g.jhi+1]
+
+        S1 = self.start.data[vs]
+        S2 = self.S2
+
+        k = np.asarray(k_stage[vs])
+        if k.ndim == 2:
+            k = k[:,:,np.newaxis]
+
+        if p != 1.0:
+            S2 *= p
+        if q != 0.0:
+            S2 += q*S1
+        if r != 0.0:
+            S2 += (r*self.dt)*k
+
+        if u != 1.0:
+            S1 *= u
+        if v != 0.0:
+            S1 += v*S2
+        if w != 0.0:
+            S1 += (w*self.dt)*k
+
+    def get_stage_start(self, istage):
+        """get the starting conditions (a CellCenterData2d object) for stage
+        istage -- this is the starting data itself"""
+        self.start.t = self.t + ls_c[self.method][istage]*self.dt
+        return self.start
+
+    def compute_final_update(self):
+        """the update is already done -- this just resets the time"""
+        self.start.t = self.t
+        return self.start
+
+
+class IMEXRKIntegrator(RKIntegrator):
+    """the integration class for CellCenterData2d, supporting the IMEX
+    additive RK methods.  The increments passed to store_increment are
+    the explicit part.  For a stage with implicit_weight h > 0, the
+    caller solves y - h f_I(y) = ytmp in place on the stage start and
+    passes the result to store_implicit"""
+
+    def __init__(self, t, dt, method="ARS222"):
+        """t is the starting time, dt is the total timestep to advance,
+        method is one of the methods in a_im"""
+        RKIntegrator.__init__(self, t, dt, method=method)
+
+        # the implicit increments and the stage start before the
+        # implicit solve (valid zones only).  These are kept when the
+        # integrator is reused
+        self.l = [None]*self.nstages()
+        self.predictor = None
+
+    def set_start(self, start):
+        """store the starting conditions (should be a CellCenterData2d
+        object)"""
+        RKIntegrator.set_start(self, start)
+
+        if self.predictor is None or self.predictor.shape != self.scratch.shape:
+            self.predictor = np.empty_like(self.scratch)
+            self.l = [None]*self.nstages()
+
+    def implicit_weight(self, istage):
+        """the weight, h = dt a^I_ii, of the implicit term in the solve
+        for stage istage"""
+        return self.dt*a_im[self.method][istage, istage]
+
+    def get_stage_start(self, istage):
+        """get the starting conditions (a CellCenterData2d object) for stage
+        istage, with both the explicit and implicit increments of the
+        earlier stages.  For istage > 0, this is our stage data, which
+        the implicit solve updates in place"""
+        if istage == 0:
+            return RKIntegrator.get_stage_start(self, istage)
+
+        ytmp = RKIntegrator.get_stage_start(self, istage)
+
+        U = self._valid(ytmp._data)
+        self._add_implicit_increments(U, a_im[self.method][istage,:istage])
+        ytmp.mark_dirty()
+
+        np.copyto(self.predictor, U)
+
+        return ytmp
+
+    def store_implicit(self, istage, ytmp):
+        """store the implicit increment for stage istage, given the
+        stage data after the implicit solve"""
+        if self.l[istage] is None:
+            self.l[istage] = np.empty_like(self.predictor)
+
+        np.subtract(self._valid(ytmp._data), self.predictor, out=self.l[istage])
+        self.l[istage] /= self.implicit_weight(istage)
+
+    def _add_implicit_increments(self, U, coeffs):
+        """add dt sum_s coeffs[s] l_s to the array U (the valid zones)"""
+        for s, coeff in enumerate(coeffs):
+            if coeff == 0.0:
+                continue
+            np.multiply(self.dt*coeff, self.l[s], out=self.scratch)
+            U += self.scratch
+
+    def compute_final_update(self):
+        """this constructs the final t + dt update, overwriting the inital data"""
+        ytmp = RKIntegrator.compute_final_update(self)
+
+        self._add_implicit_increments(self._valid(ytmp._data), b_im[self.method])
+        ytmp.mark_dirty()
+
+        return ytmp
+
+
+def rk_integrator(t, dt, method="RK4", reuse=None):
+    """return the integrator (RKIntegrator, LowStorageRKIntegrator, or
+    IMEXRKIntegrator) for the method, starting at t with timestep dt.
+    If reuse is the integrator from the last step, with the same
+    method, it is reset and returned, so its storage is reused"""
+    if reuse is not None and reuse.method == method:
+        reuse.reset(t, dt)
+        return reuse
+
+    if method in ls:
+        return LowStorageRKIntegrator(t, dt, method=method)
+    if method in a_im:
+        return IMEXRKIntegrator(t, dt, method=method)
+    return RKIntegrator(t, dt, method=method)
+
+
+def newton_solve(y, rhs, jac, h, rtol=1.e-10, atol=1.e-14, max_iter=25):
+    """solve y - h f(y) = y_0 pointwise by Newton iteration, where y_0
+    is the value of y passed in.  The components are the last axis of
+    y, so the other axes are independent zones, all iterated together.
+    rhs(y) returns f(y), with the same shape as y, and jac(y) the
+    Jacobian df/dy, with shape y.shape + (nv,).  In zones where the
+    full Newton step does not reduce the residual, it is halved until
+    it does (a backtracking line search).  y is updated in place, and
+    the number of iterations is returned"""
+
+    y0 = y.copy()
+    eye = np.eye(y.shape[-1])
+    scale = abs(y0) + atol
+
+    def residual(y):
+        r = y - h*rhs(y) - y0
+        return r, np.sqrt(np.sum((r/scale)**2, axis=-1, keepdims=True))
+
+    resid, norm = residual(y)
+
+    for n in range(1, max_iter+1):
+        J = eye - h*jac(y)
+        dy = np.linalg.solve(J, -resid[..., np.newaxis])[..., 0]
+
+        if np.all(abs(dy) <= rtol*abs(y + dy) + atol):
+            y += dy
+            return n
+
+        step = np.ones_like(norm)
+        for _ in range(10):
+            y_new = y + step*dy
+            r_new, norm_new = residual(y_new)
+
+            worse = norm_new > norm
+            if not worse.any():
+                break
+            step[worse] *= 0.5
+
+        y[...] = y_new
+        resid, norm = r_new, norm_new
+
+    msg.fail("ERROR: Newton iteration did not converge in {} iterations".format(max_iter))
+
+
+class PIController(object):
+    """a proportional-integral step size controller (Gustafsson 1991)
+    for the embedded methods.  After an accepted step of dt with error
+    norm err (see RKIntegrator.error_norm), the next step is
+
+      dt_new = dt safety err^(-0.7/k) err_old^(0.4/k)
+
+    where err_old is the error norm of the last accepted step and k is
+    one more than the order of the embedded solution.  The change is
+    limited to the range [min_factor, max_factor]."""
+
+    def __init__(self, order, safety=0.9, min_factor=0.2, max_factor=5.0):
+        """order is the order of the embedded (lower-order) solution"""
+        self.k = order + 1.0
+
+        self.safety = safety
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+
+        self.err_old = 1.0
+
+    def accept(self, err):
+        """is a step with error norm err acceptable?"""
+        return err <= 1.0
+
+    def propose(self, dt, err):
+        """return the next timestep, after an accepted step of dt with
+        error norm err"""
+        err = max(err, 1.e-10)
+        factor = self.safety*err**(-0.7/self.k)*self.err_old**(0.4/self.k)
+        self.err_old = err
+        return dt*min(self.max_factor, max(self.min_factor, factor))
+
+    def retry(self, dt, err):
+        """return the timestep to redo a rejected step of dt with error
+        norm err"""
+        factor = self.safety*err**(-1.0/self.k)
+        return dt*min(1.0, max(self.min_factor, factor))
@@ -34,17 +34,148 @@ Typical usage:
 """
 from __future__ import print_function
 
+import contextlib
 import numpy as np
 import pickle
+import weakref
 
-import h5py
-
-from util import msg
+from util import backends, msg
 
 import mesh.boundary as bnd
 import mesh.array_indexer as ai
 
 
+class ScratchPool(object):
+    """
+    A pool of scratch arrays for a grid.  Arrays that are released
+    back to the pool are handed out again by later requests for the
+    same shape, so the hot loops of the solvers do not need to
+    allocate (and page-zero) fresh memory for every temporary.
+
+    Arrays are either released explicitly, with release(), or
+    automatically at the end of a scope():
+
+       with myg.scratch_scope():
+           dc = myg.pooled_array()
+           ...
+
+    Any array obtained inside the scope must not be used after the
+    scope ends.
+    """
+
+    # only keep this many released arrays (per nvar) that did not
+    # come from the pool
+    max_adopt = 4
+
+    def __init__(self, grid):
+        self.grid = grid
+
+        # released arrays, keyed by nvar
+        self._free = {}
+
+        # weakrefs to the arrays that are currently handed out (keyed
+        # by id), so we notice ones that are dropped without release
+        self._out = {}
+
+        # the arrays handed out in each of the currently open scopes
+        self._scopes = []
+
+        self.in_use_bytes = 0
+        self.peak_bytes = 0
+        self.pooled_bytes = 0
+        self.n_alloc = 0
+        self.n_reuse = 0
+
+    def get(self, nvar=1, zero=True):
+        """
+        return an ArrayIndexer with the size and number of ghost cells
+        of the grid, reusing a released array if one is available.  If
+        zero is False, the contents are undefined, so the caller must
+        overwrite all of it.
+        """
+        free = self._free.get(nvar)
+        if free:
+            a = free.pop()
+            self.n_reuse += 1
+            if zero:
+                a.fill(0.0)
+        else:
+            if nvar == 1:
+                a = self.grid.scratch_array()
+            else:
+                a = self.grid.scratch_array(nvar=nvar)
+            self.n_alloc += 1
+            self.pooled_bytes += a.nbytes
+
+        self._out[id(a)] = weakref.ref(a, self._make_lost(id(a), a.nbytes))
+        self.in_use_bytes += a.nbytes
+        self.peak_bytes = max(self.peak_bytes, self.in_use_bytes)
+
+        if self._scopes:
+            self._scopes[-1].append(a)
+
+        return a
+
+    def _make_lost(self, key, nbytes):
+        """ callback for an array that is garbage collected while out """
+        def lost(ref):
+            if self._out.get(key) is ref:
+                del self._out[key]
+            self.in_use_bytes -= nbytes
+            self.pooled_bytes -= nbytes
+        return lost
+
+    def release(self, *arrays):
+        """
+        give arrays back to the pool.  Scratch arrays (the full size of
+        the grid) that did not come from the pool are adopted by it, as
+        long as there are fewer than max_adopt released arrays of that
+        shape.  Anything else (views, other shapes) is ignored.
+        """
+        for a in arrays:
+            if not isinstance(a, ai.ArrayIndexer) or \
+               a.shape[:2] != (self.grid.qx, self.grid.qy) or \
+               not a.flags.c_contiguous or not a.flags.writeable:
+                continue
+
+            nvar = 1 if a.ndim == 2 else a.shape[2]
+            free = self._free.setdefault(nvar, [])
+            if any(f is a for f in free):
+                continue
+
+            if self._out.pop(id(a), None) is not None:
+                self.in_use_bytes -= a.nbytes
+            elif len(free) < self.max_adopt:
+                self.pooled_bytes += a.nbytes
+            else:
+                continue
+
+            free.append(a)
+
+    @contextlib.contextmanager
+    def scope(self):
+        """
+        a context in which all of the arrays obtained with get() are
+        released at the end
+        """
+        self._scopes.append([])
+        try:
+            yield self
+        finally:
+            self.release(*self._scopes.pop())
+
+    def clear(self):
+        """ drop all of the released arrays """
+        for free in self._free.values():
+            for a in free:
+                self.pooled_bytes -= a.nbytes
+        self._free = {}
+
+    def __str__(self):
+        return "scratch pool: {} allocated, {} reused, peak in use = {:.3f} MB, pooled = {:.3f} MB".format(
+            self.n_alloc, self.n_reuse, self.peak_bytes/1.e6, self.pooled_bytes/1.e6)
+
+
 class Grid2d(object):
     """
     the 2-d grid class.  The grid object will contain the coordinate
@@ -145,6 +276,13 @@ class Grid2d(object):
         y2d = np.transpose(y2d)
         self.y2d = y2d
 
+        # pool of recycled scratch arrays (created on first use)
+        self._pool = None
+
+        # the decompositions made by tiles(), keyed by the number of
+        # tiles in each direction
+        self._tiles = {}
+
 
     def scratch_array(self, nvar=1):
         """
@@ -158,6 +296,42 @@ class Grid2d(object):
         return ai.ArrayIndexer(d=_tmp, grid=self)
 
 
+    @property
+    def pool(self):
+        """ the ScratchPool of recycled scratch arrays for this grid """
+        if self._pool is None:
+            self._pool = ScratchPool(self)
+        return self._pool
+
+
+    def pooled_array(self, nvar=1, zero=True):
+        """
+        return a scratch array like scratch_array, but taken from the
+        grid's pool of recycled arrays.  If zero is False, the
+        contents are undefined and must be completely overwritten by
+        the caller.  Give it back with release() or get it inside a
+        scratch_scope().
+        """
+        return self.pool.get(nvar=nvar, zero=zero)
+
+
+    def release(self, *arrays):
+        """
+        return scratch arrays to the grid's pool, so they can be
+        handed out again by pooled_array.  The arrays must not be used
+        afterwards.
+        """
+        self.pool.release(*arrays)
+
+
+    def scratch_scope(self):
+        """
+        a context manager -- any pooled arrays obtained inside it are
+        released when it exits
+        """
+        return self.pool.scope()
+
+
     def norm(self, d):
         """
         find the norm of the quantity d defined on the same grid, in the
@@ -187,6 +361,40 @@ class Grid2d(object):
                       ymin=self.ymin, ymax=self.ymax)
 
 
+    def tiles(self, ntx, nty=1):
+        """
+        return a list of Tile objects splitting the valid region of
+        the grid into ntx x nty logical sub-boxes of (nearly) equal
+        size.  The decomposition is made once and then reused, so the
+        scratch pools of the tile grids persist.
+
+        Parameters
+        ----------
+        ntx : int
+            Number of tiles in the x-direction
+        nty : int, optional
+            Number of tiles in the y-direction
+        """
+
+        ntx = max(1, min(int(ntx), self.nx))
+        nty = max(1, min(int(nty), self.ny))
+
+        try:
+            return self._tiles[ntx, nty]
+        except KeyError:
+            pass
+
+        # split the zones as evenly as possible
+        ix = [self.ilo + (self.nx*n)//ntx for n in range(ntx+1)]
+        jy = [self.jlo + (self.ny*n)//nty for n in range(nty+1)]
+
+        tiles = [Tile(self, ix[n], ix[n+1]-1, jy[m], jy[m+1]-1)
+                 for n in range(ntx) for m in range(nty)]
+
+        self._tiles[ntx, nty] = tiles
+        return tiles
+
+
     def __str__(self):
         """ print out some basic information about the grid object """
         return "2-d grid: nx = {}, ny = {}, ng = {}".format(
@@ -203,6 +411,110 @@ class Grid2d(object):
         return result
 
 
+class Tile(object):
+    """
+    A logical sub-box of a Grid2d.  The tile covers the valid zones
+    ilo:ihi+1, jlo:jhi+1 of the parent grid (in the parent's
+    indexing), and has its own Grid2d describing it with the same
+    number of ghost cells as the parent.  Those ghost cells overlap
+    the neighboring tiles (or are the parent's ghost cells on the
+    physical boundaries), so a tile can be worked on independently by
+    code written for a whole grid.
+
+    Since the stencils are the same, the valid zones of a tile get
+    exactly the same result as they would when working on the
+    parent grid.
+    """
+
+    def __init__(self, parent, ilo, ihi, jlo, jhi):
+        """
+        Create a Tile object.
+
+        Parameters
+        ----------
+        parent : Grid2d object
+            The grid we are a piece of
+        ilo, ihi, jlo, jhi : int
+            The (inclusive) range of parent valid zones that the tile
+            covers
+        """
+
+        self.parent = parent
+
+        self.ilo = ilo
+        self.ihi = ihi
+        self.jlo = jlo
+        self.jhi = jhi
+
+        ng = parent.ng
+
+        # the tile's zones, including ghost cells, and just the valid
+        # ones, as slices into the parent arrays
+        self.box = np.s_[ilo-ng:ihi+ng+1, jlo-ng:jhi+ng+1]
+        self.valid = np.s_[ilo:ihi+1, jlo:jhi+1]
+
+        # which sides of the tile are physical boundaries
+        self.xl = ilo == parent.ilo
+        self.xr = ihi == parent.ihi
+        self.yl = jlo == parent.jlo
+        self.yr = jhi == parent.jhi
+
+        # the grid for the tile.  We copy the coordinates and zone
+        # widths from the parent rather than recomputing them, so
+        # they are identical.
+        g = Grid2d(ihi-ilo+1, jhi-jlo+1, ng=ng,
+                   xmin=parent.xl[ilo], xmax=parent.xr[ihi],
+                   ymin=parent.yl[jlo], ymax=parent.yr[jhi])
+
+        g.dx = parent.dx
+        g.dy = parent.dy
+
+        ib = self.box[0]
+        jb = self.box[1]
+
+        g.xl = parent.xl[ib]
+        g.xr = parent.xr[ib]
+        g.x = parent.x[ib]
+
+        g.yl = parent.yl[jb]
+        g.yr = parent.yr[jb]
+        g.y = parent.y[jb]
+
+        g.x2d = parent.x2d[self.box]
+        g.y2d = parent.y2d[self.box]
+
+        self.grid = g
+
+
+    def solid(self, solid):
+        """
+        return the solid wall properties (a BCProp object) for the
+        tile -- the parent's on the physical boundaries and not solid
+        on the interior sides
+        """
+        return bnd.BCProp(solid.xl if self.xl else 0,
+                          solid.xr if self.xr else 0,
+                          solid.yl if self.yl else 0,
+                          solid.yr if self.yr else 0)
+
+
+    def __str__(self):
+        return "tile: [{}:{}, {}:{}]".format(self.ilo, self.ihi, self.jlo, self.jhi)
+
+
+class _HandedOut(object):
+    """
+    The owner of an array that CellCenterData2d hands out.  NumPy
+    points the base of any view of the array (a slice, np.asarray of
+    it, ...) at the first base that is not an ndarray -- this -- so it
+    stays alive as long as anything that can write to the array does.
+    """
+
+    def __init__(self, arr):
+        self.__array_interface__ = arr.__array_interface__
+        self._arr = arr
+
+
 class CellCenterData2d(object):
     """
     A class to define cell-centered data that lives on a grid.  A
@@ -236,7 +548,7 @@ class CellCenterData2d(object):
    locked.  New variables cannot be added.
     """
 
-    def __init__(self, grid, dtype=np.float64):
+    def __init__(self, grid, dtype=np.float64, lazy_bcs=False):
 
         """
         Initialize the CellCenterData2d object.
@@ -248,6 +560,10 @@ class CellCenterData2d(object):
         dtype : NumPy data type, optional
             The datatype of the data we wish to create (defaults to
             np.float64
+        lazy_bcs : bool, optional
+            If True, fill_BC and fill_BC_all skip any variable that
+            has not been modified since its ghost cells were last
+            filled.
         runtime_parameters : RuntimeParameters object, optional
             The runtime parameters that go along with this data
 
@@ -256,12 +572,15 @@ class CellCenterData2d(object):
         self.grid = grid
 
         self.dtype = dtype
-        self.data = None
+        self._data = None
 
         self.names = []
         self.vars = self.names # backwards compatibility hack
         self.nvar = 0
 
+        # map from variable name to its index in the data array
+        self._name_index = {}
+
         self.aux = {}
 
         # derived variables will have a callback function
@@ -269,6 +588,38 @@ class CellCenterData2d(object):
 
         self.BCs = {}
 
+        # how fill_BC_all groups the variables (built on first use)
+        self._bc_plan = None
+
+        # dirty tracking for the ghost cells.  _dirty[n] is True if
+        # variable n may have changed since its ghost cells were last
+        # filled.  Since we cannot see writes made through the arrays
+        # we hand out, any variable handed out by get_var,
+        # get_var_by_index, get_vars or data is considered modified,
+        # and it stays modified while that array, or any view of it,
+        # is still alive (it may be written to after the fill).
+        # _views holds (weakref, n) pairs for the owners (_HandedOut)
+        # of those arrays, with n = None meaning all variables.  Only
+        # lazy fills and get_cached need to know that, so the arrays
+        # are only tracked (_track_views) when lazy_bcs is set or once
+        # get_cached is used.
+        self.lazy_bcs = lazy_bcs
+        self._dirty = None
+        self._views = []
+        self._track_views = lazy_bcs
+
+        # number of ghost cell fills (one per variable) that were
+        # done and skipped
+        self.bc_stats = {"filled": 0, "skipped": 0}
+
+        # the data version is incremented whenever the data may have
+        # changed (the same events that mark variables dirty, plus
+        # ghost cell fills).  _cache holds derived quantities as
+        # key: (version, value), see get_cached
+        self._version = 0
+        self._cache = {}
+        self.cache_stats = {"hits": 0, "misses": 0}
+
         # time
         self.t = -1.0
 
@@ -291,6 +642,7 @@ class CellCenterData2d(object):
         if self.initialized == 1:
             msg.fail("ERROR: grid already initialized")
 
+        self._name_index[name] = self.nvar
         self.names.append(name)
         self.nvar += 1
 
@@ -340,6 +692,211 @@ class CellCenterData2d(object):
         self.initialized = 1
 
 
+    @property
+    def data(self):
+        """
+        The full (qx, qy, nvar) data array.  Since the caller may
+        write to it, all variables are marked as modified.
+        """
+        if self._data is None:
+            return None
+        return self._track(self._data[...], None)
+
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._dirty = np.ones(self.nvar, dtype=bool)
+        self._views = []
+        self._version += 1
+
+
+    def _track(self, arr, n):
+        """
+        Mark variable n (or all variables, if n is None) as modified
+        and return the array arr to hand out for it.  If we are
+        tracking the arrays, it is a view whose owner we remember, so
+        we know if it (or any view taken of it) is still alive when
+        the ghost cells are filled.
+        """
+        if n is None:
+            self._dirty[:] = True
+        else:
+            self._dirty[n] = True
+        self._version += 1
+
+        if not self._track_views:
+            return arr
+
+        # drop the arrays that have gone away every so often
+        if len(self._views) > 64:
+            self._views = [(r, m) for r, m in self._views if r() is not None]
+
+        owner = _HandedOut(arr)
+        self._views.append((weakref.ref(owner), n))
+
+        out = np.asarray(owner)
+        if isinstance(arr, ai.ArrayIndexer):
+            out = ai.ArrayIndexer(d=out, grid=arr.g)
+        return out
+
+
+    def _live_views(self):
+        """
+        Return the set of variable indices (None meaning all) that
+        have a handed-out array that is still alive.
+        """
+        self._views = [(r, m) for r, m in self._views if r() is not None]
+        return set(m for _, m in self._views)
+
+
+    def mark_dirty(self, name=None):
+        """
+        Flag the variable name (or all variables, if name is None) as
+        modified, so its ghost cells are filled on the next call to
+        fill_BC or fill_BC_all.  This is only needed if the data was
+        changed through an array that was not obtained from this
+        object.
+        """
+        if name is None:
+            self._dirty[:] = True
+        else:
+            self._dirty[self._name_index[name]] = True
+        self._version += 1
+
+
+    def is_dirty(self, name):
+        """
+        Return True if the variable name may have been modified since
+        its ghost cells were last filled.
+        """
+        return bool(self._dirty[self._name_index[name]])
+
+
+    def _save_tracking(self):
+        """ snapshot of the dirty flags and data version """
+        return self._dirty.copy(), self._version
+
+
+    def _restore_tracking(self, saved):
+        """
+        undo the tracking done since _save_tracking, for code that
+        only reads the data through get_var
+        """
+        self._dirty[:], self._version = saved
+
+
+    def get_cached(self, key, func):
+        """
+        Return a derived quantity that is computed from the current
+        state by func(self), computing it only if the data may have
+        changed since it was last computed.  func must only read the
+        data, and the value returned is shared by all callers, so it
+        must not be modified (arrays are made read-only).
+
+        Any array handed out (by get_var, data, ...) may be written
+        to, so handing one out invalidates the cached values, and they
+        are not cached at all while it, or any view of it, is alive.
+        The arrays are only followed from the first call to get_cached
+        on (unless lazy_bcs is set), so one handed out before that must
+        not be written to after it.
+
+        Parameters
+        ----------
+        key : str
+            The name to cache the quantity under
+        func : function
+            The function computing it from this CellCenterData2d
+            object
+
+        Returns
+        -------
+        out : any type
+            The derived quantity
+        """
+        self._track_views = True
+
+        try:
+            version, value = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            if version == self._version:
+                self.cache_stats["hits"] += 1
+                return value
+
+        self.cache_stats["misses"] += 1
+
+        saved = self._save_tracking()
+        value = func(self)
+        self._restore_tracking(saved)
+
+        for q in (value if isinstance(value, (list, tuple)) else [value]):
+            if isinstance(q, np.ndarray):
+                q.flags.writeable = False
+
+        # if an array we handed out earlier is still alive, the data
+        # can change without us noticing, so don't keep the value
+        if not self._live_views():
+            self._cache[key] = (self._version, value)
+
+        return value
+
+
+    def clear_cache(self):
+        """ drop all of the cached derived quantities """
+        self._cache = {}
+
+
+    def tile_view(self, tile):
+        """
+        Return a CellCenterData2d object for the Tile tile (made by
+        our grid's tiles()) whose data is a view into ours, including
+        the ghost cells that overlap the neighboring tiles.  Any
+        derived quantities that are current here are carried over
+        (restricted to the tile).  Writes through the view change our
+        data, but are not tracked, so call mark_dirty() afterwards.
+        The view's ghost cells must not be filled with fill_BC.
+
+        Parameters
+        ----------
+        tile : Tile object
+            The piece of our grid we want
+
+        Returns
+        -------
+        out : CellCenterData2d object
+            The data on the tile
+        """
+
+        if tile.parent is not self.grid:
+            msg.fail("ERROR: tile is not from this grid")
+
+        new = CellCenterData2d(tile.grid, dtype=self.dtype)
+
+        for n in range(self.nvar):
+            new.register_var(self.names[n], self.BCs[self.names[n]])
+
+        new.aux = self.aux
+        new.derives = self.derives
+        new.t = self.t
+
+        new.data = self._data[tile.box]
+        new.initialized = 1
+
+        new._track_views = self._track_views
+
+        if not self._live_views():
+            for key, (version, value) in self._cache.items():
+                if (version == self._version and isinstance(value, np.ndarray) and
+                        value.shape[:2] == (self.grid.qx, self.grid.qy)):
+                    new._cache[key] = (new._version,
+                                       ai.ArrayIndexer(d=np.asarray(value)[tile.box],
+                                                       grid=tile.grid))
+
+        return new
+
+
     def __str__(self):
         """ print out some basic information about the CellCenterData2d
             object """
@@ -391,15 +948,24 @@ class CellCenterData2d(object):
 
         """
         try:
-            n = self.names.index(name)
+            n = self._name_index[name]
         except:
             for f in self.derives:
+                # a derive only reads the stored variables, so it
+                # should not change which ones are considered modified
+                saved = self._save_tracking()
                 var = f(self, name)
+                self._restore_tracking(saved)
                 if len(var) > 0:
+                    if isinstance(var, list):
+                        var = [self._track(q, None) if np.may_share_memory(q, self._data) else q
+                               for q in var]
+                    elif np.may_share_memory(var, self._data):
+                        var = self._track(var, None)
                     return var
             raise KeyError("name {} is not valid".format(name))
         else:
-            return ai.ArrayIndexer(d=self.data[:,:,n], grid=self.grid)
+            return self._track(ai.ArrayIndexer(d=self._data[:,:,n], grid=self.grid), n)
 
 
     def get_var_by_index(self, n):
@@ -419,7 +985,7 @@ class CellCenterData2d(object):
             The array of data corresponding to the index
 
         """
-        return ai.ArrayIndexer(d=self.data[:,:,n], grid=self.grid)
+        return self._track(ai.ArrayIndexer(d=self._data[:,:,n], grid=self.grid), n)
 
 
     def get_vars(self):
@@ -433,7 +999,7 @@ class CellCenterData2d(object):
             The array of data
 
         """
-        return ai.ArrayIndexer(d=self.data, grid=self.grid)
+        return self._track(ai.ArrayIndexer(d=self._data, grid=self.grid), None)
 
 
     def get_aux(self, keyword):
@@ -467,16 +1033,48 @@ class CellCenterData2d(object):
             The name of the variable to zero
 
         """
-        n = self.names.index(name)
-        self.data[:,:,n] = 0.0
+        n = self._name_index[name]
+        self._data[:,:,n] = 0.0
+        self._dirty[n] = True
+        self._version += 1
 
 
     def fill_BC_all(self):
         """
         Fill boundary conditions on all variables.
+
+        Variables that use the same boundary condition type on an edge
+        are grouped together and all of their ghost cells are filled
+        at once.  Variables with a user-defined boundary condition
+        (see boundary.define_bc) are filled one at a time, in the
+        order they were registered, since the user function may look
+        at other variables.
+
+        If lazy_bcs is set, a group is skipped if none of its
+        variables were modified since their last fill.
         """
-        for name in self.names:
-            self.fill_BC(name)
+        if self._bc_plan is None:
+            self._bc_plan = self._make_bc_plan()
+
+        for kind, work in self._bc_plan:
+            if kind == "single":
+                self.fill_BC(work)
+            else:
+                ns, work = work
+                if self.lazy_bcs and not self._dirty[ns].any():
+                    self.bc_stats["skipped"] += len(ns)
+                    continue
+
+                for edge, bc_type, idx, value in work:
+                    self._fill_edge(edge, bc_type, idx, value)
+
+                self.bc_stats["filled"] += len(ns)
+                self._version += 1
+                live = self._live_views()
+                if None in live:
+                    self._dirty[ns] = True
+                else:
+                    self._dirty[ns] = [n in live for n in ns]
 
 
     def fill_BC(self, name):
@@ -504,166 +1102,239 @@ class CellCenterData2d(object):
         # Neumann and Dirichlet homogeneous BCs respectively, but
         # this only works for a single ghost cell
 
-        n = self.names.index(name)
-
-        # -x boundary
-        if self.BCs[name].xlb in ["outflow", "neumann"]:
-
-            if self.BCs[name].xl_value is None:
-                for i in range(self.grid.ilo):
-                    self.data[i,:,n] = self.data[self.grid.ilo,:,n]
-            else:
-                self.data[self.grid.ilo-1,:,n] = \
-                    self.data[self.grid.ilo,:,n] - self.grid.dx*self.BCs[name].xl_value[:]
+        n = self._name_index[name]
+        bc = self.BCs[name]
 
-        elif self.BCs[name].xlb == "reflect-even":
+        if self.lazy_bcs and not self._dirty[n]:
+            self.bc_stats["skipped"] += 1
+            return
 
-            for i in range(self.grid.ilo):
-                self.data[i,:,n] = self.data[2*self.grid.ng-i-1,:,n]
+        # the user-defined BCs access the data through get_var, which
+        # we don't want to count as a modification
+        saved = self._save_tracking()
 
-        elif self.BCs[name].xlb in ["reflect-odd", "dirichlet"]:
+        self._fill_edge("xlb", bc.xlb, n, bc.xl_value)
+        self._fill_edge("xrb", bc.xrb, n, bc.xr_value)
 
-            if self.BCs[name].xl_value is None:
-                for i in range(self.grid.ilo):
-                    self.data[i,:,n] = -self.data[2*self.grid.ng-i-1,:,n]
-            else:
-                self.data[self.grid.ilo-1,:,n] = \
-                    2*self.BCs[name].xl_value[:] - self.data[self.grid.ilo,:,n]
+        if bc.ylb in bnd.ext_bcs.keys():
+            self._fill_user("ylb", bc.ylb, name)
+        else:
+            self._fill_edge("ylb", bc.ylb, n, bc.yl_value)
 
-        elif self.BCs[name].xlb == "periodic":
+        if bc.yrb in bnd.ext_bcs.keys():
+            self._fill_user("yrb", bc.yrb, name)
+        else:
+            self._fill_edge("yrb", bc.yrb, n, bc.yr_value)
 
-            for i in range(self.grid.ilo):
-                self.data[i,:,n] = self.data[self.grid.ihi-self.grid.ng+i+1,:,n]
+        self._restore_tracking(saved)
+        self._version += 1
+        self.bc_stats["filled"] += 1
+        live = self._live_views()
+        self._dirty[n] = None in live or n in live
 
 
-        # +x boundary
-        if self.BCs[name].xrb in ["outflow", "neumann"]:
+    def _make_bc_plan(self):
+        """
+        Work out how fill_BC_all will fill the ghost cells.  The plan
+        is a list of ("single", name) entries, for variables with
+        user-defined BCs, and ("group", (ns, work)) entries, where ns
+        lists the indices of a run of consecutive variables with only
+        the standard BCs and work is a list of (edge, bc_type, idx,
+        value) slab fills covering them.  idx is a
+        slice selecting the variables in the last index of self.data
+        and value holds the inhomogeneous Dirichlet/Neumann values (or
+        None).
+
+        Homogeneous reflect-odd and Dirichlet BCs are done as an even
+        reflection followed by a sign flip ("negate"), so that
+        variables that only differ in the parity of their reflection
+        are copied together.
+        """
 
-            if self.BCs[name].xr_value is None:
-                for i in range(self.grid.ihi+1, self.grid.nx+2*self.grid.ng):
-                    self.data[i,:,n] = self.data[self.grid.ihi,:,n]
+        edges = [("xlb", "xl_value"), ("xrb", "xr_value"),
+                 ("ylb", "yl_value"), ("yrb", "yr_value")]
+
+        # the copy done for each of the homogeneous BC types
+        copy_type = {"outflow": "outflow",
+                     "neumann": "outflow",
+                     "reflect-even": "reflect-even",
+                     "reflect-odd": "reflect-even",
+                     "dirichlet": "reflect-even",
+                     "periodic": "periodic"}
+
+        def contiguous(ns):
+            """ split a sorted list of indices into contiguous runs """
+            runs = []
+            start = 0
+            for k in range(1, len(ns)+1):
+                if k == len(ns) or ns[k] != ns[k-1] + 1:
+                    runs.append((start, k, slice(ns[start], ns[k-1]+1)))
+                    start = k
+            return runs
+
+        plan = []
+        run = []
+
+        def close_run():
+            if not run:
+                return
+            work = []
+            for edge, value_attr in edges:
+                copies = {}
+                negate = []
+                values = {}
+                for n in run:
+                    bc = self.BCs[self.names[n]]
+                    bc_type = getattr(bc, edge)
+                    value = getattr(bc, value_attr)
+                    if value is not None:
+                        values.setdefault(bc_type, []).append(n)
+                    elif bc_type in copy_type:
+                        copies.setdefault(copy_type[bc_type], []).append(n)
+                        if bc_type in ["reflect-odd", "dirichlet"]:
+                            negate.append(n)
+
+                for bc_type, ns in copies.items():
+                    for _, _, idx in contiguous(ns):
+                        work.append((edge, bc_type, idx, None))
+
+                for _, _, idx in contiguous(negate):
+                    work.append((edge, "negate", idx, None))
+
+                for bc_type, ns in values.items():
+                    value = np.stack([getattr(self.BCs[self.names[n]], value_attr)
+                                      for n in ns], axis=-1)
+                    for start, end, idx in contiguous(ns):
+                        work.append((edge, bc_type, idx, value[...,start:end]))
+
+            plan.append(("group", (list(run), work)))
+            del run[:]
+
+        for n, name in enumerate(self.names):
+            bc = self.BCs[name]
+            if bc.ylb in bnd.ext_bcs.keys() or bc.yrb in bnd.ext_bcs.keys():
+                close_run()
+                plan.append(("single", name))
             else:
-                self.data[self.grid.ihi+1,:,n] = \
-                    self.data[self.grid.ihi,:,n] + self.grid.dx*self.BCs[name].xr_value[:]
-
-        elif self.BCs[name].xrb == "reflect-even":
-
-            for i in range(self.grid.ng):
-                i_bnd = self.grid.ihi+1+i
-                i_src = self.grid.ihi-i
+                run.append(n)
 
-                self.data[i_bnd,:,n] = self.data[i_src,:,n]
+        close_run()
 
-        elif self.BCs[name].xrb in ["reflect-odd", "dirichlet"]:
+        return plan
 
-            if self.BCs[name].xr_value is None:
-                for i in range(self.grid.ng):
-                    i_bnd = self.grid.ihi+1+i
-                    i_src = self.grid.ihi-i
 
-                    self.data[i_bnd,:,n] = -self.data[i_src,:,n]
-            else:
-                self.data[self.grid.ihi+1,:,n] = \
-                    2*self.BCs[name].xr_value[:] - self.data[self.grid.ihi,:,n]
-
-        elif self.BCs[name].xrb == "periodic":
-
-            for i in range(self.grid.ihi+1, 2*self.grid.ng + self.grid.nx):
-                self.data[i,:,n] = self.data[i-self.grid.ihi-1+self.grid.ng,:,n]
+    def _fill_edge(self, edge, bc_type, n, value=None):
+        """
+        Fill all of the ghost cells on one edge for the variable(s)
+        with index n (an int, slice, or list of indices into the last
+        dimension of self.data), using whole-slab array operations.
 
+        Parameters
+        ----------
+        edge : {'xlb', 'xrb', 'ylb', 'yrb'}
+            The boundary to fill
+        bc_type : str
+            The boundary condition type on this edge, or "negate" to
+            flip the sign of the ghost cells
+        n : int, slice, or list
+            The variable(s) to fill
+        value : ndarray, optional
+            The inhomogeneous Dirichlet or Neumann values on the
+            boundary (one column per variable if n selects several)
+        """
 
-        # -y boundary
-        if self.BCs[name].ylb in ["outflow", "neumann"]:
+        g = self.grid
+        ng = g.ng
+        d = self._data
 
-            if self.BCs[name].yl_value is None:
-                for j in range(self.grid.jlo):
-                    self.data[:,j,n] = self.data[:,self.grid.jlo,n]
-            else:
-                self.data[:,self.grid.jlo-1,n] = \
-                    self.data[:,self.grid.jlo,n] - self.grid.dy*self.BCs[name].yl_value[:]
+        # operate on the y-direction by swapping the axes, so the
+        # logic below only needs to be written for x
+        if edge in ["xlb", "xrb"]:
+            lo, hi, dx = g.ilo, g.ihi, g.dx
+        else:
+            d = d.swapaxes(0, 1)
+            lo, hi, dx = g.jlo, g.jhi, g.dy
 
-        elif self.BCs[name].ylb == "reflect-even":
+        if edge in ["xlb", "ylb"]:
 
-            for j in range(self.grid.jlo):
-                self.data[:,j,n] = self.data[:,2*self.grid.ng-j-1,n]
+            if bc_type in ["outflow", "neumann"]:
+                if value is None:
+                    d[:lo,:,n] = d[lo:lo+1,:,n]
+                else:
+                    d[lo-1,:,n] = d[lo,:,n] - dx*value
 
-        elif self.BCs[name].ylb in ["reflect-odd", "dirichlet"]:
+            elif bc_type == "reflect-even":
+                d[:lo,:,n] = d[2*ng-1:ng-1:-1,:,n]
 
-            if self.BCs[name].yl_value is None:
-                for j in range(self.grid.jlo):
-                    self.data[:,j,n] = -self.data[:,2*self.grid.ng-j-1,n]
-            else:
-                self.data[:,self.grid.jlo-1,n] = \
-                    2*self.BCs[name].yl_value[:] - self.data[:,self.grid.jlo,n]
+            elif bc_type in ["reflect-odd", "dirichlet"]:
+                if value is None:
+                    d[:lo,:,n] = -d[2*ng-1:ng-1:-1,:,n]
+                else:
+                    d[lo-1,:,n] = 2*value - d[lo,:,n]
 
-        elif self.BCs[name].ylb == "periodic":
+            elif bc_type == "periodic":
+                d[:lo,:,n] = d[hi-ng+1:hi+1,:,n]
 
-            for j in range(self.grid.jlo):
-                self.data[:,j,n] = self.data[:,self.grid.jhi-self.grid.ng+j+1,n]
+            elif bc_type == "negate":
+                d[:lo,:,n] *= -1
 
         else:
-            if self.BCs[name].ylb in bnd.ext_bcs.keys():
-
-                bnd.ext_bcs[self.BCs[name].ylb](self.BCs[name].ylb, "ylb", name, self)
-
-
-        # +y boundary
-        if self.BCs[name].yrb in ["outflow", "neumann"]:
 
-            if self.BCs[name].yr_value is None:
-                for j in range(self.grid.jhi+1, self.grid.ny+2*self.grid.ng):
-                    self.data[:,j,n] = self.data[:,self.grid.jhi,n]
-            else:
-                self.data[:,self.grid.jhi+1,n] = \
-                    self.data[:,self.grid.jhi,n] + self.grid.dy*self.BCs[name].yr_value[:]
-
-        elif self.BCs[name].yrb == "reflect-even":
+            if bc_type in ["outflow", "neumann"]:
+                if value is None:
+                    d[hi+1:,:,n] = d[hi:hi+1,:,n]
+                else:
+                    d[hi+1,:,n] = d[hi,:,n] + dx*value
 
-            for j in range(self.grid.ng):
-                j_bnd = self.grid.jhi+1+j
-                j_src = self.grid.jhi-j
+            elif bc_type == "reflect-even":
+                d[hi+1:hi+1+ng,:,n] = d[hi:hi-ng:-1,:,n]
 
-                self.data[:,j_bnd,n] = self.data[:,j_src,n]
+            elif bc_type in ["reflect-odd", "dirichlet"]:
+                if value is None:
+                    d[hi+1:hi+1+ng,:,n] = -d[hi:hi-ng:-1,:,n]
+                else:
+                    d[hi+1,:,n] = 2*value - d[hi,:,n]
 
-        elif self.BCs[name].yrb in ["reflect-odd", "dirichlet"]:
+            elif bc_type == "periodic":
+                d[hi+1:,:,n] = d[ng:2*ng,:,n]
 
-            if self.BCs[name].yr_value is None:
-                for j in range(self.grid.ng):
-                    j_bnd = self.grid.jhi+1+j
-                    j_src = self.grid.jhi-j
-
-                    self.data[:,j_bnd,n] = -self.data[:,j_src,n]
-            else:
-                self.data[:,self.grid.jhi+1,n] = \
-                    2*self.BCs[name].yr_value[:] - self.data[:,self.grid.jhi,n]
+            elif bc_type == "negate":
+                d[hi+1:hi+1+ng,:,n] *= -1
 
-        elif self.BCs[name].yrb == "periodic":
 
-            for j in range(self.grid.jhi+1, 2*self.grid.ng + self.grid.ny):
-                self.data[:,j,n] = self.data[:,j-self.grid.jhi-1+self.grid.ng,n]
+    def _fill_user(self, edge, bc_type, name):
+        """
+        Fill the ghost cells on one edge for the variable name, using
+        the user-defined boundary condition bc_type (see
+        boundary.define_bc).
+        """
+        bnd.ext_bcs[bc_type](bc_type, edge, name, self)
 
-        else:
-            if self.BCs[name].yrb in bnd.ext_bcs.keys():
 
-                bnd.ext_bcs[self.BCs[name].yrb](self.BCs[name].yrb, "yrb", name, self)
+    def _empty_like(self):
+        """
+        return a new (not yet created) object of our type, on the same
+        grid, for cell_center_data_clone
+        """
+        return CellCenterData2d(self.grid, dtype=self.dtype, lazy_bcs=self.lazy_bcs)
 
 
     def min(self, name, ng=0):
         """
         return the minimum of the variable name in the domain's valid region
         """
-        n = self.names.index(name)
+        n = self._name_index[name]
         g = self.grid
-        return np.min(self.data[g.ilo-ng:g.ihi+1+ng,g.jlo-ng:g.jhi+1+ng,n])
+        return np.min(self._data[g.ilo-ng:g.ihi+1+ng,g.jlo-ng:g.jhi+1+ng,n])
 
 
     def max(self, name, ng=0):
         """
         return the maximum of the variable name in the domain's valid region
         """
-        n = self.names.index(name)
+        n = self._name_index[name]
         g = self.grid
-        return np.max(self.data[g.ilo-ng:g.ihi+1+ng,g.jlo-ng:g.jhi+1+ng,n])
+        return np.max(self._data[g.ilo-ng:g.ihi+1+ng,g.jlo-ng:g.jhi+1+ng,n])
 
 
     def restrict(self, varname, N=2):
@@ -700,7 +1371,7 @@ class CellCenterData2d(object):
         return cdata
 
 
-    def prolong(self, varname):
+    def prolong(self, varname, limit=False):
         """
         Prolong the data in the current (coarse) grid to a finer
         (factor of 2 finer) grid.  Return an array with the resulting
@@ -736,6 +1407,11 @@ class CellCenterData2d(object):
         fashion.  All operations will use the same slopes for their
         respective parents.
 
+        By default, the slopes are the centered differences.  With
+        limit = True, they are limited with the monotonized central
+        limiter, so no new extrema are created (as needed e.g. to keep
+        the density positive when interpolating hydrodynamics data).
+
         """
 
         coarse_grid = self.grid
@@ -752,6 +1428,14 @@ class CellCenterData2d(object):
         m_y = coarse_grid.scratch_array()
         m_y.v()[:,:] = 0.5*(cdata.jp(1) - cdata.jp(-1))
 
+        if limit:
+            for m, dl, dr in [(m_x, cdata.v() - cdata.ip(-1), cdata.ip(1) - cdata.v()),
+                              (m_y, cdata.v() - cdata.jp(-1), cdata.jp(1) - cdata.v())]:
+                m.v()[:,:] = np.where(dl*dr > 0.0,
+                                      np.sign(m.v())*np.minimum(abs(m.v()),
+                                                                2.0*np.minimum(abs(dl), abs(dr))),
+                                      0.0)
+
         # fill the children
         fdata.v(s=2)[:,:] = cdata.v() - 0.25*m_x.v() - 0.25*m_y.v()     # 1 child
         fdata.ip(1, s=2)[:,:] = cdata.v() + 0.25*m_x.v() - 0.25*m_y.v() # 2
@@ -761,23 +1445,25 @@ class CellCenterData2d(object):
         return fdata
 
 
-    def write(self, filename):
+    def write(self, filename, file_format="hdf5", **h5_opts):
         """
-        create an output file in HDF5 format and write out our data and
-        grid.
+        create an output file in the format file_format (see
+        util.backends) and write out our data and grid.  Any other
+        keyword arguments are the dataset options of write_data.
         """
 
-        if not filename.endswith(".h5"):
-            filename += ".h5"
+        backend = backends.get_backend(file_format)
 
-        with h5py.File(filename, "w") as f:
-            self.write_data(f)
+        backend.write(backends.output_filename(filename, backend),
+                      lambda f: self.write_data(f, **h5_opts))
 
 
-    def write_data(self, f):
+    def write_data(self, f, **h5_opts):
         """
         write the data out to an hdf5 file -- here, f is an h5py
-        File pbject
+        File pbject.  Any keyword arguments (compression, chunking,
+        precision) are passed to h5_dataset_options for the datasets
+        of the variables.
 
         """
 
@@ -800,10 +1486,15 @@ class CellCenterData2d(object):
         # data
         gstate = f.create_group("state")
 
+        g = self.grid
+
+        opts = h5_dataset_options((g.nx, g.ny), **h5_opts)
+
         for n in range(self.nvar):
             gvar = gstate.create_group(self.names[n])
             gvar.create_dataset("data",
-                                data=self.get_var_by_index(n).v())
+                                data=self._data[g.ilo:g.ihi+1,g.jlo:g.jhi+1,n],
+                                **opts)
             gvar.attrs["xlb"] = self.BCs[self.names[n]].xlb
             gvar.attrs["xrb"] = self.BCs[self.names[n]].xrb
             gvar.attrs["ylb"] = self.BCs[self.names[n]].ylb
@@ -836,7 +1527,7 @@ def cell_center_data_clone(old):
     if not isinstance(old, CellCenterData2d):
         msg.fail("Can't clone object")
 
-    new = CellCenterData2d(old.grid, dtype=old.dtype)
+    new = old._empty_like()
 
     for n in range(old.nvar):
         new.register_var(old.names[n], old.BCs[old.names[n]])
@@ -844,12 +1535,77 @@ def cell_center_data_clone(old):
     new.create()
 
     new.aux = old.aux.copy()
-    new.data = old.data.copy()
+    new.data = old._data.copy()
     new.derives = old.derives.copy()
 
+    # the copy's ghost cells are as up to date as the original's.  The
+    # fill counters are shared, so they include the work done on the
+    # clones (e.g. the RK stages)
+    new._dirty[:] = old._dirty
+    new.bc_stats = old.bc_stats
+    new._track_views = old._track_views
+
+    # so are any derived quantities that are current for the original
+    if not old._live_views():
+        new._cache = dict((key, (new._version, value))
+                          for key, (version, value) in old._cache.items()
+                          if version == old._version)
+    new.cache_stats = old.cache_stats
+
     return new
 
 
+def h5_dataset_options(shape, compression="none", compression_level=4,
+                       shuffle=False, chunk=0, precision="double"):
+    """
+    The keyword arguments for h5py's create_dataset that store a
+    dataset of the given shape as asked.  h5py undoes all of these when
+    reading, so util.io.read needs nothing special.
+
+    Parameters
+    ----------
+    shape : tuple
+        The shape of the dataset
+    compression : str, optional
+        The compression filter: "none", "gzip", or "lzf"
+    compression_level : int, optional
+        The gzip level, 1 (fastest) to 9 (smallest)
+    shuffle : bool, optional
+        Apply the shuffle filter, which groups the bytes of the values
+        by significance and usually helps the compression
+    chunk : int, optional
+        Store the data in blocks of chunk x chunk zones (any further
+        dimensions are not split).  With 0, the data is
+        contiguous, unless it is compressed, and then h5py picks the
+        chunks.
+    precision : str, optional
+        "double", or "single" to store float32
+    """
+
+    opts = {}
+
+    if compression == "gzip":
+        opts["compression"] = "gzip"
+        opts["compression_opts"] = compression_level
+    elif compression == "lzf":
+        opts["compression"] = "lzf"
+    elif compression != "none":
+        msg.fail("ERROR: invalid compression: {}".format(compression))
+
+    if shuffle:
+        opts["shuffle"] = True
+
+    if chunk > 0:
+        opts["chunks"] = tuple(min(chunk, n) for n in shape[:2]) + tuple(shape[2:])
+
+    if precision == "single":
+        opts["dtype"] = np.float32
+    elif precision != "double":
+        msg.fail("ERROR: invalid precision: {}".format(precision))
+
+    return opts
+
+
 def do_demo():
 
     import util.io as io
@@ -29,23 +29,29 @@ def limit2(a, myg, idir):
     """ 2nd order monotonized central difference limiter """
 
     lda = myg.scratch_array()
-    dc = myg.scratch_array()
-    dl = myg.scratch_array()
-    dr = myg.scratch_array()
 
-    if idir == 1:
-        dc.v(buf=2)[:,:] = 0.5*(a.ip(1, buf=2) - a.ip(-1, buf=2))
-        dl.v(buf=2)[:,:] = a.ip(1, buf=2) - a.v(buf=2)
-        dr.v(buf=2)[:,:] = a.v(buf=2) - a.ip(-1, buf=2)
+    # the differences are only computed (and the slopes are only
+    # nonzero) in the 2 ghost cells nearest the interior, so the
+    # work arrays can come from the pool without being zeroed
+    dc = myg.pooled_array(zero=False)
+    dl = myg.pooled_array(zero=False)
+    dr = myg.pooled_array(zero=False)
 
+    if idir == 1:
+        ap = a.ip(1, buf=2)
+        am = a.ip(-1, buf=2)
     elif idir == 2:
-        dc.v(buf=2)[:,:] = 0.5*(a.jp(1, buf=2) - a.jp(-1, buf=2))
-        dl.v(buf=2)[:,:] = a.jp(1, buf=2) - a.v(buf=2)
-        dr.v(buf=2)[:,:] = a.v(buf=2) - a.jp(-1, buf=2)
+        ap = a.jp(1, buf=2)
+        am = a.jp(-1, buf=2)
+
+    np.subtract(ap, am, out=dc.v(buf=2))
+    dc.v(buf=2)[:,:] *= 0.5
+    np.subtract(ap, a.v(buf=2), out=dl.v(buf=2))
+    np.subtract(a.v(buf=2), am, out=dr.v(buf=2))
+
+    _mc_limit(myg, dc.v(buf=2), dl.v(buf=2), dr.v(buf=2), lda.v(buf=2))
 
-    d1 = 2.0*np.where(np.fabs(dl) < np.fabs(dr), dl, dr)
-    dt = np.where(np.fabs(dc) < np.fabs(d1), dc, d1)
-    lda.v(buf=myg.ng)[:,:] = np.where(dl*dr > 0.0, dt, 0.0)
+    myg.release(dc, dl, dr)
 
     return lda
 
@@ -56,28 +62,80 @@ def limit4(a, myg, idir):
     lda_tmp = limit2(a, myg, idir)
 
     lda = myg.scratch_array()
-    dc = myg.scratch_array()
-    dl = myg.scratch_array()
-    dr = myg.scratch_array()
+    dc = myg.pooled_array(zero=False)
+    dl = myg.pooled_array(zero=False)
+    dr = myg.pooled_array(zero=False)
 
     if idir == 1:
-        dc.v(buf=2)[:,:] = (2./3.)*(a.ip(1, buf=2) - a.ip(-1, buf=2) -
-                                    0.25*(lda_tmp.ip(1, buf=2) + lda_tmp.ip(-1, buf=2)))
-        dl.v(buf=2)[:,:] = a.ip(1, buf=2) - a.v(buf=2)
-        dr.v(buf=2)[:,:] = a.v(buf=2) - a.ip(-1, buf=2)
-
+        ap = a.ip(1, buf=2)
+        am = a.ip(-1, buf=2)
+        lp = lda_tmp.ip(1, buf=2)
+        lm = lda_tmp.ip(-1, buf=2)
     elif idir == 2:
-        dc.v(buf=2)[:,:] = (2./3.)*(a.jp(1, buf=2) - a.jp(-1, buf=2) - \
-                                    0.25*(lda_tmp.jp(1, buf=2) + lda_tmp.jp(-1, buf=2)))
-        dl.v(buf=2)[:,:] = a.jp(1, buf=2) - a.v(buf=2)
-        dr.v(buf=2)[:,:] = a.v(buf=2) - a.jp(-1, buf=2)
+        ap = a.jp(1, buf=2)
+        am = a.jp(-1, buf=2)
+        lp = lda_tmp.jp(1, buf=2)
+        lm = lda_tmp.jp(-1, buf=2)
+
+    # dc = (2/3) (a[i+1] - a[i-1] - (lda_tmp[i+1] + lda_tmp[i-1])/4)
+    np.add(lp, lm, out=dc.v(buf=2))
+    dc.v(buf=2)[:,:] *= 0.25
+    np.subtract(ap, am, out=dl.v(buf=2))
+    np.subtract(dl.v(buf=2), dc.v(buf=2), out=dc.v(buf=2))
+    dc.v(buf=2)[:,:] *= 2./3.
+
+    np.subtract(ap, a.v(buf=2), out=dl.v(buf=2))
+    np.subtract(a.v(buf=2), am, out=dr.v(buf=2))
 
-    d1 = 2.0*np.where(np.fabs(dl) < np.fabs(dr), dl, dr)
-    dt = np.where(np.fabs(dc) < np.fabs(d1), dc, d1)
-    lda.v(buf=myg.ng)[:,:] = np.where(dl*dr > 0.0, dt, 0.0)
+    _mc_limit(myg, dc.v(buf=2), dl.v(buf=2), dr.v(buf=2), lda.v(buf=2))
+
+    myg.release(dc, dl, dr, lda_tmp)
 
     return lda
 
+
+def _mc_limit(myg, dc, dl, dr, lda):
+    """
+    store the monotonized central slope, given the centered, left
+    and right differences dc, dl, and dr, into lda, which must be
+    zero on input.  This does
+
+      d1 = 2 * (dl or dr, whichever is smaller in magnitude)
+      lda = dc or d1, whichever is smaller, if dl*dr > 0, else 0
+
+    using pooled work arrays instead of temporaries.
+    """
+
+    ta = myg.pooled_array(zero=False)
+    tb = myg.pooled_array(zero=False)
+    d = myg.pooled_array(zero=False)
+
+    # the work arrays are views of the same shape as the inputs
+    idx = (slice(0, dc.shape[0]), slice(0, dc.shape[1]))
+    t1 = ta[idx]
+    t2 = tb[idx]
+    d1 = d[idx]
+    mask = np.empty(dc.shape, dtype=bool)
+
+    np.fabs(dl, out=t1)
+    np.fabs(dr, out=t2)
+    np.less(t1, t2, out=mask)
+    np.copyto(d1, dr)
+    np.copyto(d1, dl, where=mask)
+    d1 *= 2.0
+
+    np.fabs(dc, out=t1)
+    np.fabs(d1, out=t2)
+    np.less(t1, t2, out=mask)
+    np.copyto(d1, dc, where=mask)
+
+    np.multiply(dl, dr, out=t1)
+    np.greater(t1, 0.0, out=mask)
+    np.copyto(lda, d1, where=mask)
+
+    myg.release(ta, tb, d)
+
+
 def flatten(myg, q, idir, ivars, rp):
     """ compute the 1-d flattening coefficients """
 
@@ -209,6 +267,91 @@ def weno_upwind(q, order):
 
     return np.dot(w, q_stencils)
 
+def weno_upwind_array(q, order, idir, reverse=False):
+    """
+    Perform upwinded WENO reconstruction on an entire array at once,
+    along the direction idir.  This gives the same result as calling
+    weno_upwind on the stencil centered on each zone, but works on
+    whole-array slices, so there are no loops over zones.  Any order
+    with coefficients defined in C_all, a_all and sigma_all is
+    supported.
+
+    Parameters
+    ----------
+
+    q : np array
+        input data (1-d, or 2-d such as an ArrayIndexer)
+    order : int
+        WENO order (k)
+    idir : int
+        direction to reconstruct along (1 = x, 2 = y)
+    reverse : bool, optional
+        if False (default), the reconstruction is left biased and
+        element i holds the value on the interface i+1/2.  If True, it
+        is right biased and element i holds the value on the
+        interface i-1/2.
+
+    Returns
+    -------
+
+    q_rec : np array
+        reconstructed data.  Zones too close to the edge of the array
+        for the stencil to fit (order-1 on each side) are set to 0.
+    """
+    a = a_all[order]
+    C = C_all[order]
+    sigma = sigma_all[order]
+    epsilon = 1e-16
+
+    q = np.asarray(q)
+    axis = idir - 1
+    npts = q.shape[axis]
+
+    # the reconstruction is done for the zones lo <= i < hi
+    lo = order - 1
+    hi = npts - order + 1
+
+    # sgn flips the stencil offsets for the right-biased reconstruction
+    sgn = -1 if reverse else 1
+
+    def shift(off):
+        """ return q[i+off] for lo <= i < hi along the axis """
+        idx = [slice(None)]*q.ndim
+        idx[axis] = slice(lo + sgn*off, hi + sgn*off)
+        return q[tuple(idx)]
+
+    # q[i+k-l] takes values from the 2*order-1 points centered on i
+    qs = {off: shift(off) for off in range(1-order, order)}
+
+    alpha = []
+    q_stencils = []
+    for k in range(order):
+        beta = np.zeros_like(qs[0])
+        for l in range(order):
+            for m in range(l+1):
+                beta += sigma[k, l, m] * qs[k-l] * qs[k-m]
+        alpha.append(C[k] / (epsilon + beta**2))
+
+        q_k = np.zeros_like(qs[0])
+        for l in range(order):
+            q_k += a[k, l] * qs[k-l]
+        q_stencils.append(q_k)
+
+    alpha_sum = np.zeros_like(qs[0])
+    for k in range(order):
+        alpha_sum += alpha[k]
+
+    q_valid = np.zeros_like(qs[0])
+    for k in range(order):
+        q_valid += (alpha[k] / alpha_sum) * q_stencils[k]
+
+    q_rec = np.zeros_like(q)
+    idx = [slice(None)]*q.ndim
+    idx[axis] = slice(lo, hi)
+    q_rec[tuple(idx)] = q_valid
+
+    return q_rec
+
 def weno(q, order):
     """
     Perform WENO reconstruction
@@ -224,13 +367,10 @@ def weno(q, order):
     Returns
     -------
 
-    q_plus, q_minus : np array
-        data reconstructed to the right / left respectively
+    q_minus, q_plus : np array
+        data reconstructed to the left / right of each zone
+        respectively
     """
-    Npoints = q.shape
-    q_minus = np.zeros_like(q)
-    q_plus  = np.zeros_like(q)
-    for i in range(order, Npoints-order):
-        q_plus [i] = weno_upwind(q[i+1-order:i+order], order)
-        q_minus[i] = weno_upwind(q[i+order-1:i-order:-1], order)
+    q_plus = weno_upwind_array(q, order, 1)
+    q_minus = weno_upwind_array(q, order, 1, reverse=True)
     return q_minus, q_plus
@@ -0,0 +1,199 @@
+# unit tests for the AMR hierarchy
+import h5py
+import numpy as np
+
+import mesh.amr as amr
+import mesh.array_indexer as ai
+import mesh.boundary as bnd
+import mesh.patch as patch
+
+from numpy.testing import assert_array_equal, assert_allclose
+
+
+def _make_data(bc_type, nx=32, ny=32):
+    myg = patch.Grid2d(nx, ny, ng=2)
+    myd = patch.CellCenterData2d(myg)
+
+    bc = bnd.BC(xlb=bc_type, xrb=bc_type, ylb=bc_type, yrb=bc_type)
+    myd.register_var("a", bc)
+    myd.create()
+
+    return myd
+
+
+def _tag_center(my_data):
+    """ refine the middle of the domain """
+    g = my_data.grid
+    x = g.x2d[g.ilo:g.ihi+1, g.jlo:g.jhi+1]
+    y = g.y2d[g.ilo:g.ihi+1, g.jlo:g.jhi+1]
+    return (abs(x - 0.5) < 0.1) & (abs(y - 0.5) < 0.1)
+
+
+def _upwind(p, dt):
+    """ first-order upwind advection with u = v = 1 """
+    g = p.grid
+    a = p.data.get_var("a")
+
+    flux_x = ai.ArrayIndexer(d=np.zeros((g.qx, g.qy, 1)), grid=g)
+    flux_y = ai.ArrayIndexer(d=np.zeros((g.qx, g.qy, 1)), grid=g)
+
+    flux_x[1:,:,0] = a[:-1,:]
+    flux_y[:,1:,0] = a[:,:-1]
+
+    a.v()[:,:] += dt/g.dx*(flux_x.v(n=0) - flux_x.ip(1, n=0)) + \
+                  dt/g.dy*(flux_y.v(n=0) - flux_y.jp(1, n=0))
+
+    return flux_x, flux_y
+
+
+def test_regrid():
+
+    myd = _make_data("outflow")
+    h = amr.AMRHierarchy(myd, max_levels=3, block_size=8, buffer=1)
+    h.regrid(_tag_center)
+
+    assert h.nlevels() == 3
+
+    # each level is nested in the one below
+    for n in range(1, h.nlevels()):
+        cov = h.covered(n-1)
+        for p in h.levels[n].patches:
+            assert cov[p.ilo//2:(p.ihi+1)//2, p.jlo//2:(p.jhi+1)//2].all()
+            assert p.grid.dx == myd.grid.dx/2**n
+
+
+def test_fill_ghosts():
+
+    # interpolation reproduces linear data
+    myd = _make_data("outflow")
+    g = myd.grid
+    myd.get_var("a")[:,:] = 2.0*g.x2d + 3.0*g.y2d
+
+    h = amr.AMRHierarchy(myd, max_levels=3, block_size=8, buffer=1)
+    h.regrid(_tag_center)
+
+    for n in range(1, h.nlevels()):
+        h.fill_ghosts(n)
+        for p in h.levels[n].patches:
+            pg = p.grid
+            assert_allclose(p.data.get_var("a"), 2.0*pg.x2d + 3.0*pg.y2d,
+                            rtol=1.e-12, atol=1.e-12)
+
+
+def test_prolong_ghosts():
+
+    # filling just the ghost cells gives them the same values as
+    # filling the whole patch, including where the interpolated data
+    # is not admissible
+    myd = _make_data("outflow")
+    g = myd.grid
+    myd.get_var("a")[:,:] = np.sin(8.0*g.x2d)*np.cos(6.0*g.y2d)
+
+    h = amr.AMRHierarchy(myd, max_levels=3, block_size=8, buffer=1,
+                         admissible=lambda d: d.get_var("a") < 0.5)
+    h.regrid(_tag_center)
+
+    for n in range(1, h.nlevels()):
+        h.fill_ghosts(n)
+        for p in h.levels[n].patches:
+            pg = p.grid
+            valid = np.s_[pg.ilo:pg.ihi+1, pg.jlo:pg.jhi+1]
+
+            h._prolong(p, 1.0, ghost_only=False)
+            full = p.data._data.copy()
+
+            p.data._data[:,:,:] = -1.0
+
+            scratch = p.scratch
+            h._prolong(p, 1.0)
+            assert p.scratch is scratch
+
+            assert_array_equal(p.data._data[valid], -1.0)
+            p.data._data[valid] = full[valid]
+            assert_array_equal(p.data._data, full)
+
+
+def test_conservation():
+
+    myd = _make_data("periodic")
+    g = myd.grid
+    a = myd.get_var("a")
+    a[:,:] = np.exp(-((g.x2d - 0.5)**2 + (g.y2d - 0.5)**2)/0.01)
+
+    h = amr.AMRHierarchy(myd, max_levels=3, block_size=8, buffer=1)
+    h.regrid(_tag_center)
+
+    total = a.v().sum()
+
+    for _ in range(8):
+        h.advance(0.4*g.dx, _upwind)
+        myd.t += 0.4*g.dx
+
+    assert_allclose(a.v().sum(), total, rtol=1.e-13)
+
+    # the base level is the average of the finer ones
+    for q in h.levels[1].patches:
+        c = q.data.restrict("a")
+        assert_allclose(a.v()[q.ilo//2:(q.ihi+1)//2, q.jlo//2:(q.jhi+1)//2], c.v(),
+                        rtol=1.e-14)
+
+
+def test_skip_fill_periodic():
+
+    # a patch away from the edge of a periodic domain does not need
+    # the level below refilled after its step -- but its
+    # interpolation stencil still reaches the periodic images
+    def run(refill):
+        myd = _make_data("periodic", nx=16, ny=16)
+        g = myd.grid
+        a = myd.get_var("a")
+        a[:,:] = np.sin(2.0*np.pi*g.x2d)*np.cos(2.0*np.pi*g.y2d)
+
+        h = amr.AMRHierarchy(myd, max_levels=2, block_size=4, buffer=0)
+        if refill:
+            h._at_boundary = lambda n: True
+
+        # one level-1 patch, at [4:7, 12:15]
+        def tag(my_data):
+            tags = np.zeros((16, 16), dtype=bool)
+            tags[2, 6] = True
+            return tags
+
+        h.regrid(tag)
+        assert [(p.ilo, p.jlo) for p in h.levels[1].patches] == [(4, 12)]
+
+        for _ in range(5):
+            h.advance(0.4*g.dx, _upwind)
+            myd.t += 0.4*g.dx
+
+        # (the ghost cells of the base are left stale without the refill)
+        q = h.levels[1].patches[0]
+        return a.v().copy(), q.data.data.copy()
+
+    for new, ref in zip(run(False), run(True)):
+        assert_array_equal(new, ref)
+
+
+def test_write_read(tmp_path):
+
+    myd = _make_data("periodic")
+    g = myd.grid
+    myd.get_var("a")[:,:] = np.sin(2.0*np.pi*g.x2d)*np.cos(2.0*np.pi*g.y2d)
+
+    h = amr.AMRHierarchy(myd, max_levels=3, block_size=8, buffer=1)
+    h.regrid(_tag_center)
+    h.advance(0.4*g.dx, _upwind)
+
+    with h5py.File(str(tmp_path / "amr.h5"), "w") as f:
+        h.write(f)
+
+    with h5py.File(str(tmp_path / "amr.h5"), "r") as f:
+        new = amr.AMRHierarchy.read(f["amr"], myd)
+
+    assert new.nlevels() == h.nlevels()
+
+    for level, new_level in zip(h.levels[1:], new.levels[1:]):
+        assert len(new_level.patches) == len(level.patches)
+        for p, q in zip(level.patches, new_level.patches):
+            assert (q.ilo, q.ihi, q.jlo, q.jhi) == (p.ilo, p.ihi, p.jlo, p.jhi)
+            assert_array_equal(q.data.get_var("a").v(), p.data.get_var("a").v())
@@ -0,0 +1,107 @@
+# unit tests for the domain decomposition
+import numpy as np
+import pytest
+
+import mesh.boundary as bnd
+import mesh.decomposition as decomposition
+import mesh.patch as patch
+
+from numpy.testing import assert_array_equal
+
+
+def _fill(myd):
+    myd.fill_BC_all()
+
+
+def _valid_sum(myd):
+    return myd.get_var("a").v().sum()
+
+
+def _rank(myd):
+    return myd.decomp.rank
+
+
+def _fail(myd):
+    raise ValueError("oops")
+
+
+def _make_data(xbc, ybc):
+    myg = patch.Grid2d(12, 10, ng=2)
+    myd = patch.CellCenterData2d(myg)
+
+    bc = bnd.BC(xlb=xbc, xrb=xbc, ylb=ybc, yrb=ybc)
+    bc_odd = bnd.BC(xlb=xbc, xrb=xbc, ylb=ybc, yrb=ybc, odd_reflect_dir="x")
+
+    myd.register_var("a", bc)
+    myd.register_var("b", bc_odd)
+    myd.create()
+
+    rng = np.random.RandomState(1)
+    d = myd.data
+    d[:,:,:] = rng.randint(-100, 100, size=d.shape)
+
+    return myd
+
+
+@pytest.mark.parametrize("xbc, ybc", [("periodic", "outflow"),
+                                      ("reflect", "periodic"),
+                                      ("outflow", "reflect")])
+@pytest.mark.parametrize("npx, npy", [(2, 1), (1, 3), (3, 2)])
+def test_fill_BC(xbc, ybc, npx, npy):
+
+    serial = _make_data(xbc, ybc)
+    myd = _make_data(xbc, ybc)
+
+    serial.fill_BC_all()
+
+    decomp = decomposition.Decomposition(myd.grid, npx, npy)
+    decomp.share("data", myd)
+    decomp.start(lambda d: d.local["data"])
+
+    try:
+        decomp.run(_fill)
+        decomp.gather("data")
+    finally:
+        decomp.shutdown()
+
+    assert_array_equal(myd.data, serial.data)
+
+
+def test_allreduce():
+
+    myd = _make_data("periodic", "periodic")
+
+    decomp = decomposition.Decomposition(myd.grid, 2, 2)
+    decomp.share("data", myd)
+    decomp.start(lambda d: d.local["data"])
+
+    try:
+        assert decomp.run(_rank) == [0, 1, 2, 3]
+        assert decomp.allreduce(_valid_sum, "sum") == myd.get_var("a").v().sum()
+    finally:
+        decomp.shutdown()
+
+
+def test_neighbor():
+
+    myg = patch.Grid2d(12, 10, ng=2)
+    decomp = decomposition.Decomposition(myg, 3, 2)
+
+    # rank = ix*npy + iy
+    assert decomp.neighbor(2, "xlb") == 0
+    assert decomp.neighbor(2, "xrb") == 4
+    assert decomp.neighbor(0, "xlb") == 4
+    assert decomp.neighbor(3, "ylb") == 2
+    assert decomp.neighbor(3, "yrb") == 2
+
+
+def test_worker_error():
+
+    myd = _make_data("outflow", "outflow")
+
+    decomp = decomposition.Decomposition(myd.grid, 2, 1)
+    decomp.share("data", myd)
+    decomp.start(lambda d: d.local["data"])
+
+    with pytest.raises(SystemExit):
+        decomp.run(_fail)
@@ -0,0 +1,204 @@
+# unit tests for the Runge-Kutta integrators
+import numpy as np
+import pytest
+
+import mesh.boundary as bnd
+import mesh.integration as integration
+import mesh.patch as patch
+
+
+def _integrate(method, nsteps):
+    """ integrate dy/dt = y cos(t) from t = 0 to 1, returning the error """
+
+    myg = patch.Grid2d(4, 4, ng=1)
+    myd = patch.CellCenterData2d(myg)
+    myd.register_var("y", bnd.BC(xlb="periodic", xrb="periodic",
+                                 ylb="periodic", yrb="periodic"))
+    myd.create()
+
+    y = myd.get_var("y")
+    y[:,:] = 1.0
+
+    dt = 1.0/nsteps
+    myd.t = 0.0
+
+    for _ in range(nsteps):
+        rk = integration.rk_integrator(myd.t, dt, method=method)
+        rk.set_start(myd)
+
+        for s in range(rk.nstages()):
+            ytmp = rk.get_stage_start(s)
+            k = myg.scratch_array()
+            k[:,:] = ytmp.get_var("y")*np.cos(ytmp.t)
+            rk.store_increment(s, k)
+
+        rk.compute_final_update()
+        myd.t += dt
+
+    return abs(myd.get_var("y").v() - np.exp(np.sin(1.0))).max()
+
+
+@pytest.mark.parametrize("method, order", [("RK2", 2), ("TVD3", 3), ("RK4", 4),
+                                           ("LSRK33", 3), ("LSRK54", 4),
+                                           ("SSPRK33", 3), ("SSPRK104", 4)])
+def test_convergence(method, order):
+
+    e1 = _integrate(method, 16)
+    e2 = _integrate(method, 32)
+
+    assert np.log2(e1/e2) == pytest.approx(order, abs=0.3)
+
+
+def _integrate_imex(method, nsteps, lam):
+    """ integrate dy/dt = -sin(t) - lam (y - cos(t)) from t = 0 to 1,
+    with the second term implicit, returning the error """
+
+    myg = patch.Grid2d(4, 4, ng=1)
+    myd = patch.CellCenterData2d(myg)
+    myd.register_var("y", bnd.BC(xlb="periodic", xrb="periodic",
+                                 ylb="periodic", yrb="periodic"))
+    myd.create()
+
+    y = myd.get_var("y")
+    y[:,:] = 1.0
+
+    dt = 1.0/nsteps
+    myd.t = 0.0
+
+    for _ in range(nsteps):
+        rk = integration.rk_integrator(myd.t, dt, method=method)
+        rk.set_start(myd)
+
+        for s in range(rk.nstages()):
+            ytmp = rk.get_stage_start(s)
+
+            h = rk.implicit_weight(s)
+            if h > 0.0:
+                ys = ytmp.get_var("y")
+                ys[:,:] = (ys + h*lam*np.cos(ytmp.t))/(1.0 + h*lam)
+                rk.store_implicit(s, ytmp)
+
+            k = myg.scratch_array()
+            k[:,:] = -np.sin(ytmp.t)
+            rk.store_increment(s, k)
+
+        rk.compute_final_update()
+        myd.t += dt
+
+    return abs(myd.get_var("y").v() - np.cos(1.0)).max()
+
+
+@pytest.mark.parametrize("method, order", [("ARS222", 2), ("ARS443", 3)])
+def test_imex_convergence(method, order):
+
+    e1 = _integrate_imex(method, 16, 1.0)
+    e2 = _integrate_imex(method, 32, 1.0)
+
+    assert np.log2(e1/e2) == pytest.approx(order, abs=0.3)
+
+
+@pytest.mark.parametrize("method", ["ARS222", "ARS443"])
+def test_imex_stiff(method):
+
+    # dt is far above the explicit stability limit, 2/lam
+    assert _integrate_imex(method, 10, 1.e6) < 1.e-6
+
+
+def test_newton_solve():
+
+    # y - h f(y) = y0 with f = -y**2, in each zone
+    y0 = np.linspace(0.5, 2.0, 12).reshape(3, 4, 1)
+    y = y0.copy()
+    h = 2.0
+
+    integration.newton_solve(y, lambda y: -y**2,
+                             lambda y: -2.0*y[..., np.newaxis], h)
+
+    assert np.allclose(y, (-1.0 + np.sqrt(1.0 + 4.0*h*y0))/(2.0*h), rtol=1.e-12)
+
+
+def test_low_storage_in_place():
+
+    myg = patch.Grid2d(4, 4, ng=1)
+    myd = patch.CellCenterData2d(myg)
+    myd.register_var("y", bnd.BC())
+    myd.create()
+
+    rk = integration.rk_integrator(0.0, 0.1, method="LSRK54")
+    rk.set_start(myd)
+
+    for s in range(rk.nstages()):
+        assert rk.get_stage_start(s) is myd
+
+
+def test_reuse():
+
+    myg = patch.Grid2d(4, 4, ng=1)
+    myd = patch.CellCenterData2d(myg)
+    myd.register_var("y", bnd.BC())
+    myd.create()
+
+    rk = integration.rk_integrator(0.0, 0.1, method="RK4")
+    rk.set_start(myd)
+    rk.store_increment(0, myg.scratch_array())
+    stage = rk.get_stage_start(1)
+
+    # the same method reuses the integrator and its stage data
+    new = integration.rk_integrator(0.1, 0.1, method="RK4", reuse=rk)
+    new.set_start(myd)
+    new.store_increment(0, myg.scratch_array())
+
+    assert new is rk
+    assert new.get_stage_start(1) is stage
+
+    assert integration.rk_integrator(0.1, 0.1, method="RK2", reuse=rk) is not rk
+
+
+@pytest.mark.parametrize("method", ["BS32", "DP54"])
+def test_embedded_error(method):
+
+    # the error estimate scales with the order of the embedded solution
+    myg = patch.Grid2d(4, 4, ng=1)
+    myd = patch.CellCenterData2d(myg)
+    myd.register_var("y", bnd.BC())
+    myd.create()
+
+    errs = []
+    for dt in [0.1, 0.05]:
+        y = myd.get_var("y")
+        y[:,:] = 1.0
+        myd.t = 0.5
+
+        rk = integration.rk_integrator(myd.t, dt, method=method)
+        rk.set_start(myd)
+
+        for s in range(rk.nstages()):
+            ytmp = rk.get_stage_start(s)
+            k = myg.scratch_array()
+            k[:,:] = ytmp.get_var("y")*np.cos(ytmp.t)
+            rk.store_increment(s, k)
+
+        rk.compute_final_update()
+        errs.append(rk.error_norm(1.0, 0.0))
+
+        # rejecting restores the start
+        rk.reject()
+        assert np.all(myd.get_var("y").v() == 1.0)
+
+    order = integration.embedded_order[method]
+    assert np.log2(errs[0]/errs[1]) == pytest.approx(order + 1, abs=0.5)
+
+
+def test_pi_controller():
+
+    pi = integration.PIController(4)
+
+    assert pi.accept(0.5)
+    assert not pi.accept(2.0)
+
+    # small errors grow the step (up to max_factor), large ones shrink it
+    assert pi.propose(1.0, 0.1) > 1.0
+    assert pi.retry(1.0, 10.0) < 1.0
+
+    pi = integration.PIController(4)
+    assert pi.propose(1.0, 1.e-20) == pi.max_factor
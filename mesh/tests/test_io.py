@@ -2,6 +2,7 @@ import mesh.boundary as bnd
 import mesh.patch as patch
 import mesh.array_indexer as ai
 import numpy as np
+import pytest
 import util.io as io
 
 from numpy.testing import assert_array_equal
@@ -31,3 +32,79 @@ def test_write_read():
 
     assert_array_equal(anew.v(), a.v())
 
+
+
+@pytest.mark.parametrize("opts", [dict(file_format="npy"),
+                                  dict(file_format="npz", precision="single"),
+                                  dict(compression="gzip", shuffle=True),
+                                  dict(compression="lzf", chunk=4),
+                                  dict(compression="gzip", compression_level=9, precision="single"),
+                                  dict(precision="single")])
+def test_write_read_options(tmp_path, opts):
+
+    myg = patch.Grid2d(8, 6, ng=2, xmax=1.0, ymax=1.0)
+    myd = patch.CellCenterData2d(myg)
+
+    bco = bnd.BC(xlb="outflow", xrb="outflow",
+                 ylb="outflow", yrb="outflow")
+    myd.register_var("a", bco)
+
+    myd.create()
+
+    a = myd.get_var("a")
+    a.v()[:,:] = np.sin(np.arange(48).reshape(8, 6))
+
+    myd.write(str(tmp_path / "io_test"), **opts)
+
+    nd = io.read(str(tmp_path / "io_test"))
+    anew = nd.get_var("a")
+
+    assert anew.dtype == np.float64
+
+    if opts.get("precision") == "single":
+        assert_array_equal(anew.v(), a.v().astype(np.float32))
+    else:
+        assert_array_equal(anew.v(), a.v())
+
+
+@pytest.mark.parametrize("opts", [{}, dict(compression="gzip"), dict(precision="single"),
+                                  dict(file_format="npy"), dict(file_format="npz")])
+def test_plotfile(tmp_path, opts):
+
+    myg = patch.Grid2d(8, 6, ng=2, xmax=2.0, ymax=1.0)
+    myd = patch.CellCenterData2d(myg)
+
+    bco = bnd.BC(xlb="outflow", xrb="outflow",
+                 ylb="outflow", yrb="outflow")
+    myd.register_var("a", bco)
+    myd.register_var("b", bco)
+    myd.set_aux("gamma", 1.4)
+
+    myd.create()
+
+    a = myd.get_var("a")
+    a.v()[:,:] = np.sin(np.arange(48).reshape(8, 6))
+
+    myd.write(str(tmp_path / "io_test"), **opts)
+
+    with io.Plotfile(str(tmp_path / "io_test")) as pf:
+
+        assert pf.solver_name is None
+        assert pf.names == ["a", "b"]
+        assert pf.aux["gamma"] == 1.4
+        assert (pf.grid.nx, pf.grid.ny, pf.grid.xmax) == (8, 6, 2.0)
+
+        # nothing is read until it is asked for
+        assert pf._vars == {}
+
+        anew = pf["a"]
+        assert list(pf._vars) == ["a"]
+
+        # only the plain data can be memory-mapped
+        mmap = opts.get("compression") is None and opts.get("file_format") != "npz"
+        assert isinstance(anew, np.memmap) == mmap
+
+        assert_array_equal(anew, a.v().astype(anew.dtype))
+
+        with pytest.raises(KeyError):
+            pf.get_var("c")
@@ -4,7 +4,7 @@ import mesh.patch as patch
 import mesh.array_indexer as ai
 import numpy as np
 
-from numpy.testing import assert_array_equal
+from numpy.testing import assert_array_equal, assert_allclose
 
 
 # Grid2d tests
@@ -229,3 +229,225 @@ def test_bcs():
 
 
 
+
+def test_bcs_all():
+
+    myg = patch.Grid2d(6, 4, ng=3, xmax=1.0, ymax=1.0)
+    myd = patch.CellCenterData2d(myg)
+
+    bco = bnd.BC(xlb="outflow", xrb="reflect-even",
+                 ylb="reflect-odd", yrb="reflect-even")
+    bcp = bnd.BC(xlb="periodic", xrb="periodic",
+                 ylb="periodic", yrb="periodic")
+    bcv = bnd.BC(xlb="dirichlet", xrb="neumann",
+                 ylb="neumann", yrb="dirichlet",
+                 xl_func=lambda y: 1.0 + y, xr_func=lambda y: 2.0*y,
+                 yl_func=lambda x: -x, yr_func=lambda x: 3.0 + x,
+                 grid=myg)
+
+    # interleave the BC types so the groups are not contiguous
+    myd.register_var("a", bco)
+    myd.register_var("b", bcp)
+    myd.register_var("c", bco)
+    myd.register_var("d", bcv)
+    myd.register_var("e", bcp)
+    myd.create()
+
+    myd.data[:,:,:] = np.random.rand(*myd.data.shape)
+
+    ref = patch.cell_center_data_clone(myd)
+
+    myd.fill_BC_all()
+    for name in ref.names:
+        ref.fill_BC(name)
+
+    assert_array_equal(myd.data, ref.data)
+
+    # check the inhomogeneous dirichlet value is respected
+    d = myd.get_var("d")
+    assert_allclose(0.5*(d[myg.ilo-1,myg.jlo:myg.jhi+1] + d[myg.ilo,myg.jlo:myg.jhi+1]),
+                    1.0 + myg.y[myg.jlo:myg.jhi+1])
+
+
+def test_lazy_bcs():
+
+    myg = patch.Grid2d(4, 4, ng=2)
+    myd = patch.CellCenterData2d(myg, lazy_bcs=True)
+
+    bc = bnd.BC(xlb="outflow", xrb="outflow", ylb="outflow", yrb="outflow")
+    myd.register_var("a", bc)
+    myd.register_var("b", bc)
+    myd.create()
+
+    a = myd.get_var("a")
+    a.v()[:,:] = 1.0
+    del a
+    myd.fill_BC_all()
+    assert myd.bc_stats == {"filled": 2, "skipped": 0}
+
+    # nothing changed, so these are no-ops
+    myd.fill_BC_all()
+    myd.fill_BC("a")
+    assert myd.bc_stats == {"filled": 2, "skipped": 3}
+
+    # a view that is still alive may be written to after the fill
+    b = myd.get_var("b")
+    myd.fill_BC("b")
+    b.v()[:,:] = 2.0
+    myd.fill_BC("b")
+    assert myd.bc_stats["filled"] == 4
+    assert_array_equal(b, 2.0)
+
+    del b
+    myd.fill_BC("b")
+    assert not myd.is_dirty("b")
+
+    # writes through the full data array are seen too
+    myd.data[:,:,0] = 3.0
+    assert myd.is_dirty("a")
+
+    # and so are writes through slices of a handed-out array that
+    # outlive it
+    myd.fill_BC_all()
+    x = myd.data[:,:,0]
+    y = np.asarray(myd.get_var("b"))
+    myd.fill_BC_all()
+    assert myd.is_dirty("a") and myd.is_dirty("b")
+
+    x[myg.ilo:myg.ihi+1, myg.jlo:myg.jhi+1] = 4.0
+    y[myg.ilo:myg.ihi+1, myg.jlo:myg.jhi+1] = 5.0
+    myd.fill_BC_all()
+    assert_array_equal(x, 4.0)
+    assert_array_equal(y, 5.0)
+
+    del x, y
+    myd.fill_BC_all()
+    assert not myd.is_dirty("a") and not myd.is_dirty("b")
+
+
+def test_scratch_pool():
+
+    myg = patch.Grid2d(4, 6, ng=2)
+
+    a = myg.pooled_array()
+    a[:,:] = 1.0
+    myg.release(a)
+
+    # the released array is reused, and zeroed unless asked not to be
+    b = myg.pooled_array()
+    assert b is a
+    assert_array_equal(b, 0.0)
+
+    with myg.scratch_scope():
+        c = myg.pooled_array(nvar=3, zero=False)
+        assert c.shape == (myg.qx, myg.qy, 3)
+        assert myg.pool.in_use_bytes == b.nbytes + c.nbytes
+
+    assert myg.pool.in_use_bytes == b.nbytes
+    assert myg.pool.peak_bytes == b.nbytes + c.nbytes
+    assert myg.pooled_array(nvar=3) is c
+
+
+def test_get_cached():
+
+    myg = patch.Grid2d(4, 4, ng=2)
+    myd = patch.CellCenterData2d(myg)
+
+    bc = bnd.BC(xlb="outflow", xrb="outflow", ylb="outflow", yrb="outflow")
+    myd.register_var("a", bc)
+    myd.create()
+
+    # the arrays handed out are only followed once get_cached is used
+    a = myd.get_var("a")
+    a[:,:] = 1.0
+    assert myd._views == []
+    del a
+
+    def twice(d):
+        return 2.0*d.get_var("a")
+
+    t1 = myd.get_cached("twice", twice)
+    t2 = myd.get_cached("twice", twice)
+    assert t2 is t1
+    assert not t1.flags.writeable
+    assert myd.cache_stats == {"hits": 1, "misses": 1}
+
+    # getting the variable may change it, so the value is recomputed
+    a = myd.get_var("a")
+    assert len(myd._views) == 1
+    a[:,:] = 2.0
+    assert_array_equal(myd.get_cached("twice", twice), 4.0)
+
+    # and it is not stored while a is still alive
+    a[:,:] = 3.0
+    assert_array_equal(myd.get_cached("twice", twice), 6.0)
+    del a
+
+    # nor while a slice of an array we handed out is
+    def total(d):
+        return d.get_var("a").v().sum()
+
+    rho = myd.data[:,:,0]
+    rho[:,:] = 4.0
+    assert myd.get_cached("total", total) == 64.0
+
+    rho[:,:] = 8.0
+    assert myd.get_cached("total", total) == 128.0
+
+    del rho
+    assert myd.get_cached("total", total) is myd.get_cached("total", total)
+
+
+def test_tiles():
+
+    myg = patch.Grid2d(10, 7, ng=2, xmax=2.0, ymax=1.4)
+
+    tiles = myg.tiles(3, 2)
+    assert len(tiles) == 6
+    assert myg.tiles(3, 2) is tiles
+
+    # the tiles cover every valid zone exactly once
+    count = myg.scratch_array()
+    for t in tiles:
+        count[t.valid] += 1.0
+    assert_array_equal(count.v(), 1.0)
+    assert count.sum() == myg.nx*myg.ny
+
+    for t in tiles:
+        g = t.grid
+        assert g.ng == myg.ng
+        assert g.dx == myg.dx and g.dy == myg.dy
+        assert_array_equal(g.x, myg.x[t.box[0]])
+        assert_array_equal(g.y2d, myg.y2d[t.box])
+
+    # only the sides on the physical boundary keep the solid walls
+    solid = bnd.BCProp(1, 1, 0, 1)
+    s = tiles[0].solid(solid)
+    assert (s.xl, s.xr, s.yl, s.yr) == (1, 0, 0, 0)
+    s = tiles[-1].solid(solid)
+    assert (s.xl, s.xr, s.yl, s.yr) == (0, 1, 0, 1)
+
+
+def test_tile_view():
+
+    myg = patch.Grid2d(8, 6, ng=2)
+    myd = patch.CellCenterData2d(myg)
+
+    bc = bnd.BC(xlb="outflow", xrb="outflow", ylb="outflow", yrb="outflow")
+    myd.register_var("a", bc)
+    myd.create()
+
+    a = myd.get_var("a")
+    a[:,:] = np.arange(myg.qx*myg.qy).reshape(myg.qx, myg.qy)
+
+    t = myg.tiles(2)[1]
+    tv = myd.tile_view(t)
+
+    # the tile's valid data and ghost cells are the parent's
+    ta = tv.get_var("a")
+    assert ta.shape == (t.grid.qx, t.grid.qy)
+    assert_array_equal(ta.v(buf=2), a[t.box])
+
+    # and writes go through to the parent
+    ta.v()[:,:] = -1.0
+    assert_array_equal(a[t.valid], -1.0)
@@ -0,0 +1,30 @@
+# unit tests for the reconstruction routines
+import mesh.patch as patch
+import mesh.reconstruction as reconstruction
+import numpy as np
+
+from numpy.testing import assert_allclose
+
+
+def test_weno_upwind_array():
+
+    myg = patch.Grid2d(16, 8, ng=4)
+
+    a = myg.scratch_array()
+    a[:,:] = np.sin(2.0*np.pi*myg.x2d) + np.cos(4.0*np.pi*myg.y2d) + \
+        (myg.x2d > 0.5)
+
+    for order in (2, 3):
+        # x-direction, left biased
+        q_rec = reconstruction.weno_upwind_array(a, order, 1)
+        for i in range(order-1, myg.qx-order+1):
+            for j in range(myg.qy):
+                q_pt = reconstruction.weno_upwind(a[i-order+1:i+order, j], order)
+                assert_allclose(q_rec[i,j], q_pt, rtol=1.e-14)
+
+        # y-direction, right biased
+        q_rec = reconstruction.weno_upwind_array(a, order, 2, reverse=True)
+        for i in range(myg.qx):
+            for j in range(order, myg.qy-order+1):
+                q_pt = reconstruction.weno_upwind(a[i, j+order-1:j-order:-1], order)
+                assert_allclose(q_rec[i,j], q_pt, rtol=1.e-14)
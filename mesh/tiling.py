@@ -0,0 +1,92 @@
+"""
+Thread-parallel execution over the tiles of a grid.
+
+A Grid2d can be split into logical tiles (see Grid2d.tiles), each
+with its own Grid2d and ghost cells overlapping its neighbors.  A
+TileExecutor runs a function on each of the tiles, on a pool of
+threads.  Most of the work in pyro is done in NumPy and in the
+compiled (f2py) kernels, which release the GIL, so the tiles really
+are worked on concurrently.
+
+Typical usage:
+
+  -- create the executor (once)
+
+     tx = TileExecutor(nthreads)
+
+
+  -- make views of the data on each tile, then work on them
+
+     tiles = tx.tiles(my_grid)
+     views = [my_data.tile_view(t) for t in tiles]
+
+     results = tx.map(work, tiles, views)
+
+The work done on one tile must not write to anything another tile
+reads.  If the tiles both read a field (in their ghost cells) and
+write it (in their valid zones), split the work into a phase that
+reads and a phase that writes, each with its own map.
+
+Each tile's valid zones get exactly the same result as a serial run
+over the whole grid.
+"""
+
+from __future__ import print_function
+
+import concurrent.futures
+
+
+class TileExecutor(object):
+    """
+    run a function over the tiles of a grid, using nthreads threads
+    """
+
+    def __init__(self, nthreads=1):
+        """
+        Create the TileExecutor.
+
+        Parameters
+        ----------
+        nthreads : int, optional
+            The number of threads to use.  With 1 thread, the tiles
+            are not used -- the grid is worked on as a whole.
+        """
+
+        self.nthreads = max(1, int(nthreads))
+        self._pool = None
+
+
+    def tiles(self, grid):
+        """
+        return the tiles to use for grid -- one per thread, as strips
+        in x (the slowest-varying index, so each tile is a
+        contiguous piece of memory)
+        """
+        return grid.tiles(self.nthreads, 1)
+
+
+    def map(self, func, *iterables):
+        """
+        call func on each set of arguments from iterables (one per
+        tile), concurrently, and return the list of results in order.
+        Any exception raised by func is raised here.
+        """
+
+        if self.nthreads == 1:
+            return [func(*args) for args in zip(*iterables)]
+
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.nthreads)
+
+        return list(self._pool.map(func, *iterables))
+
+
+    def shutdown(self):
+        """ stop the threads """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+    def __str__(self):
+        return "tile executor: nthreads = {}".format(self.nthreads)
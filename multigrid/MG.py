@@ -1,8 +1,11 @@
 """
 The multigrid module provides a framework for solving elliptic
 problems.  A multigrid object is just a list of grids, from the finest
-mesh down (by factors of two) to a single interior zone (each grid has
-the same number of guardcells).
+mesh down (by factors of two) to a coarse bottom grid (each grid has
+the same number of guardcells).  We coarsen for as long as both
+dimensions stay even and no smaller than coarse_size, so the grid
+does not need to be square or a power of 2 -- e.g. a 384 x 128 grid
+coarsens down to 6 x 2.
 
 The main multigrid class is setup to solve a constant-coefficient
 Helmholtz equation:
@@ -41,6 +44,39 @@ Then to solve, you just do:
 
 where rtol is the desired tolerance (residual norm / source norm)
 
+By default, the solve does V-cycles.  Passing cycle_type="W" or "F"
+to the constructor selects W- or F-cycles instead, and fmg=True makes
+the first cycle a full multigrid cycle, which starts on the coarsest
+grid and typically reaches the discretization error in one cycle.
+The bottom grid is solved with nsmooth_bottom smoothing sweeps by
+default.  bottom_solver="direct" instead solves it exactly with the
+sparse LU factorization of its operator, which is built once and kept
+until the coefficients change, and bottom_solver="cg" uses conjugate
+gradient.  Either is needed when the bottom grid is not tiny.
+
+After the solve, a.num_cycles and a.work_units report the cost, and
+a.residual_history holds the residual error after each cycle.
+
+For difficult problems (e.g. variable coefficients with a large
+contrast), the multigrid cycles can instead be used as a
+preconditioner for a Krylov method.  Passing krylov="cg" to the
+constructor selects preconditioned conjugate gradient, and
+krylov="bicgstab" selects BiCGStab, which also works for the
+non-symmetric operators of the general solver.  Each preconditioner
+application is one cycle of type cycle_type, and a.num_cycles then
+counts the Krylov iterations.
+
+A multigrid object can be reused for a new problem on the same grid
+with the same boundary conditions -- this avoids rebuilding the level
+hierarchy.  Set the new coefficients (set_alpha_beta(), or
+set_coeffs() for the variable-coefficient solvers), RHS and initial
+guess and solve again:
+
+> a.set_alpha_beta(alpha, beta)
+> a.init_RHS(f)
+> a.init_zeros()
+> a.solve(rtol = 1.e-10)
+
 to access the final solution, use the getSolution method
 
 v = a.get_solution()
@@ -58,9 +94,9 @@ a.dx and a.dy are the grid spacings
 
 from __future__ import print_function
 
-import math
-
 import numpy as np
+import scipy.sparse as sparse
+import scipy.sparse.linalg as splinalg
 import matplotlib.pyplot as plt
 import matplotlib
 
@@ -73,8 +109,9 @@ class CellCenterMG2d(object):
     """
     The main multigrid class for cell-centered data.
 
-    We require that nx = ny be a power of 2 and dx = dy, for
-    simplicity
+    The hierarchy is coarsened by factors of 2 for as long as nx and
+    ny are even and at least coarse_size, and the coarsest level is
+    solved with the bottom_solver.
     """
 
     def __init__(self, nx, ny, ng=1,
@@ -85,12 +122,13 @@ class CellCenterMG2d(object):
                  yl_BC=None, yr_BC=None,
                  alpha=0.0, beta=-1.0,
                  nsmooth=10, nsmooth_bottom=50,
+                 cycle_type="V", fmg=False, krylov=None,
+                 coarse_size=2, bottom_solver="smooth",
                  verbose=0,
                  aux_field=None, aux_bc=None,
                  true_function=None, vis=0, vis_title=""):
         """
-        Create the CellCenterMG2d object.  Note that this requires a
-        grid to be a power of 2 in size and square.
+        Create the CellCenterMG2d object.
 
         Parameters
         ----------
@@ -136,6 +174,22 @@ class CellCenterMG2d(object):
         nsmooth_bottom : int, optional
             number of smoothing iterations to be done during the bottom
             solve
+        cycle_type : {'V', 'W', 'F'}, optional
+            the type of multigrid cycle to do on each iteration
+        fmg : bool, optional
+            if True, the first cycle is a full multigrid (FMG) cycle,
+            which builds the solution up from the coarsest level
+        krylov : {None, 'cg', 'bicgstab'}, optional
+            if set, solve with this Krylov method, using a multigrid
+            cycle as the preconditioner, instead of with plain cycles
+        coarse_size : int, optional
+            the smallest number of cells in either direction allowed
+            on a coarse level -- the hierarchy stops before it would
+            go below this, or once a dimension becomes odd
+        bottom_solver : {'smooth', 'direct', 'cg'}, optional
+            how to solve on the coarsest level: nsmooth_bottom
+            smoothing sweeps, an exact solve with the sparse LU
+            factorization of the coarse operator, or conjugate gradient
         verbose : int, optional
             increase verbosity during the solve (for verbose=1)
         aux_field : list of str, optional
@@ -159,9 +213,6 @@ class CellCenterMG2d(object):
 
         """
 
-        if nx != ny:
-            raise ValueError("ERROR: multigrid currently requires nx = ny")
-
         self.nx = nx
         self.ny = ny
 
@@ -173,16 +224,33 @@ class CellCenterMG2d(object):
         self.ymin = ymin
         self.ymax = ymax
 
-        if (xmax-xmin) != (ymax-ymin):
-            raise ValueError("ERROR: multigrid currently requires a square domain")
-
-
         self.alpha = alpha
         self.beta = beta
 
         self.nsmooth = nsmooth
         self.nsmooth_bottom = nsmooth_bottom
 
+        if cycle_type not in ["V", "W", "F"]:
+            raise ValueError("ERROR: invalid cycle_type {}".format(cycle_type))
+
+        self.cycle_type = cycle_type
+        self.fmg = fmg
+
+        if krylov not in [None, "cg", "bicgstab"]:
+            raise ValueError("ERROR: invalid krylov method {}".format(krylov))
+
+        self.krylov = krylov
+
+        if bottom_solver not in ["smooth", "direct", "cg"]:
+            raise ValueError("ERROR: invalid bottom_solver {}".format(bottom_solver))
+
+        self.bottom_solver = bottom_solver
+
+        # the LU factorization of the bottom level operator, for the
+        # direct bottom solve.  This is built on first use and reset
+        # when the coefficients change
+        self._bottom_lu = None
+
         self.max_cycles = 100
 
         self.verbose = verbose
@@ -198,9 +266,19 @@ class CellCenterMG2d(object):
         # keep track of whether we've initialized the RHS
         self.initialized_rhs = 0
 
-        # assume that self.nx = 2^(nlevels-1) and that nx = ny
-        # this defines nlevels such that we end exactly on a 2x2 grid
-        self.nlevels = int(math.log(self.nx)/math.log(2.0))
+        # the sizes of the levels -- we coarsen by 2 as long as both
+        # dimensions are even and stay at least coarse_size
+        sizes = [(nx, ny)]
+        while (sizes[0][0] % 2 == 0 and sizes[0][1] % 2 == 0 and
+               min(sizes[0]) >= 2*coarse_size):
+            sizes.insert(0, (sizes[0][0]//2, sizes[0][1]//2))
+
+        self.nlevels = len(sizes)
+
+        # the red-black smoothing needs an even number of cells
+        if bottom_solver == "smooth" and (sizes[0][0] % 2 == 1 or sizes[0][1] % 2 == 1):
+            raise ValueError("ERROR: the bottom grid ({} x {}) is odd, so it cannot be smoothed -- "
+                             "use bottom_solver = 'direct' or 'cg'".format(*sizes[0]))
 
         # a multigrid object will be a list of grids
         self.grids = []
@@ -213,9 +291,11 @@ class CellCenterMG2d(object):
         bc = bnd.BC(xlb=xl_BC_type, xrb=xr_BC_type,
                     ylb=yl_BC_type, yrb=yr_BC_type)
 
-        nx_t = ny_t = 2
+        # the Krylov solvers work on the error equation, which has
+        # homogeneous BCs on the finest level too
+        self._homogeneous_bc = bc
 
-        for i in range(self.nlevels):
+        for i, (nx_t, ny_t) in enumerate(sizes):
 
             # create the grid
             my_grid = patch.Grid2d(nx_t, ny_t, ng=self.ng,
@@ -248,9 +328,6 @@ class CellCenterMG2d(object):
 
             if self.verbose: print(self.grids[i])
 
-            nx_t = nx_t*2
-            ny_t = ny_t*2
-
 
         # provide coordinate and indexing information for the solution mesh
         soln_grid = self.grids[self.nlevels-1].grid
@@ -265,7 +342,7 @@ class CellCenterMG2d(object):
         self.x2d = soln_grid.x2d
 
         self.y = soln_grid.y
-        self.dy = soln_grid.dy   # note, dy = dx is assumed
+        self.dy = soln_grid.dy
         self.y2d = soln_grid.y2d
 
         self.soln_grid = soln_grid
@@ -280,6 +357,14 @@ class CellCenterMG2d(object):
         self.residual_error = 1.e33
         self.relative_error = 1.e33
 
+        # the residual error after each cycle (or Krylov iteration)
+        self.residual_history = []
+
+        # the work done in the last solve, in work units: one work
+        # unit is one smoothing sweep (or residual evaluation) on the
+        # finest level
+        self.work_units = 0.0
+
         # keep track of where we are in the V
         self.current_cycle = -1
         self.current_level = -1
@@ -486,6 +571,27 @@ class CellCenterMG2d(object):
         return self.grids[self.nlevels-1]
 
 
+    def set_alpha_beta(self, alpha, beta):
+        """
+        Reset the coefficients of the Helmholtz equation
+        (alpha - beta L) phi = f.  This allows the same multigrid
+        object (and its level hierarchy) to be reused when the
+        coefficients change, e.g. with the timestep.
+
+        Parameters
+        ----------
+        alpha : float
+            coefficient in Helmholtz equation (alpha - beta L) phi = f
+        beta : float
+            coefficient in Helmholtz equation (alpha - beta L) phi = f
+
+        """
+        self.alpha = alpha
+        self.beta = beta
+
+        self._bottom_lu = None
+
+
     def init_solution(self, data):
         """
         Initialize the solution to the elliptic problem by passing in
@@ -636,9 +742,17 @@ class CellCenterMG2d(object):
     def solve(self, rtol=1.e-11):
         """
         The main driver for the multigrid solution of the Helmholtz
-        equation.  This controls the V-cycles, smoothing at each
-        step of the way and uses simple smoothing at the coarsest
-        level to perform the bottom solve.
+        equation.  This controls the cycles (V, W, or F, set by
+        cycle_type), smoothing at each step of the way and uses simple
+        smoothing at the coarsest level to perform the bottom solve.
+        If fmg is set, the first cycle is a full multigrid cycle.  If
+        krylov is set, the cycles are instead used as a preconditioner
+        for a Krylov method.
+
+        After the solve, num_cycles holds the number of cycles (or
+        Krylov iterations) taken, residual_history the residual error
+        after each of them, and work_units the total work done, in
+        units of one smoothing sweep on the finest level.
 
         Parameters
         ----------
@@ -657,26 +771,38 @@ class CellCenterMG2d(object):
         if self.verbose:
             print("source norm = ", self.source_norm)
 
+        self.work_units = 0.0
+        self.residual_history = []
+
+        if self.krylov is not None:
+            self._krylov_solve(rtol)
+            return
+
         old_phi = self.grids[self.nlevels-1].get_var("v").copy()
 
         residual_error = 1.e33
         cycle = 1
 
-        # V-cycles until we achieve the L2 norm of the residual < rtol
+        # cycles until we achieve the L2 norm of the residual < rtol
         while residual_error > rtol and cycle <= self.max_cycles:
 
             self.current_cycle = cycle
 
-            # zero out the solution on all but the finest grid
-            for level in range(self.nlevels-1):
-                self.grids[level].zero("v")
+            level = self.nlevels-1
 
-            if self.verbose:
-                print("<<< beginning V-cycle (cycle {}) >>>\n".format(cycle))
+            if cycle == 1 and self.fmg:
+                if self.verbose:
+                    print("<<< beginning FMG cycle (cycle {}) >>>\n".format(cycle))
 
-            # do V-cycles through the entire hierarchy
-            level = self.nlevels-1
-            self.v_cycle(level)
+                self.fmg_cycle()
+
+            else:
+                if self.verbose:
+                    print("<<< beginning {}-cycle (cycle {}) >>>\n".format(
+                        self.cycle_type, cycle))
+
+                # do cycles through the entire hierarchy
+                self._mg_cycle(level, self.cycle_type)
 
             # compute the error with respect to the previous solution
             # this is for diagnostic purposes only -- it is not used to
@@ -690,13 +816,13 @@ class CellCenterMG2d(object):
 
             # compute the residual error, relative to the source norm
             self._compute_residual(self.nlevels-1)
+            self._add_work(self.nlevels-1, 1)
             fp = self.grids[level]
             r = fp.get_var("r")
 
-            if self.source_norm != 0.0:
-                residual_error = r.norm()/self.source_norm
-            else:
-                residual_error = r.norm()
+            residual_error = self._residual_norm(r)
+
+            self.residual_history.append(residual_error)
 
             if self.verbose:
                 print("cycle {}: relative err = {}, residual err = {}\n".format(
@@ -709,12 +835,333 @@ class CellCenterMG2d(object):
         self.residual_error = residual_error
         fp.fill_BC("v")
 
+        if self.verbose:
+            print("{} cycles, {:.1f} work units".format(self.num_cycles,
+                                                         self.work_units))
+
+
+    def _krylov_solve(self, rtol):
+        """
+        Solve with the Krylov method selected by krylov, using a
+        multigrid cycle as the preconditioner.  We work with the error
+        equation, A e = r, where r is the residual of the initial
+        guess.  The error has homogeneous BCs, so A is linear and
+        each preconditioner application is a cycle on the finest
+        level starting from zero.
+
+        Parameters
+        ----------
+        rtol : float
+            The relative tolerance (residual norm / source norm) to
+            solve to.
+
+        """
+
+        nf = self.nlevels-1
+        fp = self.grids[nf]
+        myg = fp.grid
+
+        v = fp.get_var("v")
+        f = fp.get_var("f")
+
+        # the residual of the initial guess, with the real BCs
+        fp.fill_BC("v")
+        self._compute_residual(nf)
+        self._add_work(nf, 1)
+
+        with myg.scratch_scope():
+            v_init = myg.pooled_array(zero=False)
+            v_init[:,:] = v
+
+            f_init = myg.pooled_array(zero=False)
+            f_init[:,:] = f
+
+            r = myg.pooled_array(zero=False)
+            r[:,:] = fp.get_var("r")
+
+            e = myg.pooled_array()
+
+            bc = fp.BCs["v"]
+            fp.BCs["v"] = self._homogeneous_bc
+
+            try:
+                if self.krylov == "cg":
+                    self._pcg(r, e, rtol)
+                else:
+                    self._bicgstab(r, e, rtol)
+            finally:
+                fp.BCs["v"] = bc
+
+            # add the correction to the initial guess and restore the RHS
+            f[:,:] = f_init
+            v.v()[:,:] = v_init.v() + e.v()
+            fp.fill_BC("v")
+
+            self.relative_error = myg.norm(e/(v + self.small))
+
+        # the final residual, with the real BCs
+        self._compute_residual(nf)
+        self._add_work(nf, 1)
+        self.residual_error = self._residual_norm(fp.get_var("r"))
+
+        if self.verbose:
+            print("{} {} iterations, {:.1f} work units".format(
+                self.num_cycles, self.krylov, self.work_units))
+
+
+    def _pcg(self, r, x, rtol):
+        """
+        Multigrid-preconditioned conjugate gradient for A x = r, with
+        x starting at 0.  We use the flexible (Polak-Ribiere) form of
+        the update, since the cycle is not exactly a symmetric
+        preconditioner.  r is overwritten with the residual.
+        """
+
+        myg = self.soln_grid
+
+        z = myg.pooled_array(zero=False)
+        z_old = myg.pooled_array(zero=False)
+        p = myg.pooled_array(zero=False)
+        q = myg.pooled_array(zero=False)
+
+        self._precondition(r, z)
+        p[:,:] = z
+        rz = self._dot(r, z)
+
+        residual_error = self._residual_norm(r)
+        it = 0
+
+        while residual_error > rtol and it < self.max_cycles:
+            it += 1
+            self.current_cycle = it
+
+            self._apply_operator(p, q)
+
+            alpha = rz/self._dot(p, q)
+            x.v()[:,:] += alpha*p.v()
+            r.v()[:,:] -= alpha*q.v()
+
+            residual_error = self._residual_norm(r)
+            self.residual_history.append(residual_error)
+
+            if self.verbose:
+                print("PCG iteration {}: residual err = {}".format(it, residual_error))
+
+            if residual_error <= rtol:
+                break
+
+            z_old[:,:] = z
+            self._precondition(r, z)
+
+            rz_new = self._dot(r, z)
+            beta = (rz_new - self._dot(r, z_old))/rz
+            rz = rz_new
+
+            p.v()[:,:] = z.v() + beta*p.v()
+
+        self.num_cycles = it
+
+
+    def _bicgstab(self, r, x, rtol):
+        """
+        Right-preconditioned BiCGStab for A x = r, with x starting at
+        0, using a multigrid cycle as the preconditioner.  This does
+        not need A to be symmetric.  r is overwritten with the
+        residual.
+        """
+
+        myg = self.soln_grid
+
+        r_hat = myg.pooled_array(zero=False)
+        r_hat[:,:] = r
+
+        p = myg.pooled_array()
+        w = myg.pooled_array()
+        p_hat = myg.pooled_array(zero=False)
+        s_hat = myg.pooled_array(zero=False)
+        t = myg.pooled_array(zero=False)
+
+        rho = alpha = omega = 1.0
+
+        residual_error = self._residual_norm(r)
+        it = 0
+
+        while residual_error > rtol and it < self.max_cycles:
+            it += 1
+            self.current_cycle = it
+
+            rho_new = self._dot(r_hat, r)
+            beta = (rho_new/rho)*(alpha/omega)
+            rho = rho_new
+
+            p.v()[:,:] = r.v() + beta*(p.v() - omega*w.v())
+
+            self._precondition(p, p_hat)
+            self._apply_operator(p_hat, w)
+
+            alpha = rho/self._dot(r_hat, w)
+
+            # r now holds the intermediate residual, s
+            x.v()[:,:] += alpha*p_hat.v()
+            r.v()[:,:] -= alpha*w.v()
+
+            residual_error = self._residual_norm(r)
+
+            if residual_error > rtol:
+                self._precondition(r, s_hat)
+                self._apply_operator(s_hat, t)
+
+                omega = self._dot(t, r)/self._dot(t, t)
+
+                x.v()[:,:] += omega*s_hat.v()
+                r.v()[:,:] -= omega*t.v()
+
+                residual_error = self._residual_norm(r)
+
+            self.residual_history.append(residual_error)
+
+            if self.verbose:
+                print("BiCGStab iteration {}: residual err = {}".format(it, residual_error))
+
+        self.num_cycles = it
+
+
+    def _apply_operator(self, p, out):
+        """
+        put the elliptic operator applied to p, A p, into out on the
+        finest level.  We get this from the residual with f = 0, so
+        this uses the current BCs of v.
+        """
+
+        nf = self.nlevels-1
+        fp = self.grids[nf]
+
+        fp.get_var("v")[:,:] = p
+        fp.zero("f")
+        fp.fill_BC("v")
+
+        self._compute_residual(nf)
+        self._add_work(nf, 1)
+
+        out.v()[:,:] = -fp.get_var("r").v()
+
+
+    def _precondition(self, r, out):
+        """
+        apply the multigrid preconditioner to r, putting the result
+        into out -- this is a single cycle for A z = r on the finest
+        level, starting from z = 0
+        """
+
+        nf = self.nlevels-1
+        fp = self.grids[nf]
+
+        fp.get_var("f")[:,:] = r
+        fp.zero("v")
+
+        self._mg_cycle(nf, self.cycle_type)
+
+        out[:,:] = fp.get_var("v")
+
+
+    def _dot(self, a, b):
+        """ the dot product of a and b over the valid region """
+        return np.sum(a.v()*b.v())
+
+
+    def _residual_norm(self, r):
+        """ the norm of the residual r, relative to the source norm """
+        if self.source_norm != 0.0:
+            return r.norm()/self.source_norm
+        else:
+            return r.norm()
+
+
+    def _add_work(self, level, nsweeps):
+        """
+        account for nsweeps smoothing sweeps (or residual evaluations)
+        on level in the work units
+        """
+        g = self.grids[level].grid
+        self.work_units += nsweeps*(g.nx*g.ny)/float(self.nx*self.ny)
+
 
     def v_cycle(self, level):
         """
         Perform a V-cycle for a single 2-level solve.  This is applied
         recursively do V-cycle through the entire hierarchy.
 
+        """
+        self._mg_cycle(level, "V")
+
+
+    def fmg_cycle(self):
+        """
+        Perform a full multigrid cycle.  We compute the residual of
+        the current solution on the finest level and restrict it down
+        the hierarchy.  The residual (error) equation is solved on the
+        coarsest grid, and that solution is prolonged up to be the
+        initial guess for a cycle on the next finer level, and so on,
+        until we correct the solution on the finest level and do a
+        final cycle there.  Working on the error equation means any
+        initial guess and inhomogeneous boundary conditions are
+        handled, since the error has homogeneous BCs.
+
+        """
+
+        nf = self.nlevels-1
+        fp = self.grids[nf]
+
+        if nf == 0:
+            self._mg_cycle(nf, self.cycle_type)
+            return
+
+        # the residual on the finest level
+        fp.fill_BC("v")
+        self._compute_residual(nf)
+        self._add_work(nf, 1)
+
+        # restrict it through the hierarchy to be the RHS of the error
+        # equation on each coarse level
+        self.grids[nf-1].get_var("f").v()[:,:] = fp.restrict("r").v()
+
+        for level in range(nf-1, 0, -1):
+            f_coarse = self.grids[level-1].get_var("f")
+            f_coarse.v()[:,:] = self.grids[level].restrict("f").v()
+
+        # solve on the coarsest level
+        self.grids[0].zero("v")
+        self._mg_cycle(0, self.cycle_type)
+
+        # prolong the solution to be the initial guess on the next
+        # finer level and cycle there
+        for level in range(1, nf):
+            e = self.grids[level-1].prolong("v")
+
+            v = self.grids[level].get_var("v")
+            v.v()[:,:] = e.v()
+            self.grids[level].fill_BC("v")
+
+            self._mg_cycle(level, self.cycle_type)
+
+        # correct the solution on the finest level and do a final cycle
+        e = self.grids[nf-1].prolong("v")
+
+        v = fp.get_var("v")
+        v.v()[:,:] += e.v()
+        fp.fill_BC("v")
+
+        self._mg_cycle(nf, self.cycle_type)
+
+
+    def _mg_cycle(self, level, cycle_type):
+        """
+        Perform a multigrid cycle of the given type ('V', 'W', or
+        'F') starting at level.  This is applied recursively to cycle
+        through the entire hierarchy -- on each coarser level, a
+        V-cycle visits once, a W-cycle twice, and an F-cycle does an
+        F-cycle followed by a V-cycle.
+
         """
 
         if level > 0:
@@ -733,9 +1180,11 @@ class CellCenterMG2d(object):
 
             # smooth on the current level
             self.smooth(level, self.nsmooth)
+            self._add_work(level, self.nsmooth)
 
             # compute the residual
             self._compute_residual(level)
+            self._add_work(level, 1)
 
             if self.verbose:
                 print("  after G-S, residual L2: {}\n".format(fp.get_var("r").norm()))
@@ -744,8 +1193,17 @@ class CellCenterMG2d(object):
             f_coarse = cp.get_var("f")
             f_coarse.v()[:,:] = fp.restrict("r").v()
 
-            # solve the coarse problem
-            self.v_cycle(level-1)
+            # solve the coarse problem, starting from a zero correction
+            cp.zero("v")
+
+            if cycle_type == "V":
+                self._mg_cycle(level-1, "V")
+            elif cycle_type == "W":
+                self._mg_cycle(level-1, "W")
+                self._mg_cycle(level-1, "W")
+            elif cycle_type == "F":
+                self._mg_cycle(level-1, "F")
+                self._mg_cycle(level-1, "V")
 
             # ascending part
             self.current_level = level
@@ -770,16 +1228,16 @@ class CellCenterMG2d(object):
 
             # smooth
             self.smooth(level, self.nsmooth)
+            self._add_work(level, self.nsmooth)
 
             if self.verbose:
                 self._compute_residual(level)
                 print("  after G-S, residual L2: {}\n".format(fp.get_var("r").norm()))
 
         else:
-            # bottom solve: solve the discrete coarse problem.  We
-            # could use any number of different matrix solvers here
-            # (like CG), but since we are 2x2 by design at this point,
-            # we will just smooth
+            # bottom solve: solve the discrete coarse problem, either
+            # by just smoothing (fine if the bottom grid is tiny), or
+            # with a direct or CG solve
             if self.verbose: print("  bottom solve:")
 
             self.current_level = level
@@ -789,6 +1247,211 @@ class CellCenterMG2d(object):
                 self.grid_info(level, indent=2)
                 print("")
 
-            self.smooth(level, self.nsmooth_bottom)
+            if self.bottom_solver == "direct":
+                self._bottom_direct()
+            elif self.bottom_solver == "cg":
+                self._bottom_cg()
+            else:
+                self.smooth(level, self.nsmooth_bottom)
+                self._add_work(level, self.nsmooth_bottom)
+
+            bp.fill_BC("v")
+
+
+    def _bottom_matrix(self):
+        """
+        Return the sparse matrix of the elliptic operator on the
+        bottom level, acting on the valid cells (flattened).  We get
+        its coefficients by applying the residual to probe vectors, so
+        this works for any discretization (and any subclass) with at
+        most a 3x3 stencil.  Each probe is 1 in every sx-th cell in x
+        and sy-th cell in y, spaced so that no cell has two of them in
+        its stencil (wrapping around for periodic BCs), so only sx*sy
+        residuals are needed.  Since A p = R(0) - R(p), where R is
+        the residual with f = 0, any inhomogeneous BCs drop out.
+        """
+
+        bp = self.grids[0]
+        g = bp.grid
+
+        v = bp.get_var("v")
+        f = bp.get_var("f")
+        r = bp.get_var("r")
+
+        f_save = f.copy()
+        f[:,:] = 0.0
+
+        v[:,:] = 0.0
+        bp.fill_BC("v")
+        self._compute_residual(0)
+        r0 = r.v().copy()
+
+        def stride(n):
+            # the smallest spacing >= 3 that divides n, so the probes
+            # are also spaced right across a periodic boundary
+            if n < 3:
+                return n
+            return min(s for s in range(3, n+1) if n % s == 0)
+
+        sx = stride(g.nx)
+        sy = stride(g.ny)
+
+        Ap = np.zeros((sx, sy, g.nx, g.ny), dtype=np.float64)
+
+        for px in range(sx):
+            for py in range(sy):
+                v[:,:] = 0.0
+                v.v()[px::sx, py::sy] = 1.0
+                bp.fill_BC("v")
+                self._compute_residual(0)
+                Ap[px, py, :, :] = r0 - r.v()
+
+        f[:,:] = f_save
+        v[:,:] = 0.0
+
+        # cell (i, j) gets the coefficient of its neighbor (ii, jj)
+        # from the probe that has a 1 there
+        i, j = np.indices((g.nx, g.ny))
+
+        rows = []
+        cols = []
+        vals = []
+        for di in [-1, 0, 1]:
+            for dj in [-1, 0, 1]:
+                ii = (i + di) % g.nx
+                jj = (j + dj) % g.ny
+                rows.append(i*g.ny + j)
+                cols.append(ii*g.ny + jj)
+                vals.append(Ap[ii % sx, jj % sy, i, j])
+
+        rows = np.concatenate(rows, axis=None)
+        cols = np.concatenate(cols, axis=None)
+        vals = np.concatenate(vals, axis=None)
+
+        # on small grids, some neighbors are the same cell
+        n = g.nx*g.ny
+        _, first = np.unique(rows*n + cols, return_index=True)
+
+        A = sparse.csc_matrix((vals[first], (rows[first], cols[first])), shape=(n, n))
+        A.eliminate_zeros()
+
+        return A
+
+
+    def _bottom_factor(self):
+        """
+        Return the sparse LU factorization of the bottom operator,
+        for _bottom_solve.  If the operator is singular (periodic or
+        Neumann on all sides, with alpha = 0), its null space is the
+        constants, so we pin the first unknown to 0 instead of solving
+        its equation, and flag that the mean needs to be removed.
+        """
+
+        A = self._bottom_matrix()
+        n = A.shape[0]
+
+        scale = abs(A).max()
+        singular = n > 1 and abs(A.dot(np.ones(n))).max() <= 1.e-12*scale
+
+        if singular:
+            keep = np.ones(n)
+            keep[0] = 0.0
+            A = sparse.diags(keep).dot(A) + \
+                sparse.csc_matrix(([1.0], ([0], [0])), shape=(n, n))
+
+        lu = splinalg.splu(sparse.csc_matrix(A))
+
+        # the triangular solves cost about this many residuals
+        cost = max(1.0, (lu.L.nnz + lu.U.nnz)/float(A.nnz))
+
+        return lu, singular, cost
+
+
+    def _bottom_direct(self):
+        """
+        Solve the bottom level exactly.  We keep the sparse LU
+        factorization of the bottom operator, so it is only factored
+        again when the coefficients change.  Singular problems get
+        the solution with zero mean, like the minimum-norm one.
+        """
+
+        bp = self.grids[0]
+        g = bp.grid
+
+        if self._bottom_lu is None:
+            self._bottom_lu = self._bottom_factor()
+
+        lu, singular, cost = self._bottom_lu
+
+        # with v = 0, the residual is the RHS of the bottom problem
+        # (including any boundary terms)
+        v = bp.get_var("v")
+        v[:,:] = 0.0
+        bp.fill_BC("v")
+        self._compute_residual(0)
+
+        rhs = bp.get_var("r").v().flatten()
+        if singular:
+            rhs[0] = 0.0
+
+        x = lu.solve(rhs)
+        if singular:
+            x -= x.mean()
+
+        v.v()[:,:] = x.reshape(g.nx, g.ny)
+
+        self._add_work(0, cost)
+
+
+    def _bottom_cg(self, rtol=1.e-12):
+        """
+        Solve the bottom level with (unpreconditioned) conjugate
+        gradient, starting from the current v.  This assumes the
+        operator is symmetric.  We apply the operator as
+        A p = R(0) - R(p), where R is the residual, so any
+        inhomogeneous BCs drop out.
+        """
+
+        bp = self.grids[0]
+        g = bp.grid
+
+        v = bp.get_var("v")
+        r = bp.get_var("r")
+
+        x = v.v().copy()
+
+        v[:,:] = 0.0
+        bp.fill_BC("v")
+        self._compute_residual(0)
+        r0 = r.v().copy()
+
+        v.v()[:,:] = x
+        bp.fill_BC("v")
+        self._compute_residual(0)
+        res = r.v().copy()
 
+        tol = rtol*np.sqrt(np.sum(r0**2))
+
+        p = res.copy()
+        rr = np.sum(res**2)
+
+        for _ in range(g.nx*g.ny):
+            if np.sqrt(rr) <= tol:
+                break
+
+            v.v()[:,:] = p
             bp.fill_BC("v")
+            self._compute_residual(0)
+            self._add_work(0, 1)
+
+            Ap = r0 - r.v()
+
+            alpha = rr/np.sum(p*Ap)
+            x += alpha*p
+            res -= alpha*Ap
+
+            rr_new = np.sum(res**2)
+            p = res + (rr_new/rr)*p
+            rr = rr_new
+
+        v.v()[:,:] = x
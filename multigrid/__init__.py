@@ -15,8 +15,15 @@ general_MG implements a more general elliptic equation:
   alpha phi + div { beta grad phi } + gamma . grad phi = f
 
 
-All use pure V-cycles to solve elliptic problems
+All use V-cycles by default to solve elliptic problems -- W- and
+F-cycles, and a full multigrid (FMG) first cycle, can be selected
+with the cycle_type and fmg options.  The krylov option instead uses
+the cycles to precondition conjugate gradient ("cg") or BiCGStab
+("bicgstab").
+
+fft_solver solves the same constant-coefficient Helmholtz equation as
+MG directly with FFTs, for doubly periodic domains only.
 
 """
 
-__all__ = ['MG', 'variable_coeff_MG', 'general_MG', 'edge_coeffs.py']
+__all__ = ['MG', 'variable_coeff_MG', 'general_MG', 'fft_solver', 'edge_coeffs.py']
@@ -0,0 +1,359 @@
+"""
+A direct solver for the constant-coefficient Helmholtz equation
+
+(alpha - beta L) phi = f
+
+on a doubly periodic domain, using FFTs.  L is the same 5-point
+discrete Laplacian used by the multigrid solver in MG.py, so the
+solution satisfies the same discrete equations that the multigrid
+solver converges to, but it is found exactly (to roundoff) in a
+single O(N log N) step.
+
+The interface mirrors CellCenterMG2d, so this can be used as a drop-in
+replacement for it when all boundaries are periodic:
+
+> a = fft_solver.CellCenterFFT2d(nx, ny, alpha=alpha, beta=beta)
+> a.init_RHS(f)
+> a.solve()
+> v = a.get_solution()
+
+Unlike the multigrid solver, nx and ny do not need to be equal or a
+power of 2.  For a Poisson problem (alpha = 0), the solution is only
+defined up to a constant -- we return the solution with zero mean, and
+the mean of the RHS (which must vanish for a solution to exist) is
+ignored.
+"""
+
+from __future__ import print_function
+
+import numpy as np
+
+import mesh.boundary as bnd
+import mesh.patch as patch
+
+
+class CellCenterFFT2d(object):
+    """
+    An FFT-based solver for cell-centered data on a doubly periodic
+    domain, with the same interface as MG.CellCenterMG2d
+    """
+
+    def __init__(self, nx, ny, ng=1,
+                 xmin=0.0, xmax=1.0, ymin=0.0, ymax=1.0,
+                 xl_BC_type="periodic", xr_BC_type="periodic",
+                 yl_BC_type="periodic", yr_BC_type="periodic",
+                 alpha=0.0, beta=-1.0,
+                 verbose=0):
+        """
+        Create the CellCenterFFT2d object.
+
+        Parameters
+        ----------
+        nx : int
+            number of cells in x-direction
+        ny : int
+            number of cells in y-direction.
+        ng : int, optional
+            number of ghost cells on the solution grid
+        xmin : float, optional
+            minimum physical coordinate in x-direction
+        xmax : float, optional
+            maximum physical coordinate in x-direction
+        ymin : float, optional
+            minimum physical coordinate in y-direction
+        ymax : float, optional
+            maximum physical coordinate in y-direction
+        xl_BC_type, xr_BC_type, yl_BC_type, yr_BC_type : str, optional
+            boundary conditions -- these are accepted for compatibility
+            with CellCenterMG2d, but must all be 'periodic'
+        alpha : float, optional
+            coefficient in Helmholtz equation (alpha - beta L) phi = f
+        beta : float, optional
+            coefficient in Helmholtz equation (alpha - beta L) phi = f
+        verbose : int, optional
+            increase verbosity during the solve (for verbose=1)
+
+        Returns
+        -------
+        out: CellCenterFFT2d object
+
+        """
+
+        for b in [xl_BC_type, xr_BC_type, yl_BC_type, yr_BC_type]:
+            if b != "periodic":
+                raise ValueError("ERROR: the FFT solver requires periodic BCs")
+
+        self.nx = nx
+        self.ny = ny
+
+        self.ng = ng
+
+        self.xmin = xmin
+        self.xmax = xmax
+
+        self.ymin = ymin
+        self.ymax = ymax
+
+        self.alpha = alpha
+        self.beta = beta
+
+        self.verbose = verbose
+
+        # keep track of whether we've initialized the RHS
+        self.initialized_rhs = 0
+
+        my_grid = patch.Grid2d(nx, ny, ng=ng,
+                               xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax)
+
+        bc = bnd.BC(xlb="periodic", xrb="periodic",
+                    ylb="periodic", yrb="periodic")
+
+        self.soln_data = patch.CellCenterData2d(my_grid, dtype=np.float64)
+        self.soln_data.register_var("v", bc)
+        self.soln_data.register_var("f", bc)
+        self.soln_data.register_var("r", bc)
+        self.soln_data.create()
+
+        # provide coordinate and indexing information for the solution mesh
+        soln_grid = my_grid
+
+        self.ilo = soln_grid.ilo
+        self.ihi = soln_grid.ihi
+        self.jlo = soln_grid.jlo
+        self.jhi = soln_grid.jhi
+
+        self.x = soln_grid.x
+        self.dx = soln_grid.dx
+        self.x2d = soln_grid.x2d
+
+        self.y = soln_grid.y
+        self.dy = soln_grid.dy
+        self.y2d = soln_grid.y2d
+
+        self.soln_grid = soln_grid
+
+        # the eigenvalues of the discrete 5-point Laplacian for each
+        # of the modes in the real FFT -- these only depend on the grid
+        kx = np.fft.fftfreq(nx)
+        ky = np.fft.rfftfreq(ny)
+
+        lx = (2.0*np.cos(2.0*np.pi*kx) - 2.0)/self.dx**2
+        ly = (2.0*np.cos(2.0*np.pi*ky) - 2.0)/self.dy**2
+
+        self.lap_eigen = lx[:,np.newaxis] + ly[np.newaxis,:]
+
+        # store the source norm
+        self.source_norm = 0.0
+
+        # after solving, keep track of the residual error (normalized
+        # to the source norm).  There is no iteration, so we always
+        # report a single cycle
+        self.num_cycles = 0
+        self.residual_error = 1.e33
+        self.relative_error = 1.e33
+
+
+    def set_alpha_beta(self, alpha, beta):
+        """
+        Reset the coefficients of the Helmholtz equation
+        (alpha - beta L) phi = f.
+
+        Parameters
+        ----------
+        alpha : float
+            coefficient in Helmholtz equation (alpha - beta L) phi = f
+        beta : float
+            coefficient in Helmholtz equation (alpha - beta L) phi = f
+
+        """
+        self.alpha = alpha
+        self.beta = beta
+
+
+    def get_solution(self, grid=None):
+        """
+        Return the solution after doing the solve
+
+        If a grid object is passed in, then the solution is put on that
+        grid -- not the passed in grid must have the same dx and dy
+
+        Returns
+        -------
+        out : ndarray
+
+        """
+
+        v = self.soln_data.get_var("v")
+
+        if grid is None:
+            return v.copy()
+        else:
+            myg = self.soln_grid
+            assert grid.dx == myg.dx and grid.dy == myg.dy
+
+            sol = grid.scratch_array()
+            sol.v(buf=1)[:,:] = v.v(buf=1)
+            return sol
+
+
+    def get_solution_gradient(self, grid=None):
+        """
+        Return the gradient of the solution after doing the solve.  The
+        x- and y-components are returned in separate arrays.
+
+        If a grid object is passed in, then the gradient is computed on that
+        grid.  Note: the passed-in grid must have the same dx, dy
+
+        Returns
+        -------
+        out : ndarray, ndarray
+
+        """
+
+        myg = self.soln_grid
+
+        if grid is None:
+            og = self.soln_grid
+        else:
+            og = grid
+            assert og.dx == myg.dx and og.dy == myg.dy
+
+        v = self.soln_data.get_var("v")
+
+        gx = og.scratch_array()
+        gy = og.scratch_array()
+
+        gx.v()[:,:] = 0.5*(v.ip(1) - v.ip(-1))/myg.dx
+        gy.v()[:,:] = 0.5*(v.jp(1) - v.jp(-1))/myg.dy
+
+        return gx, gy
+
+
+    def get_solution_object(self):
+        """
+        Return the full solution data object after doing the solve
+
+        Returns
+        -------
+        out : CellCenterData2d object
+
+        """
+        return self.soln_data
+
+
+    def init_solution(self, data):
+        """
+        Initialize the solution.  The solve is direct, so an initial
+        guess is not needed -- this is provided for compatibility
+        with CellCenterMG2d.
+
+        Parameters
+        ----------
+        data : ndarray
+            An array (of the same size as the solution grid) with the
+            values to initialize the solution to.
+
+        """
+        v = self.soln_data.get_var("v")
+        v[:,:] = data.copy()
+
+
+    def init_zeros(self):
+        """
+        Set the initial solution to zero
+        """
+        v = self.soln_data.get_var("v")
+        v[:,:] = 0.0
+
+
+    def init_RHS(self, data):
+        """
+        Initialize the right hand side, f, of the Helmholtz equation
+        (alpha - beta L) phi = f
+
+        Parameters
+        ----------
+        data : ndarray
+            An array (of the same size as the solution grid) with the
+            values of the RHS.
+
+        """
+
+        f = self.soln_data.get_var("f")
+        f[:,:] = data.copy()
+
+        # store the source norm
+        self.source_norm = f.norm()
+
+        if self.verbose:
+            print("Source norm = ", self.source_norm)
+
+        self.initialized_rhs = 1
+
+
+    def _compute_residual(self):
+        """ compute the residual and store it in the r variable"""
+
+        v = self.soln_data.get_var("v")
+        f = self.soln_data.get_var("f")
+        r = self.soln_data.get_var("r")
+
+        myg = self.soln_grid
+
+        # r = f - alpha phi + beta L phi
+        r.v()[:,:] = f.v() - self.alpha*v.v() + \
+            self.beta*( (v.ip(-1) + v.ip(1) - 2*v.v())/myg.dx**2 +
+                        (v.jp(-1) + v.jp(1) - 2*v.v())/myg.dy**2)
+
+
+    def solve(self, rtol=1.e-11):
+        """
+        Solve the Helmholtz equation by transforming the RHS,
+        dividing by the eigenvalues of (alpha - beta L), and
+        transforming back.
+
+        Parameters
+        ----------
+        rtol : float
+            Not used -- the solve is direct.  This is accepted for
+            compatibility with CellCenterMG2d.  The residual error is
+            still computed and stored as residual_error.
+
+        """
+
+        if not self.initialized_rhs:
+            raise ValueError("ERROR: RHS not initialized")
+
+        f = self.soln_data.get_var("f")
+
+        f_hat = np.fft.rfft2(f.v())
+
+        denom = self.alpha - self.beta*self.lap_eigen
+
+        # the constant mode is singular for the Poisson equation -- we
+        # pick the zero-mean solution
+        singular = denom == 0.0
+        denom[singular] = 1.0
+
+        v_hat = f_hat/denom
+        v_hat[singular] = 0.0
+
+        v = self.soln_data.get_var("v")
+        v.v()[:,:] = np.fft.irfft2(v_hat, s=(self.nx, self.ny))
+
+        self.soln_data.fill_BC("v")
+
+        # compute the residual error, relative to the source norm
+        self._compute_residual()
+        r = self.soln_data.get_var("r")
+
+        if self.source_norm != 0.0:
+            self.residual_error = r.norm()/self.source_norm
+        else:
+            self.residual_error = r.norm()
+
+        self.relative_error = 0.0
+        self.num_cycles = 1
+
+        if self.verbose:
+            print("FFT solve: residual err = {}\n".format(self.residual_error))
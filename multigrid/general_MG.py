@@ -45,6 +45,8 @@ class GeneralMG2d(MG.CellCenterMG2d):
                  xl_BC=None, xr_BC=None,
                  yl_BC=None, yr_BC=None,
                  nsmooth=10, nsmooth_bottom=50,
+                 cycle_type="V", fmg=False, krylov=None,
+                 coarse_size=2, bottom_solver="smooth",
                  verbose=0,
                  coeffs=None,
                  true_function=None, vis=0, vis_title=""):
@@ -66,6 +68,8 @@ class GeneralMG2d(MG.CellCenterMG2d):
                                    yl_BC=yl_BC, yr_BC=yr_BC,
                                    alpha=0.0, beta=0.0,
                                    nsmooth=nsmooth, nsmooth_bottom=nsmooth_bottom,
+                                   cycle_type=cycle_type, fmg=fmg, krylov=krylov,
+                                   coarse_size=coarse_size, bottom_solver=bottom_solver,
                                    verbose=verbose,
                                    aux_field=["alpha", "beta", "gamma_x", "gamma_y"],
                                    aux_bc=[coeffs.BCs["alpha"], coeffs.BCs["beta"],
@@ -74,10 +78,31 @@ class GeneralMG2d(MG.CellCenterMG2d):
                                    vis_title=vis_title)
 
 
-        # the coefficents come in a dictionary.  Set the coefficients
-        # and restrict them down the hierarchy we only need to do this
-        # once.  We need to hold the original coeffs in our grid so we
-        # can do a ghost cell fill.
+        self.set_coeffs(coeffs)
+
+
+    def set_coeffs(self, coeffs):
+        """
+        Set the coefficients alpha, beta, gamma_x, and gamma_y and
+        restrict them down the hierarchy.  This is done once when the
+        object is created, but can be called again to reuse the same
+        multigrid object (and its level hierarchy) for a new set of
+        coefficients.
+
+        Parameters
+        ----------
+        coeffs : CellCenterData2d object
+            The coefficients, with fields alpha, beta, gamma_x, and
+            gamma_y defined on the finest MG level
+
+        """
+
+        # the bottom operator changes with the coefficients
+        self._bottom_lu = None
+
+        # Set the coefficients and restrict them down the hierarchy.
+        # We need to hold the original coeffs in our grid so we can do
+        # a ghost cell fill.
         for c in ["alpha", "beta", "gamma_x", "gamma_y"]:
             v = self.grids[self.nlevels-1].get_var(c)
             v.v()[:,:] = coeffs.get_var(c).v()
@@ -96,15 +121,25 @@ class GeneralMG2d(MG.CellCenterMG2d):
                 n -= 1
 
 
-        # put the beta coefficients on edges
+        # put the beta coefficients on edges -- if we already have
+        # them, we update them in place
         beta = self.grids[self.nlevels-1].get_var("beta")
-        self.beta_edge.insert(0, ec.EdgeCoeffs(self.grids[self.nlevels-1].grid, beta))
 
-        n = self.nlevels-2
-        while n >= 0:
-            self.beta_edge.insert(0, self.beta_edge[0].restrict())
-            n -= 1
+        if len(self.beta_edge) == self.nlevels:
+            self.beta_edge[self.nlevels-1].set_coeffs(beta)
+
+            n = self.nlevels-2
+            while n >= 0:
+                self.beta_edge[n+1].restrict(out=self.beta_edge[n])
+                n -= 1
 
+        else:
+            self.beta_edge = [ec.EdgeCoeffs(self.grids[self.nlevels-1].grid, beta)]
+
+            n = self.nlevels-2
+            while n >= 0:
+                self.beta_edge.insert(0, self.beta_edge[0].restrict())
+                n -= 1
 
 
     def smooth(self, level, nsmooth):
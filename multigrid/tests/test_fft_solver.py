@@ -0,0 +1,67 @@
+# unit tests
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import multigrid.MG as MG
+import multigrid.fft_solver as fft_solver
+
+
+def test_fft_nonperiodic_raises():
+    # only periodic BCs are supported
+    try:
+        fft_solver.CellCenterFFT2d(8, 8, xl_BC_type="dirichlet")
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_fft_vs_mg():
+    # the FFT solver should give the same solution as multigrid for
+    # the same discrete Helmholtz problem
+    nx = ny = 32
+    alpha, beta = 1.0, 0.01
+
+    kw = dict(xl_BC_type="periodic", xr_BC_type="periodic",
+              yl_BC_type="periodic", yr_BC_type="periodic",
+              alpha=alpha, beta=beta)
+
+    a = fft_solver.CellCenterFFT2d(nx, ny, **kw)
+    b = MG.CellCenterMG2d(nx, ny, **kw)
+
+    f = a.soln_grid.scratch_array()
+    f[:,:] = np.sin(2*np.pi*a.x2d)*np.cos(4*np.pi*a.y2d) + \
+        0.2*np.cos(6*np.pi*a.x2d)
+
+    for s in [a, b]:
+        s.init_RHS(f)
+        s.init_zeros()
+        s.solve(rtol=1.e-12)
+
+    assert a.residual_error < 1.e-12
+
+    sa = a.get_solution()
+    sb = b.get_solution()
+    assert_allclose(sa.v(), sb.v(), rtol=0, atol=1.e-10)
+
+    ga = a.get_solution_gradient()
+    gb = b.get_solution_gradient()
+    for x, y in zip(ga, gb):
+        assert_allclose(x.v(), y.v(), rtol=0, atol=1.e-9)
+
+
+def test_fft_poisson():
+    # Poisson on a non-square, non-power-of-2 grid -- the solution is
+    # the zero-mean one
+    nx, ny = 24, 40
+    a = fft_solver.CellCenterFFT2d(nx, ny, xmax=1.0, ymax=2.0)
+
+    f = a.soln_grid.scratch_array()
+    f[:,:] = np.sin(2*np.pi*a.x2d)*np.sin(np.pi*a.y2d)
+
+    a.init_RHS(f)
+    a.solve()
+
+    assert a.residual_error < 1.e-12
+    assert abs(a.get_solution().v().mean()) < 1.e-14
@@ -56,3 +56,245 @@ def test_mg_gradient():
     assert_array_equal(gy[gx.g.ic,:],
                        np.array([0., 36., 60., 36., 12., -12., -36., -60., -36., 0.]))
 
+
+# a reused multigrid object, with its coefficients reset, should give
+# exactly the same solution as a freshly created one
+def test_vc_mg_reuse():
+    import mesh.boundary as bnd
+    import multigrid.variable_coeff_MG as vcMG
+
+    nx = ny = 16
+    g = patch.Grid2d(nx, ny, ng=1)
+    bc = bnd.BC(xlb="periodic", xrb="periodic", ylb="periodic", yrb="periodic")
+
+    def coeffs(k):
+        c = g.scratch_array()
+        c[:,:] = 2.0 + np.sin(k*2*np.pi*g.x2d)*np.cos(2*np.pi*g.y2d)
+        return c
+
+    f = g.scratch_array()
+    f[:,:] = np.sin(2*np.pi*g.x2d)*np.sin(4*np.pi*g.y2d)
+
+    def make(c):
+        return vcMG.VarCoeffCCMG2d(nx, ny,
+                                   xl_BC_type="periodic", xr_BC_type="periodic",
+                                   yl_BC_type="periodic", yr_BC_type="periodic",
+                                   coeffs=c, coeffs_bc=bc)
+
+    a = make(coeffs(1))
+    a.init_RHS(f)
+    a.solve(rtol=1.e-10)
+
+    a.set_coeffs(coeffs(2))
+    a.init_RHS(f)
+    a.init_zeros()
+    a.solve(rtol=1.e-10)
+
+    b = make(coeffs(2))
+    b.init_RHS(f)
+    b.solve(rtol=1.e-10)
+
+    assert a.num_cycles == b.num_cycles
+    assert_array_equal(a.get_solution(), b.get_solution())
+    for ea, eb in zip(a.edge_coeffs, b.edge_coeffs):
+        assert_array_equal(ea.x, eb.x)
+        assert_array_equal(ea.y, eb.y)
+
+
+# a full multigrid cycle should get to the discretization error in a
+# single cycle, and all the cycle types should converge to the same
+# answer
+def test_mg_cycles():
+    nx = ny = 16
+
+    def true(x, y):
+        return (x**2 - x**4)*(y**4 - y**2)
+
+    def f(x, y):
+        return -2.0*((1.0-6.0*x**2)*y**2*(1.0-y**2) +
+                     (1.0-6.0*y**2)*x**2*(1.0-x**2))
+
+    errs = {}
+    for cycle_type in ["V", "W", "F"]:
+        for fmg in [False, True]:
+            a = MG.CellCenterMG2d(nx, ny, cycle_type=cycle_type, fmg=fmg)
+            a.init_zeros()
+            a.init_RHS(f(a.x2d, a.y2d))
+            a.solve(rtol=1.e-11)
+
+            assert a.residual_error <= 1.e-11
+            assert a.work_units > 0.0
+
+            e = a.get_solution() - true(a.x2d, a.y2d)
+            errs[cycle_type, fmg] = a.soln_grid.norm(e)
+
+    # converged solutions agree
+    for k in errs:
+        assert abs(errs[k] - errs["V", False]) < 1.e-10
+
+    # a single FMG cycle
+    a = MG.CellCenterMG2d(nx, ny, fmg=True)
+    a.max_cycles = 1
+    a.init_zeros()
+    a.init_RHS(f(a.x2d, a.y2d))
+    a.solve(rtol=1.e-11)
+
+    e = a.get_solution() - true(a.x2d, a.y2d)
+    assert a.num_cycles == 1
+    assert a.soln_grid.norm(e) < 1.1*errs["V", False]
+
+
+# the Krylov solvers, preconditioned by the multigrid cycles, should
+# converge to the same solution as the plain cycles, in fewer
+# iterations for a high-contrast coefficient
+def test_vc_mg_krylov():
+    import mesh.boundary as bnd
+    import multigrid.variable_coeff_MG as vcMG
+
+    nx = ny = 32
+    g = patch.Grid2d(nx, ny, ng=1)
+    bc = bnd.BC(xlb="periodic", xrb="periodic", ylb="neumann", yrb="neumann")
+
+    c = g.scratch_array()
+    r2 = (g.x2d - 0.5)**2 + (g.y2d - 0.4)**2
+    c[:,:] = np.where(r2 < 0.1**2, 1.e4, 1.0)
+
+    f = g.scratch_array()
+    f[:,:] = np.sin(2*np.pi*g.x2d)*np.cos(np.pi*g.y2d)
+
+    soln = {}
+    ncycles = {}
+    for krylov in [None, "cg", "bicgstab"]:
+        a = vcMG.VarCoeffCCMG2d(nx, ny,
+                                xl_BC_type="periodic", xr_BC_type="periodic",
+                                yl_BC_type="neumann", yr_BC_type="neumann",
+                                coeffs=c, coeffs_bc=bc, krylov=krylov)
+        a.init_zeros()
+        a.init_RHS(f)
+        a.solve(rtol=1.e-10)
+
+        assert a.residual_error < 1.e-10
+        assert len(a.residual_history) == a.num_cycles
+
+        soln[krylov] = a.get_solution()
+        ncycles[krylov] = a.num_cycles
+
+    for krylov in ["cg", "bicgstab"]:
+        assert ncycles[krylov] < ncycles[None]
+        assert np.abs(soln[krylov] - soln[None]).v().max() < 1.e-8
+
+
+# BiCGStab handles the non-symmetric operator of the general solver,
+# including inhomogeneous BCs
+def test_general_mg_bicgstab():
+    import mesh.boundary as bnd
+    import multigrid.general_MG as gMG
+
+    nx = ny = 32
+    g = patch.Grid2d(nx, ny, ng=1)
+    d = patch.CellCenterData2d(g)
+    bc_c = bnd.BC(xlb="neumann", xrb="neumann", ylb="neumann", yrb="neumann")
+    for v in ["alpha", "beta", "gamma_x", "gamma_y"]:
+        d.register_var(v, bc_c)
+    d.create()
+
+    d.get_var("alpha")[:,:] = 10.0
+    d.get_var("beta")[:,:] = g.x2d*g.y2d + 1.0
+    d.get_var("gamma_x")[:,:] = 1.0
+    d.get_var("gamma_y")[:,:] = 1.0
+
+    f = np.sin(np.pi*g.x2d)*np.sin(np.pi*g.y2d)
+
+    def xl_func(y):
+        return np.cos(np.pi*y/2.0)
+
+    soln = {}
+    for krylov in [None, "bicgstab"]:
+        a = gMG.GeneralMG2d(nx, ny, xl_BC=xl_func, coeffs=d, krylov=krylov)
+        a.init_zeros()
+        a.init_RHS(f)
+        a.solve(rtol=1.e-10)
+
+        assert a.residual_error < 1.e-10
+        soln[krylov] = a.get_solution()
+
+    assert np.abs(soln["bicgstab"] - soln[None]).v().max() < 1.e-8
+
+
+# rectangular, non-power-of-2 grids coarsen down to a small (possibly
+# odd) bottom grid, which is solved with the direct or CG bottom solver
+def test_mg_rectangular():
+    import pytest
+
+    nx, ny = 48, 80
+    xmax = 0.6
+
+    def true(x, y):
+        return (x**2 - x**4/xmax**2)*(y**4 - y**2)
+
+    def f(x, y):
+        return (2.0 - 12.0*x**2/xmax**2)*(y**4 - y**2) + \
+            (x**2 - x**4/xmax**2)*(12.0*y**2 - 2.0)
+
+    # this coarsens down to 3 x 5, which we cannot smooth
+    with pytest.raises(ValueError):
+        MG.CellCenterMG2d(nx, ny, xmax=xmax)
+
+    soln = {}
+    for bottom_solver in ["direct", "cg"]:
+        a = MG.CellCenterMG2d(nx, ny, xmax=xmax,
+                              xl_BC_type="neumann", yl_BC_type="neumann",
+                              bottom_solver=bottom_solver)
+
+        assert a.nlevels == 5
+        assert (a.grids[0].grid.nx, a.grids[0].grid.ny) == (3, 5)
+
+        a.init_zeros()
+        a.init_RHS(f(a.x2d, a.y2d))
+        a.solve(rtol=1.e-11)
+
+        assert a.residual_error < 1.e-11
+
+        e = a.get_solution() - true(a.x2d, a.y2d)
+        assert a.soln_grid.norm(e) < 2.e-5
+
+        soln[bottom_solver] = a.get_solution()
+
+    assert np.abs(soln["direct"] - soln["cg"]).v().max() < 1.e-10
+
+    # a larger coarse size stops the hierarchy earlier
+    a = MG.CellCenterMG2d(nx, ny, xmax=xmax, coarse_size=6, bottom_solver="direct")
+    assert (a.grids[0].grid.nx, a.grids[0].grid.ny) == (6, 10)
+
+
+# the direct bottom solver on a large, singular (periodic) bottom grid
+def test_mg_direct_periodic():
+
+    nx = ny = 80
+
+    def true(x, y):
+        return np.sin(2.0*np.pi*x)*np.sin(2.0*np.pi*y)
+
+    def f(x, y):
+        return -8.0*np.pi**2*true(x, y)
+
+    a = MG.CellCenterMG2d(nx, ny,
+                          xl_BC_type="periodic", xr_BC_type="periodic",
+                          yl_BC_type="periodic", yr_BC_type="periodic",
+                          coarse_size=20, bottom_solver="direct")
+
+    assert (a.grids[0].grid.nx, a.grids[0].grid.ny) == (20, 20)
+
+    # the bottom matrix is sparse, with the 5-point stencil
+    A = a._bottom_matrix()
+    assert A.nnz == 5*20*20
+    assert np.abs(A.dot(np.ones(20*20))).max() < 1.e-10
+
+    a.init_zeros()
+    a.init_RHS(f(a.x2d, a.y2d))
+    a.solve(rtol=1.e-11)
+
+    assert a.residual_error < 1.e-11
+
+    e = a.get_solution() - true(a.x2d, a.y2d)
+    assert a.soln_grid.norm(e - e.v().mean()) < 1.e-3
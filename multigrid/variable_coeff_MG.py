@@ -36,6 +36,8 @@ class VarCoeffCCMG2d(MG.CellCenterMG2d):
                  xl_BC_type="dirichlet", xr_BC_type="dirichlet",
                  yl_BC_type="dirichlet", yr_BC_type="dirichlet",
                  nsmooth=10, nsmooth_bottom=50,
+                 cycle_type="V", fmg=False, krylov=None,
+                 coarse_size=2, bottom_solver="smooth",
                  verbose=0,
                  coeffs=None, coeffs_bc=None,
                  true_function=None, vis=0, vis_title=""):
@@ -51,26 +53,54 @@ class VarCoeffCCMG2d(MG.CellCenterMG2d):
                                    yl_BC_type=yl_BC_type, yr_BC_type=yr_BC_type,
                                    alpha=0.0, beta=0.0,
                                    nsmooth=nsmooth, nsmooth_bottom=nsmooth_bottom,
+                                   cycle_type=cycle_type, fmg=fmg, krylov=krylov,
+                                   coarse_size=coarse_size, bottom_solver=bottom_solver,
                                    verbose=verbose,
                                    aux_field=["coeffs"], aux_bc=[coeffs_bc],
                                    true_function=true_function, vis=vis,
                                    vis_title=vis_title)
 
 
-        # set the coefficients and restrict them down the hierarchy
-        # we only need to do this once.  We need to hold the original
-        # coeffs in our grid so we can do a ghost cell fill.
+        self.set_coeffs(coeffs)
+
+
+    def set_coeffs(self, coeffs):
+        """
+        Set the coefficients, eta, and restrict them down the
+        hierarchy.  This is done once when the object is created, but
+        can be called again to reuse the same multigrid object (and
+        its level hierarchy) for a new set of coefficients.
+
+        Parameters
+        ----------
+        coeffs : ndarray
+            An array (of the same size as the finest MG level) with the
+            cell-centered coefficients
+
+        """
+
+        # We need to hold the original coeffs in our grid so we can do
+        # a ghost cell fill.
         c = self.grids[self.nlevels-1].get_var("coeffs")
 
-        if c.g.nx != nx or c.g.ny != ny:
+        if coeffs.g.nx != self.nx or coeffs.g.ny != self.ny:
             raise IndexError("coefficient array not the same size as multigrid problem")
 
         c.v()[:,:] = coeffs.v().copy()
 
+        # the bottom operator changes with the coefficients
+        self._bottom_lu = None
+
         self.grids[self.nlevels-1].fill_BC("coeffs")
 
-        # put the coefficients on edges
-        self.edge_coeffs.insert(0, ec.EdgeCoeffs(self.grids[self.nlevels-1].grid, c))
+        # put the coefficients on edges -- if we already have the edge
+        # coefficients, we update them in place
+        reuse = len(self.edge_coeffs) == self.nlevels
+
+        if reuse:
+            self.edge_coeffs[self.nlevels-1].set_coeffs(c)
+        else:
+            self.edge_coeffs = [ec.EdgeCoeffs(self.grids[self.nlevels-1].grid, c)]
 
         n = self.nlevels-2
         while n >= 0:
@@ -86,7 +116,10 @@ class VarCoeffCCMG2d(MG.CellCenterMG2d):
             self.grids[n].fill_BC("coeffs")
 
             # put the coefficients on edges
-            self.edge_coeffs.insert(0, self.edge_coeffs[0].restrict())  #_EdgeCoeffs(self.grids[n].grid, coeffs_c))
+            if reuse:
+                self.edge_coeffs[n+1].restrict(out=self.edge_coeffs[n])
+            else:
+                self.edge_coeffs.insert(0, self.edge_coeffs[0].restrict())
 
             # if we are periodic, then we should force the edge coefficents
             # to be periodic
@@ -101,7 +134,6 @@ class VarCoeffCCMG2d(MG.CellCenterMG2d):
             n -= 1
 
 
-
     def smooth(self, level, nsmooth):
         """
         Use red-black Gauss-Seidel iterations to smooth the solution
@@ -5,16 +5,23 @@ from __future__ import print_function
 import argparse
 import importlib
 import os
+import signal
+import sys
 
 import matplotlib.pyplot as plt
 
 import compare
 from util import msg, profile, runparams, io
 
+# what doit returns, and the exit status, for a run stopped by SIGTERM
+# (the shell's convention for a process killed by the signal)
+TERMINATED = 128 + signal.SIGTERM
+
 
 def doit(solver_name, problem_name, param_file,
          other_commands=None,
-         comp_bench=False, reset_bench_on_fail=False, make_bench=False):
+         comp_bench=False, reset_bench_on_fail=False, make_bench=False,
+         restart=None):
 
     msg.bold('pyro ...')
 
@@ -64,8 +71,13 @@ def doit(solver_name, problem_name, param_file,
     # are running
     sim = solver.Simulation(solver_name, problem_name, rp, timers=tc)
 
-    sim.initialize()
-    sim.preevolve()
+    # or pick up where a checkpoint left off
+    if restart is None:
+        sim.initialize()
+        sim.preevolve()
+    else:
+        msg.warning("restarting from: {}".format(restart))
+        sim.restart(restart)
 
 
     #-------------------------------------------------------------------------
@@ -75,11 +87,23 @@ def doit(solver_name, problem_name, param_file,
 
     plt.ion()
 
-    sim.cc_data.t = 0.0
+    if restart is None:
+        sim.cc_data.t = 0.0
+
+    # with mesh.npx x mesh.npy > 1, the mesh is split into subdomains
+    # evolved by worker processes
+    sim = sim.decompose()
 
     # output the 0th data
     basename = rp.get_param("io.basename")
-    sim.write("{}{:04d}".format(basename, sim.n))
+    if restart is None:
+        sim.write("{}{:04d}".format(basename, sim.n))
+
+    # a SIGTERM (e.g. from a batch queue) stops the run after the
+    # current step, with a checkpoint
+    terminated = []
+    sigterm_handler = signal.signal(signal.SIGTERM,
+                                    lambda signum, frame: terminated.append(signum))
 
     dovis = rp.get_param("vis.dovis")
     if dovis:
@@ -105,6 +129,16 @@ def doit(solver_name, problem_name, param_file,
             basename = rp.get_param("io.basename")
             sim.write("{}{:04d}".format(basename, sim.n))
 
+        # checkpoint
+        if terminated or sim.do_checkpoint():
+            if verbose > 0: msg.warning("checkpointing...")
+            basename = rp.get_param("io.basename")
+            sim.checkpoint("{}chk{:04d}".format(basename, sim.n))
+
+        if terminated:
+            msg.warning("SIGTERM received, stopping")
+            break
+
         # visualization
         if dovis:
             tm_vis = tc.timer("vis")
@@ -121,13 +155,15 @@ def doit(solver_name, problem_name, param_file,
 
     tm_main.end()
 
+    signal.signal(signal.SIGTERM, sigterm_handler)
+
 
     #-------------------------------------------------------------------------
     # benchmarks (for regression testing)
     #-------------------------------------------------------------------------
     result = 0
     # are we comparing to a benchmark?
-    if comp_bench:
+    if comp_bench and not terminated:
         compare_file = "{}/tests/{}{:04d}".format(
             solver_name, basename, sim.n)
         msg.warning("comparing to: {} ".format(compare_file))
@@ -146,7 +182,7 @@ def doit(solver_name, problem_name, param_file,
 
 
     # are we storing a benchmark?
-    if make_bench or (result != 0 and reset_bench_on_fail):
+    if not terminated and (make_bench or (result != 0 and reset_bench_on_fail)):
         if not os.path.isdir(solver_name + "/tests/"):
             try: os.mkdir(solver_name + "/tests/")
             except:
@@ -160,11 +196,34 @@ def doit(solver_name, problem_name, param_file,
     #-------------------------------------------------------------------------
     # final reports
     #-------------------------------------------------------------------------
+
+    # wait for any output still being written, so the timers include it
+    sim.flush_output()
+
     if verbose > 0: rp.print_unused_params()
     if verbose > 0: tc.report()
+    if verbose > 0 and sim.cc_data.lazy_bcs:
+        print("ghost cell fills: {} done, {} skipped".format(
+            sim.cc_data.bc_stats["filled"], sim.cc_data.bc_stats["skipped"]))
+    if verbose > 0 and sim.cc_data.cache_stats["misses"] > 0:
+        print("derived quantity cache: {} hits, {} misses".format(
+            sim.cc_data.cache_stats["hits"], sim.cc_data.cache_stats["misses"]))
+    if verbose > 0 and sim.io_stats["files"] > 0:
+        stats = sim.io_stats
+        print("output: {} files, {:.1f} MB of data stored in {:.1f} MB "
+              "(compression ratio {:.2f}), written at {:.1f} MB/s of data".format(
+                  stats["files"], stats["data bytes"]/1.e6, stats["stored bytes"]/1.e6,
+                  stats["data bytes"]/max(stats["stored bytes"], 1),
+                  stats["data bytes"]/1.e6/max(stats["time"], 1.e-12)))
+    if verbose > 0 and sim.cc_data.grid.pool.n_alloc > 0:
+        print(sim.cc_data.grid.pool)
 
     sim.finalize()
 
+    # a run stopped early has not succeeded, whatever we compared
+    if terminated:
+        return TERMINATED
+
     if comp_bench:
         return result
     else:
@@ -191,6 +250,9 @@ def parse_and_run():
     p.add_argument("--compare_benchmark",
                    help="compare the end result to the stored benchmark",
                    action="store_true")
+    p.add_argument("--restart", metavar="checkpoint-file", type=str,
+                   help="restart from a checkpoint file, with the parameters from "
+                   "the inputs file and runtime-parameters")
 
     p.add_argument("solver", metavar="solver-name", type=str, nargs=1,
                    help="name of the solver to use", choices=valid_solvers)
@@ -205,10 +267,14 @@ def parse_and_run():
 
     args = p.parse_args()
 
-    doit(args.solver[0], args.problem[0], args.param[0],
-         other_commands=args.other,
-         comp_bench=args.compare_benchmark,
-         make_bench=args.make_benchmark)
+    result = doit(args.solver[0], args.problem[0], args.param[0],
+                  other_commands=args.other,
+                  comp_bench=args.compare_benchmark,
+                  make_bench=args.make_benchmark,
+                  restart=args.restart)
+
+    if result == TERMINATED:
+        sys.exit(TERMINATED)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,13 @@
-import h5py
+import copy
 import importlib
+import numpy as np
+import time
 import mesh.boundary as bnd
+import mesh.decomposition as decomposition
+import mesh.integration as integration
 import mesh.patch as patch
-from util import profile
+import mesh.tiling as tiling
+from util import async_io, backends, msg, profile
 
 def grid_setup(rp, ng=1):
     nx = rp.get_param("mesh.nx")
@@ -45,6 +50,12 @@ def bc_setup(rp):
 
 class NullSimulation(object):
 
+    # can the evolution be done on a decomposed mesh (see decompose)?
+    decomposable = False
+
+    # the Runge-Kutta integrator of the last step (see rk_evolve)
+    rk = None
+
     def __init__(self, solver_name, problem_name, rp, timers=None):
         """
         Initialize the Simulation object
@@ -89,8 +100,41 @@ class NullSimulation(object):
         except:
             self.verbose = None
 
+        # solvers that support it split the flux computation into
+        # tiles worked on by this many threads
+        try: nthreads = self.rp.get_param("driver.nthreads")
+        except:
+            nthreads = 1
+
+        self.tiler = tiling.TileExecutor(nthreads)
+
+        # the timestep can come from the error estimate of an embedded
+        # Runge-Kutta method (see rk_evolve)
+        try: self.dt_control = self.rp.get_param("driver.dt_control")
+        except:
+            self.dt_control = "cfl"
+
+        if self.dt_control not in ["cfl", "error", "both"]:
+            msg.fail("ERROR: invalid driver.dt_control: {}".format(self.dt_control))
+
+        self.dt_controller = None
+        self.dt_proposed = None
+
         self.n_num_out = 0
 
+        # the checkpoints we have written (see checkpoint)
+        self.checkpoints = []
+        self.last_checkpoint_time = time.time()
+
+        # the background thread doing our output, with io.async_write
+        # (see write)
+        self.writer = None
+
+        # the totals over our output files, for the report of the
+        # compression and write speed (see write)
+        self.io_stats = {"files": 0, "data bytes": 0, "stored bytes": 0,
+                         "time": 0.0}
+
         # plotting 
         self.cm = "viridis"
 
@@ -148,6 +192,14 @@ class NullSimulation(object):
                 self.dt = init_tstep_factor*self.dt
             else:
                 self.dt = min(max_dt_change*self.dt_old, self.dt)
+
+            # the step size controller's choice, from the last step
+            if self.dt_proposed is not None:
+                if self.dt_control == "error":
+                    self.dt = self.dt_proposed
+                else:
+                    self.dt = min(self.dt, self.dt_proposed)
+
             self.dt_old = self.dt
 
         if self.cc_data.t + self.dt > self.tmax:
@@ -162,6 +214,36 @@ class NullSimulation(object):
         pass
 
 
+    def decompose(self):
+        """
+        Return the simulation to evolve: if mesh.npx x mesh.npy > 1,
+        a DecomposedSimulation that evolves this one on that many
+        worker processes, otherwise ourself.  This is done after the
+        initial conditions are set.
+        """
+
+        try:
+            npx = self.rp.get_param("mesh.npx")
+            npy = self.rp.get_param("mesh.npy")
+        except:
+            npx = npy = 1
+
+        if npx*npy == 1:
+            return self
+
+        if getattr(self, "amr", None) is not None:
+            msg.fail("ERROR: a decomposed mesh cannot be used with AMR")
+
+        if self.dt_control != "cfl":
+            msg.fail("ERROR: a decomposed mesh needs driver.dt_control = cfl")
+
+        if not self.decomposable:
+            msg.fail("ERROR: the {} solver does not support a decomposed mesh".format(
+                self.solver_name))
+
+        return DecomposedSimulation(self, npx, npy)
+
+
     def evolve(self):
 
         # increment the time
@@ -169,6 +251,73 @@ class NullSimulation(object):
         self.n += 1
 
 
+    def rk_evolve(self, myd, method):
+        """
+        Advance the CellCenterData2d myd through self.dt with the
+        Runge-Kutta method, getting the stage increments from
+        self.substep.  With an embedded method and driver.dt_control
+        set to error or both, a step whose error estimate is too large
+        is redone with a smaller dt (updating self.dt), and the step
+        size controller proposes the timestep for the next step (see
+        compute_timestep).  With an IMEX method, self.substep gives the
+        explicit part, and the stiff part is done by
+        self.implicit_solve in each stage.
+        """
+
+        # the integrator is kept between steps, to reuse its storage
+        while True:
+            self.rk = rk = integration.rk_integrator(myd.t, self.dt, method=method,
+                                                     reuse=self.rk)
+            rk.set_start(myd)
+
+            for s in range(rk.nstages()):
+                ytmp = rk.get_stage_start(s)
+
+                if method in integration.a_im:
+                    h = rk.implicit_weight(s)
+                    if h > 0.0:
+                        self.implicit_solve(ytmp, h)
+                        rk.store_implicit(s, ytmp)
+
+                ytmp.fill_BC_all()
+                k = self.substep(ytmp)
+                rk.store_increment(s, k)
+
+            rk.compute_final_update()
+
+            if self.dt_control == "cfl":
+                return
+
+            if not rk.embedded():
+                msg.fail("ERROR: driver.dt_control = {} needs an embedded method, not {}".format(
+                    self.dt_control, method))
+
+            if self.dt_controller is None:
+                self.dt_controller = integration.PIController(
+                    integration.embedded_order[method])
+
+            err = rk.error_norm(self.rp.get_param("driver.rk_atol"),
+                                self.rp.get_param("driver.rk_rtol"))
+
+            if self.dt_controller.accept(err):
+                self.tc.count("RK steps accepted")
+                self.dt_proposed = self.dt_controller.propose(self.dt, err)
+                return
+
+            self.tc.count("RK steps rejected")
+            rk.reject()
+            self.dt = self.dt_controller.retry(self.dt, err)
+
+
+    def implicit_solve(self, myd, h):
+        """
+        For the IMEX methods, solve y - h f_I(y) = y* in place on the
+        CellCenterData2d myd (which holds y* on entry), where f_I is
+        the part of the righthand side treated implicitly.
+        """
+        msg.fail("ERROR: this solver has no implicit terms for an IMEX method")
+
+
     def dovis(self):
         pass
 
@@ -184,26 +333,277 @@ class NullSimulation(object):
 
         problem.finalize()
 
+        self.tiler.shutdown()
+
+        # the output still being written
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+    def write(self, filename, checkpoint=False):
+        """
+        Output the state of the simulation to a file for plotting, in
+        the format io.format (see util.backends), which adds its
+        extension to filename.  With checkpoint, the file also holds
+        everything needed to restart the run exactly (see restart).
+
+        With io.async_write, the data is copied in memory -- a
+        snapshot of the state -- and a background thread builds the
+        file from it while the evolution goes on (see util.async_io).
+        flush_output waits for it to be written.
+        """
+
+        backend = backends.get_backend(self.rp.get_param("io.format"))
+        filename = backends.output_filename(filename, backend)
+
+        tm_write = self.tc.timer("write")
+        tm_write.begin()
+
+        start = time.time()
 
-    def write(self, filename):
+        def write_file(f):
+            self.write_contents(f, checkpoint=checkpoint)
+
+        writer = self.output_writer()
+
+        if writer is None:
+            backend.write(filename, write_file, self._count_output)
+        else:
+            writer.submit(backend.save, backend.snapshot(write_file), filename,
+                          self._count_output)
+
+        self.io_stats["time"] += time.time() - start
+
+        tm_write.end()
+
+        return filename
+
+
+    def _count_output(self, f):
+        """
+        add the variables written to the output file f to io_stats --
+        with io.async_write, this is done by the background writer
+        """
+
+        self.io_stats["files"] += 1
+
+        for name in f["state"]:
+            dset = f["state"][name]["data"]
+            self.io_stats["data bytes"] += dset.size*self.cc_data._data.itemsize
+
+            # the arrays of the formats other than HDF5 are uncompressed
+            try: self.io_stats["stored bytes"] += dset.id.get_storage_size()
+            except AttributeError:
+                self.io_stats["stored bytes"] += dset.nbytes
+
+
+    def h5_options(self):
+        """
+        the dataset options (see mesh.patch.h5_dataset_options) from
+        the io.compression, io.compression_level, io.shuffle,
+        io.chunk, and io.precision runtime parameters
+        """
+        return {"compression": self.rp.get_param("io.compression"),
+                "compression_level": self.rp.get_param("io.compression_level"),
+                "shuffle": self.rp.get_param("io.shuffle"),
+                "chunk": self.rp.get_param("io.chunk"),
+                "precision": self.rp.get_param("io.precision")}
+
+
+    def write_contents(self, f, checkpoint=False):
+        """
+        write the simulation to the output file f -- an h5py File, or
+        a util.backends.Group (see write)
+        """
+
+        # main attributes
+        f.attrs["solver"] = self.solver_name
+        f.attrs["problem"] = self.problem_name
+        f.attrs["time"] = self.cc_data.t
+        f.attrs["nsteps"] = self.n
+
+        self.cc_data.write_data(f, **self.h5_options())
+        self.rp.write_params(f)
+        self.write_extras(f)
+
+        if checkpoint:
+            self.write_checkpoint(f)
+
+
+    def output_writer(self):
         """
-        Output the state of the simulation to an HDF5 file for plotting
+        the AsyncWriter that does our output, started on first use, or
+        None if io.async_write is off
         """
 
-        if not filename.endswith(".h5"):
-            filename += ".h5"
+        if self.writer is None:
+            try: async_write = self.rp.get_param("io.async_write")
+            except:
+                async_write = 0
+
+            if async_write:
+                self.writer = async_io.AsyncWriter(self.rp.get_param("io.async_depth"),
+                                                   timers=self.tc)
+
+        return self.writer
+
+
+    def flush_output(self):
+        """
+        wait for any output still being written in the background
+        """
+        if self.writer is not None:
+            self.writer.flush()
+
+
+    def do_checkpoint(self):
+        """
+        is it time to write a checkpoint?  This is every io.chk_n
+        steps or io.chk_wall seconds of wall-clock time (either can be
+        turned off by setting it to 0)
+        """
+        chk_n = self.rp.get_param("io.chk_n")
+        chk_wall = self.rp.get_param("io.chk_wall")
+
+        if chk_n > 0 and self.n % chk_n == 0:
+            return True
+
+        return chk_wall > 0 and time.time() - self.last_checkpoint_time >= chk_wall
+
+
+    def checkpoint(self, filename):
+        """
+        Write a checkpoint file, and delete the oldest ones we wrote so
+        that only the last io.chk_keep are kept (0 keeps them all)
+        """
+
+        filename = self.write(filename, checkpoint=True)
+
+        self.last_checkpoint_time = time.time()
+
+        if filename not in self.checkpoints:
+            self.checkpoints.append(filename)
+
+        # with a background writer, the old ones are only removed
+        # after the new one is written
+        chk_keep = self.rp.get_param("io.chk_keep")
+        while 0 < chk_keep < len(self.checkpoints):
+            old = self.checkpoints.pop(0)
+            if self.writer is not None:
+                self.writer.submit(async_io.remove_file, old)
+            else:
+                async_io.remove_file(old)
+
+
+    def checkpoint_state(self):
+        """
+        the driver state that is not in the grid data, as a dict of
+        the attributes to store in a checkpoint.  Solvers with more
+        state should add to this and restore_checkpoint_state.
+        """
 
-        with h5py.File(filename, "w") as f:
+        state = {"dt": self.dt, "n_num_out": self.n_num_out}
 
-            # main attributes
-            f.attrs["solver"] = self.solver_name
-            f.attrs["problem"] = self.problem_name
-            f.attrs["time"] = self.cc_data.t
-            f.attrs["nsteps"] = self.n
+        for name in ["dt_old", "dt_proposed"]:
+            value = getattr(self, name, None)
+            if value is not None:
+                state[name] = value
 
-            self.cc_data.write_data(f)
-            self.rp.write_params(f)
-            self.write_extras(f)
+        if self.dt_controller is not None:
+            state["dt_controller_order"] = self.dt_controller.k - 1
+            state["dt_controller_err_old"] = self.dt_controller.err_old
+
+        return state
+
+
+    def restore_checkpoint_state(self, state):
+        """
+        restore the driver state from the dict written by
+        checkpoint_state
+        """
+
+        self.dt = state["dt"]
+        self.n_num_out = int(state["n_num_out"])
+
+        for name in ["dt_old", "dt_proposed"]:
+            if name in state:
+                setattr(self, name, state[name])
+
+        if "dt_controller_order" in state:
+            self.dt_controller = integration.PIController(int(state["dt_controller_order"]))
+            self.dt_controller.err_old = state["dt_controller_err_old"]
+
+
+    def write_checkpoint(self, f):
+        """
+        Write the checkpoint group to the output file f: the driver
+        state, and a group for each of our grid data with its full
+        array, including the ghost cells
+        """
+
+        gc = f.create_group("checkpoint")
+
+        for key, value in self.checkpoint_state().items():
+            gc.attrs[key] = value
+
+        # these are always double precision, to restart exactly
+        opts = self.h5_options()
+        opts["precision"] = "double"
+
+        for name in self._checkpoint_data():
+            v = getattr(self, name)
+            gd = gc.create_group(name)
+            gd.attrs["t"] = v.t
+            gd.create_dataset("data", data=v._data,
+                              **patch.h5_dataset_options(v._data.shape, **opts))
+
+
+    def _checkpoint_data(self):
+        """ the names of our CellCenterData2d attributes on the main grid """
+        grid = self.cc_data.grid
+        return sorted(name for name, v in vars(self).items()
+                      if isinstance(v, patch.CellCenterData2d) and v.grid is grid)
+
+
+    def restart(self, filename):
+        """
+        Set up the simulation from the checkpoint file filename (in
+        any output format), in place of initialize and preevolve.  The
+        runtime parameters are our own, not those stored in the file,
+        so e.g. driver.tmax can be changed when restarting.
+        """
+
+        with backends.open_file(filename) as f:
+
+            if "checkpoint" not in f:
+                msg.fail("ERROR: {} is not a checkpoint file".format(filename))
+
+            if (f.attrs["solver"], f.attrs["problem"]) != (self.solver_name, self.problem_name):
+                msg.fail("ERROR: {} is a checkpoint of {} {}".format(
+                    filename, f.attrs["solver"], f.attrs["problem"]))
+
+            # set up the grid and data, which we then overwrite
+            self.initialize()
+
+            gc = f["checkpoint"]
+
+            for name in self._checkpoint_data():
+                v = getattr(self, name)
+                if name not in gc or gc[name]["data"].shape != v._data.shape:
+                    msg.fail("ERROR: {} in {} does not match the grid".format(name, filename))
+
+                v._data[...] = gc[name]["data"][...]
+                v.t = gc[name].attrs["t"]
+                v.mark_dirty()
+
+            self.n = int(f.attrs["nsteps"])
+            self.restore_checkpoint_state(dict(gc.attrs))
+
+            self.read_extras(f)
+
+        self.checkpoints = []
+        self.last_checkpoint_time = time.time()
 
 
     def write_extras(self, f):
@@ -215,7 +615,191 @@ class NullSimulation(object):
 
     def read_extras(self, f):
         """
-        read in any simulation-specific data from an h5py file object f
+        read in any simulation-specific data from an output file f
         """
         pass
 
+
+
+def _setup_subdomain(sim, names, decomp):
+    """
+    make the simulation object for a worker -- a copy of sim whose
+    grid data are the worker's subdomain of it
+    """
+
+    local = copy.copy(sim)
+
+    for name in names:
+        setattr(local, name, decomp.local[name])
+
+    tile = decomp.tiles[decomp.rank]
+
+    if getattr(sim, "solid", None) is not None:
+        local.solid = tile.solid(sim.solid)
+
+    return local
+
+
+def _compute_timestep(sim):
+    """ the timestep on a subdomain, as the driver computes it """
+    sim.cc_data.fill_BC_all()
+    sim.compute_timestep()
+    return sim.dt, getattr(sim, "dt_old", None)
+
+
+def _evolve(sim, dt, dt_old):
+    """ evolve a subdomain through the timestep dt """
+    sim.dt = dt
+    if dt_old is not None:
+        sim.dt_old = dt_old
+    sim.evolve()
+
+
+def _used_params(sim):
+    """ the runtime parameters a subdomain has used """
+    return sim.rp.used_params
+
+
+def _sum_squares(sim, name):
+    """ the sum of the squares of variable name in a subdomain's valid zones """
+    v = sim.cc_data.get_var(name)
+    return float(np.sum(v.v()**2))
+
+
+class DecomposedSimulation(object):
+    """
+    Evolve a simulation on a mesh split into mesh.npx x mesh.npy
+    subdomains, each evolved by its own worker process with the
+    solver's own evolve (see mesh.decomposition).  The ghost cells
+    between the subdomains are filled by halo exchanges and the
+    timestep is the minimum over the subdomains, so the result is the
+    same as evolving the whole mesh at once.
+
+    This is a drop-in replacement for the simulation it wraps: any
+    attribute not defined here comes from it.  The global data (e.g.
+    cc_data) is only brought up to date with the workers when it is
+    needed -- for output, visualization, and at the end of the run
+    -- or when gather() is called.
+    """
+
+    def __init__(self, sim, npx, npy):
+        """
+        Split up the (initialized) simulation sim and start the
+        workers.  Every CellCenterData2d attribute of sim that lives
+        on the same grid as its cc_data is decomposed.
+
+        Parameters
+        ----------
+        sim : NullSimulation object
+            The simulation to evolve
+        npx, npy : int
+            The number of subdomains in the x- and y-directions
+        """
+
+        self.sim = sim
+
+        grid = sim.cc_data.grid
+
+        self.names = sorted(name for name, v in vars(sim).items()
+                            if isinstance(v, patch.CellCenterData2d) and v.grid is grid)
+
+        self.decomp = decomposition.Decomposition(grid, npx, npy)
+
+        for name in self.names:
+            self.decomp.share(name, getattr(sim, name))
+
+        names = self.names
+        self.decomp.start(lambda decomp: _setup_subdomain(sim, names, decomp))
+
+        self._stale = False
+
+        if sim.verbose > 0: print(self.decomp)
+
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["sim"], name)
+
+
+    def gather(self):
+        """ bring the global data up to date with the workers """
+        if self._stale:
+            for name in self.names:
+                self.decomp.gather(name)
+            self._stale = False
+
+
+    def allreduce(self, func, op, *args):
+        """
+        Combine (with op = 'sum', 'min', or 'max') the results of
+        func(sim, *args) for the simulation on each subdomain.  func
+        must be a module-level function.
+        """
+        return self.decomp.allreduce(func, op, *args)
+
+
+    def norm(self, name):
+        """
+        the norm of the variable name over the valid zones (see
+        Grid2d.norm), found from the sums over the subdomains
+        """
+        g = self.sim.cc_data.grid
+        return np.sqrt(g.dx*g.dy*self.allreduce(_sum_squares, "sum", name))
+
+
+    def compute_timestep(self):
+        """
+        The timestep is the smallest of the subdomains' timesteps.
+        The driver's adjustments (see NullSimulation.compute_timestep)
+        only make it smaller, so this is the timestep of the whole
+        mesh.
+        """
+
+        dts = self.decomp.run(_compute_timestep)
+
+        self.sim.dt = min(dt for dt, _ in dts)
+        if dts[0][1] is not None:
+            self.sim.dt_old = min(dt_old for _, dt_old in dts)
+
+
+    def evolve(self):
+
+        tm_evolve = self.sim.tc.timer("evolve")
+        tm_evolve.begin()
+
+        self.decomp.run(_evolve, self.sim.dt, getattr(self.sim, "dt_old", None))
+
+        self.sim.cc_data.t += self.sim.dt
+        self.sim.n += 1
+
+        self._stale = True
+
+        if self.sim.finished():
+            self.gather()
+
+            # the parameters were read by the workers
+            for used in self.decomp.run(_used_params):
+                self.sim.rp.used_params += [p for p in used
+                                            if p not in self.sim.rp.used_params]
+
+        tm_evolve.end()
+
+
+    def dovis(self):
+        self.gather()
+        self.sim.dovis()
+
+
+    def write(self, filename, checkpoint=False):
+        self.gather()
+        return self.sim.write(filename, checkpoint=checkpoint)
+
+
+    def checkpoint(self, filename):
+        self.gather()
+        self.sim.checkpoint(filename)
+
+
+    def finalize(self):
+        self.gather()
+        self.decomp.shutdown()
+        self.sim.finalize()
@@ -0,0 +1,131 @@
+"""
+Output done by a background thread, so the simulation can go on
+evolving while its output goes to disk.
+
+An AsyncWriter does the tasks submitted to it in order.  At most
+max_pending tasks wait at once: submitting another blocks until the
+thread catches up (back-pressure), so a run whose output is slower
+than its evolution cannot pile up snapshots in memory.  The time the
+main thread spends blocked, in submit or flush, is added to the timer
+"io wait".
+
+For output, the main thread only takes a snapshot of the data (a copy
+in memory, see util.backends) and submits the format's save of it, so
+the file -- for HDF5, including any compression -- is built and
+written by the thread (see NullSimulation.write).  Old files are
+removed the same way, with remove_file.
+
+An error in a task is raised in the main thread by the next submit
+or flush, and the tasks after it are skipped.
+"""
+
+from __future__ import print_function
+
+import os
+import queue
+import shutil
+import threading
+
+from util import profile
+
+
+def remove_file(filename):
+    """ remove filename (a file or a directory), if it exists """
+    if os.path.isdir(filename):
+        shutil.rmtree(filename)
+    elif os.path.isfile(filename):
+        os.remove(filename)
+
+
+class AsyncWriter(object):
+    """ a background thread that does the output tasks given to it """
+
+    def __init__(self, max_pending=2, timers=None):
+        """
+        Start the thread
+
+        Parameters
+        ----------
+        max_pending : int, optional
+            The most tasks that can be waiting at once
+        timers : TimerCollection object, optional
+            The timers to add the time spent waiting to
+        """
+
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+
+        self.tasks = queue.Queue(maxsize=max_pending)
+
+        if timers is None:
+            self.tc = profile.TimerCollection()
+        else:
+            self.tc = timers
+
+        self.error = None
+
+        self.thread = threading.Thread(target=self._work, name="pyro-writer")
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def _work(self):
+        """ the thread: do the tasks until we get None """
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+
+                if self.error is None:
+                    func, args = task
+                    func(*args)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.tasks.task_done()
+
+
+    def _check(self):
+        """ raise the error from the thread, if there was one """
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+    def submit(self, func, *args):
+        """
+        Have the thread call func(*args) after the tasks already
+        submitted, first waiting for room in the queue
+        """
+
+        self._check()
+
+        tm_wait = self.tc.timer("io wait")
+        tm_wait.begin()
+
+        self.tasks.put((func, args))
+
+        tm_wait.end()
+
+
+    def flush(self):
+        """ wait until all of the tasks submitted are done """
+
+        tm_wait = self.tc.timer("io wait")
+        tm_wait.begin()
+
+        self.tasks.join()
+
+        tm_wait.end()
+
+        self._check()
+
+
+    def close(self):
+        """ finish the tasks submitted and stop the thread """
+        try:
+            self.flush()
+        finally:
+            self.tasks.put(None)
+            self.thread.join()
@@ -0,0 +1,375 @@
+"""
+The file formats that pyro output can be written in, selected by the
+io.format runtime parameter:
+
+  hdf5 : an HDF5 file (.h5), written with h5py.  This is the default,
+         and the only format that supports the io.compression,
+         io.shuffle, and io.chunk options.
+
+  npy  : a directory (.npyd) with one raw .npy file per dataset, in
+         subdirectories for the groups, and all of the attributes in
+         attrs.json.  The datasets are read with np.load(mmap_mode="r"),
+         so they are memory-mapped, with no copies.
+
+  npz  : a single (uncompressed) NumPy .npz archive.  The datasets
+         are read from it when they are first accessed.
+
+All output is written through the part of the h5py File interface that
+pyro uses -- create_group, create_dataset, attrs, and getting groups
+and datasets by name -- so the writers (e.g.
+CellCenterData2d.write_data and the solvers' write_extras) and the
+readers (util.io) work with any format.  The npy and npz formats build
+the file in memory as a tree of Groups and then write it out, and read
+it back into the same kind of tree, with arrays for the datasets.
+
+A format is an object with a name, a file extension, and the methods
+write, snapshot, save, open, and detect (see _TreeBackend and
+HDF5Backend).  A snapshot
+is always a tree of Groups -- a copy of the data, which is all that
+needs to be done on the main thread -- and save writes it out in the
+format, so it can be done by a background writer (see
+NullSimulation.write).  New formats are added with register().
+"""
+
+from __future__ import print_function
+
+import functools
+import json
+import os
+import zipfile
+
+import h5py
+import numpy as np
+
+from util import async_io, msg
+
+
+class Group(object):
+    """
+    An in-memory stand-in for an h5py Group.  Its items are Groups
+    and arrays (the datasets), and attrs is a dict.
+    """
+
+    def __init__(self):
+        self.attrs = {}
+        self._items = {}
+        self._options = {}
+        self._close = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """ close the file we were read from, if it needs closing """
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+    def create_group(self, name):
+        group = Group()
+        self._add(name, group)
+        return group
+
+    def create_dataset(self, name, data=None, dtype=None, **kwargs):
+        """
+        Store a copy of data, converted to dtype.  The HDF5 storage
+        options (compression, chunks, ...) are kept for HDF5Backend.save
+        and ignored by the other formats.
+        """
+        self._add(name, np.array(data, dtype=dtype))
+        parent, _, key = name.rpartition("/")
+        self[parent]._options[key] = kwargs
+        return self[name]
+
+    def _add(self, name, item):
+        """ add item, which can be a function that loads it, as name """
+        parent, _, key = name.rpartition("/")
+        group = self[parent]
+        if key in group._items:
+            raise ValueError("{} already exists".format(name))
+        group._items[key] = item
+
+    def __getitem__(self, name):
+        item = self
+        for key in name.split("/"):
+            if key == "":
+                continue
+            value = item._items[key]
+            if callable(value):
+                value = item._items[key] = value()
+            item = value
+        return item
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._items)
+
+    def keys(self):
+        return sorted(self._items)
+
+
+def _flatten(root):
+    """
+    The attributes of every group and the datasets of the tree root,
+    as two dicts keyed by path
+    """
+
+    attrs = {}
+    datasets = {}
+
+    def walk(group, path):
+        attrs[path] = group.attrs
+        for key in group:
+            item = group[key]
+            item_path = path + "/" + key if path else key
+            if isinstance(item, Group):
+                walk(item, item_path)
+            else:
+                datasets[item_path] = item
+
+    walk(root, "")
+
+    return attrs, datasets
+
+
+def _unflatten(attrs, loaders):
+    """
+    The tree with the group attributes attrs and the datasets loaded
+    by the functions loaders, both keyed by path (see _flatten)
+    """
+
+    root = Group()
+
+    # a group comes before its subgroups in sorted order
+    for path in sorted(attrs):
+        group = root.create_group(path) if path else root
+        group.attrs.update(attrs[path])
+
+    for path, loader in loaders.items():
+        root._add(path, loader)
+
+    return root
+
+
+def _write_h5(group, out):
+    """ copy the tree group into the h5py Group out """
+
+    out.attrs.update(group.attrs)
+
+    for key in group:
+        item = group[key]
+        if isinstance(item, Group):
+            _write_h5(item, out.create_group(key))
+        else:
+            out.create_dataset(key, data=item, **group._options.get(key, {}))
+
+
+def _json_default(value):
+    """ NumPy scalars are stored as the Python ones """
+    try:
+        return value.item()
+    except AttributeError:
+        raise TypeError("cannot store {!r} as an attribute".format(value))
+
+
+class _TreeBackend(object):
+    """ a format that is written from a tree of Groups """
+
+    def write(self, filename, func, count=None):
+        """
+        write the file filename, with its contents from func(f), then
+        call count(f) on it, if given
+        """
+        self.save(self.snapshot(func), filename, count)
+
+    def snapshot(self, func):
+        """
+        the contents from func(f), copied into a tree of Groups, ready
+        for save
+        """
+        root = Group()
+        func(root)
+        return root
+
+
+class HDF5Backend(_TreeBackend):
+    """ HDF5 files, with h5py """
+
+    name = "hdf5"
+    extension = ".h5"
+
+    def write(self, filename, func, count=None):
+        """ the same as for a tree, but straight into the file """
+        with h5py.File(filename, "w") as f:
+            func(f)
+            if count is not None:
+                count(f)
+
+    def save(self, root, filename, count=None):
+        """
+        write the snapshot root to filename, then call count(f) on the
+        file, if given.  The HDF5 file (and its compression) is built
+        here, next to filename, and moved into place, so filename is
+        never left half written.
+        """
+        tmp = filename + ".tmp"
+        with h5py.File(tmp, "w") as f:
+            _write_h5(root, f)
+            if count is not None:
+                count(f)
+
+        os.replace(tmp, filename)
+
+    def open(self, filename):
+        """ open filename for reading """
+        return h5py.File(filename, "r")
+
+    def detect(self, filename):
+        """ is filename in this format? """
+        return os.path.isfile(filename) and h5py.is_hdf5(filename)
+
+
+class NpyBackend(_TreeBackend):
+    """ a directory of .npy files """
+
+    name = "npy"
+    extension = ".npyd"
+
+    def save(self, root, filename, count=None):
+
+        attrs, datasets = _flatten(root)
+
+        # build it next to filename and move it into place
+        tmp = filename + ".tmp"
+        async_io.remove_file(tmp)
+
+        for path in attrs:
+            os.makedirs(os.path.join(tmp, path), exist_ok=True)
+
+        for path, data in datasets.items():
+            np.save(os.path.join(tmp, path + ".npy"), data)
+
+        with open(os.path.join(tmp, "attrs.json"), "w") as f:
+            json.dump(attrs, f, default=_json_default)
+
+        async_io.remove_file(filename)
+        os.replace(tmp, filename)
+
+        if count is not None:
+            count(root)
+
+    def open(self, filename):
+
+        with open(os.path.join(filename, "attrs.json")) as f:
+            attrs = json.load(f)
+
+        loaders = {}
+        for dirpath, _, files in os.walk(filename):
+            for name in files:
+                if name.endswith(".npy"):
+                    full = os.path.join(dirpath, name)
+                    path = os.path.relpath(full, filename)[:-len(".npy")]
+                    loaders[path.replace(os.sep, "/")] = \
+                        functools.partial(np.load, full, mmap_mode="r")
+
+        return _unflatten(attrs, loaders)
+
+    def detect(self, filename):
+        return os.path.isfile(os.path.join(filename, "attrs.json"))
+
+
+class NpzBackend(_TreeBackend):
+    """ a NumPy .npz archive """
+
+    name = "npz"
+    extension = ".npz"
+
+    # the archive member holding the attributes, as JSON
+    attrs_key = "__attrs__"
+
+    def save(self, root, filename, count=None):
+
+        attrs, datasets = _flatten(root)
+        datasets[self.attrs_key] = np.array(json.dumps(attrs, default=_json_default))
+
+        tmp = filename + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **datasets)
+
+        os.replace(tmp, filename)
+
+        if count is not None:
+            count(root)
+
+    def open(self, filename):
+
+        npz = np.load(filename)
+
+        attrs = json.loads(str(npz[self.attrs_key]))
+
+        loaders = {key: functools.partial(npz.__getitem__, key)
+                   for key in npz.files if key != self.attrs_key}
+
+        root = _unflatten(attrs, loaders)
+        root._close = npz.close
+
+        return root
+
+    def detect(self, filename):
+        return os.path.isfile(filename) and zipfile.is_zipfile(filename)
+
+
+_backends = {}
+
+
+def register(backend):
+    """ make the format backend available, by its name """
+    _backends[backend.name] = backend
+
+
+def get_backend(name):
+    """ the format called name """
+    try:
+        return _backends[name]
+    except KeyError:
+        msg.fail("ERROR: invalid output format: {}".format(name))
+
+
+def output_filename(filename, backend):
+    """ filename, with the extension of the format backend """
+    if not filename.endswith(backend.extension):
+        filename += backend.extension
+    return filename
+
+
+def open_file(filename):
+    """
+    Open the output file filename for reading, in whichever format it
+    is.  The extension can be left off.
+    """
+
+    candidates = [filename] + [filename + b.extension for b in _backends.values()]
+
+    for candidate in candidates:
+        for backend in _backends.values():
+            if backend.detect(candidate):
+                return backend.open(candidate)
+
+    raise IOError("no output file {}".format(filename))
+
+
+register(HDF5Backend())
+register(NpyBackend())
+register(NpzBackend())
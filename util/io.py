@@ -1,7 +1,9 @@
 import h5py
 import importlib
+import numpy as np
 import mesh.patch as patch
 import mesh.boundary as bnd
+from util import backends
 
 def read_bcs(f):
     try: gb = f["BC"]
@@ -10,16 +12,14 @@ def read_bcs(f):
     else:
         BCs = {}
         for name in gb:
-            BCs[name] = gb[name]
+            BCs[name] = bool(gb[name][()])
 
         return BCs
 
 def read(filename):
 
-    if not filename.endswith(".h5"):
-        filename += ".h5"
-
-    with h5py.File(filename, "r") as f:
+    # this can be any of the output formats (see util.backends)
+    with backends.open_file(filename) as f:
 
         # read the simulation information -- this only exists if the
         # file was created as a simulation object
@@ -27,7 +27,7 @@ def read(filename):
             solver_name = f.attrs["solver"]
             problem_name = f.attrs["problem"]
             t = f.attrs["time"]
-            n = f.attrs["nsteps"]
+            nsteps = f.attrs["nsteps"]
         except KeyError:
             # this was just a patch written out
             solver_name = None
@@ -83,7 +83,7 @@ def read(filename):
             solver = importlib.import_module(solver_name)
 
             sim = solver.Simulation(solver_name, problem_name, None)
-            sim.n = n
+            sim.n = nsteps
             sim.cc_data = myd
             sim.cc_data.t = t
 
@@ -93,3 +93,105 @@ def read(filename):
         return sim
     else:
         return myd
+
+
+class Plotfile(object):
+    """
+    A lightweight reader for a plotfile (or any file written by
+    CellCenterData2d.write), in any of the output formats.  Unlike
+    read, this does not import the solver or build a Simulation:
+    opening the file only reads the metadata and the grid, and each
+    variable is loaded the first time it is asked for, so a script
+    that needs one field of many files only pays for that field.
+
+    Variables are the valid zones only, as an (nx, ny) array in the
+    precision they were stored in.  Unless mmap is False, they are
+    memory-mapped (read-only) when the format allows: always for npy,
+    and for HDF5 when the variable is stored contiguously and
+    uncompressed.
+
+    The file stays open until close() (or the end of a with block).
+    """
+
+    def __init__(self, filename, mmap=True):
+
+        self.filename = filename
+        self.mmap = mmap
+
+        self.f = backends.open_file(filename)
+
+        # these only exist if the file was written by a simulation
+        self.solver_name = self.f.attrs.get("solver", None)
+        self.problem_name = self.f.attrs.get("problem", None)
+        self.t = self.f.attrs.get("time", None)
+        self.n = self.f.attrs.get("nsteps", None)
+
+        grid = self.f["grid"].attrs
+
+        self.grid = patch.Grid2d(grid["nx"], grid["ny"], ng=grid["ng"],
+                                 xmin=grid["xmin"], xmax=grid["xmax"],
+                                 ymin=grid["ymin"], ymax=grid["ymax"])
+
+        self.names = list(self.f["state"])
+        self.aux = dict(self.f["aux"].attrs)
+
+        self._vars = {}
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def close(self):
+        """ close the file -- memory-mapped variables stay valid """
+        self.f.close()
+
+
+    @property
+    def params(self):
+        """ the runtime parameters, as a dict """
+        try: gp = self.f["runtime parameters"]
+        except KeyError:
+            return {}
+
+        return dict(gp.attrs)
+
+
+    def get_var(self, name):
+        """
+        Return the valid zones of the variable name, loading it if
+        this is the first time it is asked for
+        """
+
+        if name not in self._vars:
+            if name not in self.names:
+                raise KeyError("no variable {} in {}".format(name, self.filename))
+
+            self._vars[name] = self._load(self.f["state"][name]["data"])
+
+        return self._vars[name]
+
+
+    def __getitem__(self, name):
+        return self.get_var(name)
+
+
+    def _load(self, dset):
+        """ memory-map the dataset dset, if we can, or read it """
+
+        # the other formats give us arrays (memory-mapped for npy)
+        if not isinstance(dset, h5py.Dataset):
+            return dset if self.mmap else np.array(dset)
+
+        offset = dset.id.get_offset()
+
+        if self.mmap and offset is not None and dset.chunks is None and \
+           self.f.driver == "sec2":
+            return np.memmap(self.f.filename, dtype=dset.dtype, mode="r",
+                             offset=offset, shape=dset.shape)
+
+        return dset[()]
@@ -26,6 +26,9 @@ calls.
 
 tc.report() prints out a summary of the timing.
 
+Events can also be counted, with tc.count('my event'), and the
+counts are reported with the timers.
+
 Warning: At present, no enforcement is done to ensure proper
 nesting.
 
@@ -42,6 +45,7 @@ class TimerCollection(object):
         Initialize the collection of timers
         """
         self.timers = []
+        self.counts = {}
 
 
     def timer(self, name):
@@ -81,6 +85,20 @@ class TimerCollection(object):
         return t_new
 
 
+    def count(self, name, n=1):
+        """
+        Add n to the counter with the given name (starting from 0)
+
+        Parameters
+        ----------
+        name : str
+            Name of the counter
+        n : int, optional
+            The amount to add
+        """
+        self.counts[name] = self.counts.get(name, 0) + n
+
+
     def report(self):
         """
         Generate a timing summary report
@@ -90,6 +108,9 @@ class TimerCollection(object):
         for t in self.timers:
             print(t.stack_count*spacing + t.name + ': ', t.elapsed_time)
 
+        for name in self.counts:
+            print(name + ': ', self.counts[name])
+
 
 class Timer(object):
 
@@ -0,0 +1,71 @@
+import threading
+
+import h5py
+import numpy as np
+import pytest
+
+import util.async_io as async_io
+from util import backends, profile
+
+
+def test_order(tmp_path):
+
+    w = async_io.AsyncWriter(max_pending=2)
+
+    done = []
+    for n in range(10):
+        w.submit(done.append, n)
+
+    backend = backends.get_backend("hdf5")
+    root = backend.snapshot(lambda f: f.create_dataset("x", data=np.arange(4.0)))
+
+    w.submit(backend.save, root, str(tmp_path / "a.h5"))
+    w.submit(async_io.remove_file, str(tmp_path / "b"))
+
+    w.close()
+
+    assert done == list(range(10))
+    with h5py.File(str(tmp_path / "a.h5"), "r") as f:
+        assert np.array_equal(f["x"][()], np.arange(4.0))
+    assert not (tmp_path / "a.h5.tmp").exists()
+
+
+def test_back_pressure():
+
+    tc = profile.TimerCollection()
+    w = async_io.AsyncWriter(max_pending=1, timers=tc)
+
+    go = threading.Event()
+    w.submit(go.wait)
+
+    # the thread is busy, so one more task fits and the next one has
+    # to wait for go
+    w.submit(lambda: None)
+    assert w.tasks.full()
+
+    threading.Timer(0.2, go.set).start()
+    w.submit(lambda: None)
+
+    w.close()
+
+    assert tc.timer("io wait").elapsed_time >= 0.1
+
+
+def test_error():
+
+    w = async_io.AsyncWriter()
+
+    done = []
+    w.submit(lambda: 1/0)
+    w.submit(done.append, 1)
+
+    with pytest.raises(ZeroDivisionError):
+        w.flush()
+
+    # the tasks after the error are skipped
+    assert done == []
+
+    w.submit(done.append, 2)
+    w.close()
+
+    assert done == [2]
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+import util.backends as backends
+
+from numpy.testing import assert_array_equal
+
+
+def _contents(f):
+    f.attrs["solver"] = "advection"
+    f.attrs["nsteps"] = np.int64(10)
+    f.attrs["time"] = 0.25
+
+    g = f.create_group("state")
+    g.create_group("a").create_dataset("data", data=np.arange(12.0).reshape(3, 4))
+    g["a"].attrs["xlb"] = "periodic"
+
+    f.create_group("BC").create_dataset("hse", data=False)
+    f.create_dataset("single", data=np.ones(5), dtype=np.float32)
+
+
+@pytest.mark.parametrize("name", ["hdf5", "npy", "npz"])
+def test_write_read(tmp_path, name):
+
+    backend = backends.get_backend(name)
+    filename = backends.output_filename(str(tmp_path / "test"), backend)
+    backend.write(filename, _contents)
+
+    # the format is found from the file, with or without the extension
+    for fname in [filename, str(tmp_path / "test")]:
+        with backends.open_file(fname) as f:
+            assert f.attrs["solver"] == "advection"
+            assert f.attrs["nsteps"] == 10
+            assert f.attrs["time"] == 0.25
+
+            assert list(f) == ["BC", "single", "state"]
+            assert "state/a" in f and "state/b" not in f
+
+            assert_array_equal(f["state"]["a"]["data"][:,:], np.arange(12.0).reshape(3, 4))
+            assert f["state/a"].attrs["xlb"] == "periodic"
+            assert not f["BC"]["hse"][()]
+            assert f["single"].dtype == np.float32
+
+            if name == "npy":
+                assert isinstance(f["state/a/data"], np.memmap)
+
+
+@pytest.mark.parametrize("name", ["hdf5", "npy", "npz"])
+def test_snapshot(tmp_path, name):
+
+    # the snapshot does not change with the data it was made from
+    data = np.zeros(4)
+
+    def contents(f):
+        f.create_dataset("d", data=data)
+
+    backend = backends.get_backend(name)
+    snapshot = backend.snapshot(contents)
+    data[:] = 1.0
+
+    filename = backends.output_filename(str(tmp_path / "test"), backend)
+    backend.save(snapshot, filename)
+
+    with backends.open_file(filename) as f:
+        assert_array_equal(f["d"][()], np.zeros(4))
+
+
+def test_hdf5_snapshot(tmp_path):
+
+    # the HDF5 snapshot is only a copy of the data, and the file,
+    # with its storage options, is built by save
+    def contents(f):
+        f.create_group("g").create_dataset("d", data=np.zeros((64, 64)),
+                                           compression="gzip", chunks=(16, 16))
+
+    backend = backends.get_backend("hdf5")
+    snapshot = backend.snapshot(contents)
+    assert isinstance(snapshot, backends.Group)
+
+    counted = []
+    filename = str(tmp_path / "test.h5")
+    backend.save(snapshot, filename, counted.append)
+    assert len(counted) == 1
+
+    with backends.open_file(filename) as f:
+        assert f["g/d"].compression == "gzip"
+        assert f["g/d"].chunks == (16, 16)
+        assert_array_equal(f["g/d"][()], np.zeros((64, 64)))
+
+
+def test_missing(tmp_path):
+
+    with pytest.raises(IOError):
+        backends.open_file(str(tmp_path / "nothing"))